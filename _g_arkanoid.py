@@ -2,23 +2,88 @@
 arkanoid.py - Arkanoid game with colorful blocks and powerups.
 Left button moves paddle left, right button moves right.
 Press both buttons to launch the ball.
+Start with the right button for a demo, any button takes over.
 """
 
 import gc
 gc.collect()
 
-import random
 import utime
 import st7789
 import tft_config
 import vga1_8x16 as font
 from machine import Pin
+from rng import Rng
+from entitypool import EntityPool, CULL
+from blockgrid import BlockGrid
+from levelpack import LevelPack
+from kinematics import FP, ONE, fmul, scale, bounce, clamp
+from intercept import Intercept
+
+# seeded per run, rng.seed(n) makes a run replayable
+rng = Rng(utime.ticks_us())
 
 tft = tft_config.config(0, buffer_size=64*64*2)
 
 btn1 = Pin(0, mode=Pin.IN, pull=Pin.PULL_UP)    # left
 btn2 = Pin(35, mode=Pin.IN, pull=Pin.PULL_UP)   # right
 
+# The demo paddle predicts where the ball meets the paddle row and stands
+# so it leaves toward the lowest block left.  PREDICT = False chases the
+# ball's x instead.
+PREDICT = True
+
+
+class Hud(object):
+    # The score, level and lives strip at the top of the screen.  It
+    # remembers what it shows and draw() only redraws the characters and
+    # life icons that changed, so a block hit costs a digit or two
+    # instead of the whole strip.  reset() after clearing the screen.
+    DIGITS = 6
+
+    def __init__(self, display, width):
+        self.display = display
+        self.width = width
+        self.score = bytearray(self.DIGITS)   # character codes shown, 0 none
+        self.level = bytearray(self.DIGITS)
+        self.lives = 0
+
+    def reset(self):
+        # draw the strip from scratch
+        self.display.fill_rect(0, 0, self.width, 18, st7789.BLACK)
+        self.display.text(font, 'L', 56, 1, st7789.CYAN)
+        for i in range(self.DIGITS):
+            self.score[i] = 0
+            self.level[i] = 0
+        self.lives = 0
+
+    def number(self, shown, value, x, color):
+        # value left aligned at x, drawing the changed characters
+        n = 1
+        p = 10
+        while p <= value and n < self.DIGITS:
+            n += 1
+            p *= 10
+        for i in range(self.DIGITS):
+            if i < n:
+                p //= 10
+                ch = 48 + value // p % 10
+            else:
+                ch = 32 if shown[i] else 0
+            if ch != shown[i]:
+                shown[i] = ch
+                self.display.text(font, ch, x + i * font.WIDTH, 1, color)
+
+    def draw(self, score, level, lives):
+        self.number(self.score, score, 2, st7789.WHITE)
+        self.number(self.level, level, 64, st7789.CYAN)
+        while self.lives < lives:
+            self.display.fill_rect(self.width - 8 - self.lives * 10, 5, 6, 8, st7789.YELLOW)
+            self.lives += 1
+        while self.lives > lives:
+            self.lives -= 1
+            self.display.fill_rect(self.width - 8 - self.lives * 10, 5, 6, 8, st7789.BLACK)
+
 
 def main():
     tft.init()
@@ -27,28 +92,21 @@ def main():
     H = tft.height()    # 240
 
     # Custom RGB565 colors
-    ORANGE = 0xFC00
     PURPLE = 0xA014
     DKGRAY = 0x4208
 
-    # Block row colors (rainbow cycle)
-    ROW_COLORS = [
-        st7789.RED, ORANGE, st7789.YELLOW, st7789.GREEN,
-        st7789.CYAN, st7789.BLUE, PURPLE, st7789.MAGENTA
-    ]
-
     # Powerup types
     PW_WIDE  = 0    # wider paddle
     PW_MULTI = 1    # extra ball
     PW_SLOW  = 2    # slow ball
     PW_LIFE  = 3    # extra life
     PW_COLOR = [st7789.GREEN, st7789.CYAN, st7789.YELLOW, st7789.RED]
-    PW_DROP  = 22   # % chance per block destroyed
 
     # Block grid constants
     BW    = 15      # block width in pixels
     BH    = 7       # block height
     BCOLS = 9       # blocks per row (9 * 15 = 135 = screen width)
+    BROWS = 10      # rows at most
     BSTEP = 8       # vertical step between rows (BH + 1px gap)
     BTOP  = 20      # y of first block row
 
@@ -56,8 +114,14 @@ def main():
     PAD_H = 3
     PAD_Y = H - 16
 
-    # Ball constant
+    # Ball constants, XMAX and YTOP are the ball's fixed point bounds
     BSZ = 3
+    XMAX = (W - BSZ) << FP
+    YTOP = 18 << FP
+
+    # Demo paddle
+    AI_SPEED = 4        # pixels per frame, as fast as the buttons move it
+    AI_HOLD  = 20       # frames before the demo launches a held ball
 
     # Game state dict (mutable from nested functions)
     g = {
@@ -67,32 +131,51 @@ def main():
         'padw': 26,
         'padx': 0,
         'frozen': True,
+        'demo': False,
+        'hold': 0,      # frames the demo has held the ball
     }
     g['padx'] = (W - g['padw']) // 2
 
-    balls = []       # list of [x, y, vx, vy] (floats)
-    blocks = []      # list of [x, y, color, alive]
-    powerups = []    # list of [x, y, type]
+    # balls and powerups live in entity pools, positions and velocities
+    # are fixed point (x >> FP is the pixel column)
+    balls = EntityPool(8, W, H)
+    # blocks, one byte per cell, row by row, loaded a level at a time from
+    # the level pack (host/levels/arkanoid.txt), which also has each block
+    # type's colour, hit points and powerup drop chance
+    blocks = BlockGrid(0, BTOP, BCOLS, BROWS, BW, BSTEP, BW, BH)
+    alive = blocks.alive
+    pack = LevelPack('arkanoid.lvl')
+    powerups = EntityPool(8, W, H)   # kind is the powerup type
+    bx_ = balls.x
+    by_ = balls.y
+    bvx = balls.vx
+    bvy = balls.vy
+    # where balls meet the paddle row, in fixed point
+    aim = Intercept((PAD_Y - BSZ) << FP, 0, XMAX, YTOP)
 
     # ---- Drawing helpers ----
 
-    def draw_block(b):
-        if b[3]:
-            tft.fill_rect(b[0] + 1, b[1], BW - 2, BH, b[2])
+    def draw_block(k):
+        r = k // BCOLS
+        if alive[k]:
+            x = (k - r * BCOLS) * BW + 1
+            tft.fill_rect(x, BTOP + r * BSTEP, BW - 2, BH, pack.colors[blocks.kind[k]])
+            if alive[k] > 1:
+                # takes more than one hit
+                tft.hline(x, BTOP + r * BSTEP, BW - 2, st7789.WHITE)
 
-    def erase_block(b):
-        tft.fill_rect(b[0], b[1], BW, BH + 1, st7789.BLACK)
+    def erase_block(k):
+        r = k // BCOLS
+        tft.fill_rect((k - r * BCOLS) * BW, BTOP + r * BSTEP, BW, BH + 1, st7789.BLACK)
 
     def draw_all_blocks():
-        for b in blocks:
-            draw_block(b)
+        for k in range(len(alive)):
+            draw_block(k)
+
+    hud = Hud(tft, W)
 
     def draw_hud():
-        tft.fill_rect(0, 0, W, 18, st7789.BLACK)
-        tft.text(font, str(g['score']), 2, 1, st7789.WHITE)
-        tft.text(font, 'L{}'.format(g['level']), 56, 1, st7789.CYAN)
-        for i in range(g['lives']):
-            tft.fill_rect(W - 8 - i * 10, 5, 6, 8, st7789.YELLOW)
+        hud.draw(g['score'], g['level'], g['lives'])
 
     def draw_paddle():
         tft.fill_rect(g['padx'], PAD_Y, g['padw'], PAD_H, st7789.WHITE)
@@ -100,29 +183,25 @@ def main():
     def erase_paddle():
         tft.fill_rect(0, PAD_Y, W, PAD_H, st7789.BLACK)
 
-    def draw_ball(b, color=st7789.WHITE):
-        tft.fill_rect(int(b[0]), int(b[1]), BSZ, BSZ, color)
-
-    def draw_powerup(pw, color=None):
-        c = color if color is not None else PW_COLOR[pw[2]]
-        tft.fill_rect(int(pw[0]), int(pw[1]), 7, 7, c)
+    def draw_ball(i, color=st7789.WHITE):
+        tft.fill_rect(bx_[i] >> FP, by_[i] >> FP, BSZ, BSZ, color)
 
     # ---- Level management ----
 
     def make_blocks():
-        blocks.clear()
-        rows = min(5 + g['level'] - 1, 10)
-        for r in range(rows):
-            color = ROW_COLORS[r % len(ROW_COLORS)]
-            for c in range(BCOLS):
-                blocks.append([c * BW, BTOP + r * BSTEP, color, True])
+        # back to the first layout after the last
+        pack.load((g['level'] - 1) % pack.count, blocks)
 
     def new_ball():
+        # held on the paddle until launched, returns the ball's slot
         bx = g['padx'] + g['padw'] // 2 - BSZ // 2
         by = PAD_Y - BSZ - 1
-        vx = random.choice([-1.5, -1.0, 1.0, 1.5])
-        vy = -(1.5 + g['level'] * 0.15)
-        return [float(bx), float(by), vx, vy]
+        vx = rng.choice((-384, -256, 256, 384))     # -1.5, -1, 1, 1.5
+        vy = -(384 + g['level'] * 38)                   # -(1.5 + level*0.15)
+        g['held'] = balls.alloc(bx << FP, by << FP, vx, vy, BSZ, BSZ,
+                                color=st7789.WHITE)
+        aim.reset()     # the slot may be the one it predicted for
+        return g['held']
 
     def start_level():
         tft.fill(st7789.BLACK)
@@ -132,17 +211,72 @@ def main():
         powerups.clear()
         make_blocks()
         draw_all_blocks()
+        hud.reset()
         draw_hud()
-        balls.append(new_ball())
+        new_ball()
         draw_paddle()
-        draw_ball(balls[0])
+        balls.draw(tft)
         gc.collect()
 
-    def blocks_alive():
-        for b in blocks:
-            if b[3]:
-                return True
-        return False
+    # ---- Demo paddle ----
+
+    def aim_paddle(x, speed):
+        # paddle x sending a ball that meets the paddle row at x (fixed
+        # point), speed fast, toward the lowest block left
+        x >>= FP
+        vx = 0
+        for r in range(BROWS - 1, -1, -1):
+            m = blocks.masks[r]
+            if m:
+                c = BCOLS - 1
+                while not m >> c & 1:
+                    c -= 1
+                # the paddle sets vx from the hit point and keeps the speed
+                vx = scale(c * BW + BW // 2 - x, speed,
+                           PAD_Y - BTOP - r * BSTEP - BH)
+                break
+        hit = clamp(vx // 4 + ONE // 2, 26, 230)   # 0.1 to 0.9 of the paddle
+        return x + (BSZ - (hit * 2 * g['padw'] >> FP)) // 2
+
+    def ai_paddle(t):
+        # paddle x for the demo this frame, t is the current target
+        if not PREDICT:
+            i = -1
+            for j in range(balls.top):
+                if balls.alive(j) and (i < 0 or by_[j] > by_[i]):
+                    i = j
+            return (bx_[i] >> FP) - g['padw'] // 2 if i >= 0 else t
+        # follow the ball that reaches the paddle row first
+        i = -1
+        for j in range(balls.top):
+            if balls.alive(j) and bvy[j] > 0:
+                if i < 0 or ((PAD_Y << FP) - by_[j]) * bvy[i] < ((PAD_Y << FP) - by_[i]) * bvy[j]:
+                    i = j
+        if i < 0:
+            for j in range(balls.top):
+                if balls.alive(j):
+                    i = j
+                    break
+        if i >= 0 and aim.update(i, bx_[i], by_[i], bvx[i], bvy[i]):
+            t = aim_paddle(aim.x, abs(bvy[i]))
+        return t
+
+    def hit_block(k):
+        # blocks.sweep() calls this for each block a ball hits
+        if alive[k]:
+            draw_block(k)       # one hit point less
+            return
+        erase_block(k)
+        g['score'] += 10
+        draw_hud()
+
+        # Maybe drop a powerup from the level's table
+        if pack.npowerups and rng.randint(0, 99) < pack.drop[blocks.kind[k]]:
+            pt = pack.powerups[rng.randint(0, pack.npowerups - 1)]
+            r = k // BCOLS
+            powerups.alloc(((k - r * BCOLS) * BW + BW // 2 - 3) << FP,
+                           (BTOP + r * BSTEP) << FP, 0, ONE, 7, 7, pt,
+                           PW_COLOR[pt], flags=CULL)
 
     # ---- Title screen ----
 
@@ -166,17 +300,21 @@ def main():
     tft.fill_rect(72, 160, 7, 7, st7789.RED)
     tft.text(font, 'Life', 84, 158, st7789.RED)
 
-    tft.text(font, 'Press any button', 4, 210, DKGRAY)
+    tft.text(font, 'L=Play  R=Demo', 12, 210, DKGRAY)
 
     # Wait for a button press to start
     while btn1.value() == Pin.DRIVE_1 and btn2.value() == Pin.DRIVE_1:
         utime.sleep_ms(50)
+    g['demo'] = btn2.value() == Pin.DRIVE_0
     utime.sleep_ms(300)  # debounce
 
     # ---- Start first level ----
 
     start_level()
     frame_ms = 30  # ~33 fps
+    level_ms = utime.ticks_ms()
+    ai_x = g['padx']
+    was_pressed = True
 
     # ---- Main game loop ----
 
@@ -190,6 +328,22 @@ def main():
         # Move paddle
         prev_px = g['padx']
 
+        # Demo: a fresh press takes over
+        pressed = b1 == Pin.DRIVE_0 or b2 == Pin.DRIVE_0
+        if g['demo'] and pressed and not was_pressed:
+            g['demo'] = False
+        was_pressed = pressed
+        if g['demo']:
+            b1 = b2 = Pin.DRIVE_1
+            ai_x = ai_paddle(ai_x)
+            step = max(-AI_SPEED, min(AI_SPEED, ai_x - g['padx']))
+            g['padx'] = max(0, min(W - g['padw'], g['padx'] + step))
+            if g['frozen']:
+                g['hold'] += 1
+                if g['hold'] > AI_HOLD:
+                    g['frozen'] = False
+                    g['hold'] = 0
+
         # Left button only
         if b1 == Pin.DRIVE_0 and b2 == Pin.DRIVE_1:
             g['padx'] = max(0, g['padx'] - 4)
@@ -211,96 +365,58 @@ def main():
 
         if g['frozen']:
             # Ball sticks to paddle
-            draw_ball(balls[0], st7789.BLACK)
-            balls[0][0] = float(g['padx'] + g['padw'] // 2 - BSZ // 2)
-            balls[0][1] = float(PAD_Y - BSZ - 1)
-            draw_ball(balls[0])
+            i = g['held']
+            draw_ball(i, st7789.BLACK)
+            bx_[i] = (g['padx'] + g['padw'] // 2 - BSZ // 2) << FP
+            by_[i] = (PAD_Y - BSZ - 1) << FP
+            draw_ball(i)
         else:
-            for ball in list(balls):
+            for i in range(balls.top):
+                if not balls.alive(i):
+                    continue
                 # Erase at old position
-                draw_ball(ball, st7789.BLACK)
-
-                # Apply velocity
-                ball[0] += ball[2]
-                ball[1] += ball[3]
-                bx = int(ball[0])
-                by = int(ball[1])
-
-                # Left/right wall bounce
-                if bx <= 0:
-                    ball[0] = 0.0
-                    ball[2] = abs(ball[2])
-                elif bx + BSZ >= W:
-                    ball[0] = float(W - BSZ)
-                    ball[2] = -abs(ball[2])
-
-                # Ceiling bounce (below HUD)
-                if by <= 18:
-                    ball[1] = 18.0
-                    ball[3] = abs(ball[3])
+                draw_ball(i, st7789.BLACK)
+
+                # Move, breaking and bouncing off every block on the way
+                blocks.sweep(bx_, by_, bvx, bvy, i, BSZ, hit_block)
+
+                # Left/right wall and ceiling (below HUD) bounce
+                bvx[i] = bounce(bx_[i], bvx[i], 0, XMAX)
+                bx_[i] = clamp(bx_[i], 0, XMAX)
+                bvy[i] = bounce(by_[i], bvy[i], YTOP, by_[i])
+                by_[i] = max(by_[i], YTOP)
 
                 # Paddle collision
-                bx = int(ball[0])
-                by = int(ball[1])
+                bx = bx_[i] >> FP
+                by = by_[i] >> FP
                 px = g['padx']
                 pw = g['padw']
-                if (ball[3] > 0 and
+                if (bvy[i] > 0 and
                     by + BSZ >= PAD_Y and
                     by < PAD_Y + PAD_H and
                     bx + BSZ > px and bx < px + pw):
-                    ball[1] = float(PAD_Y - BSZ)
+                    by_[i] = (PAD_Y - BSZ) << FP
                     # Angle depends on where ball hits paddle
-                    hit = (bx + BSZ / 2.0 - px) / pw  # 0.0 to 1.0
-                    ball[2] = (hit - 0.5) * 4.0
-                    speed = abs(ball[3])
-                    ball[3] = -speed
+                    hit = ((2 * (bx - px) + BSZ) << FP) // (2 * pw)  # 0 to 1.0
+                    vx = (hit - ONE // 2) * 4
+                    speed = abs(bvy[i])
+                    bvy[i] = -speed
                     # Clamp horizontal speed so ball doesn't go too flat
-                    if abs(ball[2]) < 0.3:
-                        ball[2] = 0.3 if ball[2] >= 0 else -0.3
-                    if abs(ball[2]) > speed * 1.8:
-                        ball[2] = speed * 1.8 if ball[2] > 0 else -speed * 1.8
-
-                # Block collision
-                bx = int(ball[0])
-                by = int(ball[1])
-                for blk in blocks:
-                    if not blk[3]:
-                        continue
-                    x1 = blk[0]
-                    y1 = blk[1]
-                    if (bx + BSZ > x1 and bx < x1 + BW and
-                        by + BSZ > y1 and by < y1 + BH):
-                        # Destroy block
-                        blk[3] = False
-                        erase_block(blk)
-                        g['score'] += 10
-                        draw_hud()
-
-                        # Bounce direction: compare overlap to determine side hit
-                        ox = min(bx + BSZ, x1 + BW) - max(bx, x1)
-                        oy = min(by + BSZ, y1 + BH) - max(by, y1)
-                        if ox < oy:
-                            ball[2] = -ball[2]
-                        else:
-                            ball[3] = -ball[3]
-
-                        # Maybe drop a powerup
-                        if random.randint(0, 99) < PW_DROP:
-                            pt = random.randint(0, 3)
-                            powerups.append([x1 + BW // 2 - 3, y1, pt])
-
-                        break  # one block per frame per ball
+                    if abs(vx) < 77:                        # 0.3
+                        vx = 77 if vx >= 0 else -77
+                    limit = fmul(speed, 461)                # speed * 1.8
+                    bvx[i] = clamp(vx, -limit, limit)
 
                 # Ball fell off bottom?
-                if int(ball[1]) > H:
-                    balls.remove(ball)
+                if by_[i] >> FP > H:
+                    balls.release(i)
                     continue
 
                 # Draw at new position
-                draw_ball(ball)
+                draw_ball(i)
 
             # All balls lost?
-            if not balls:
+            if not balls.count:
                 g['lives'] -= 1
                 draw_hud()
                 if g['lives'] <= 0:
@@ -319,62 +435,57 @@ def main():
                     # Skip rest of this frame
                     continue
                 else:
-                    balls.append(new_ball())
+                    new_ball()
                     g['frozen'] = True
 
         # ---- Update powerups ----
 
-        for pw in list(powerups):
-            # Erase old position
-            draw_powerup(pw, st7789.BLACK)
-            # Fall down
-            pw[1] += 1
-
-            ppx = int(pw[0])
-            ppy = int(pw[1])
-
+        powerups.erase(tft)
+        powerups.update()      # fall one pixel, released below the screen
+        for j in range(powerups.top):
+            if not powerups.alive(j):
+                continue
             # Caught by paddle?
-            if (ppy + 7 >= PAD_Y and ppy <= PAD_Y + PAD_H and
-                ppx + 7 > g['padx'] and ppx < g['padx'] + g['padw']):
-                pt = pw[2]
+            if powerups.hit(j, g['padx'], PAD_Y, g['padw'], PAD_H + 1):
+                pt = powerups.kind[j]
                 if pt == PW_WIDE:
                     erase_paddle()
                     g['padw'] = min(g['padw'] + 10, 50)
                     if g['padx'] + g['padw'] > W:
                         g['padx'] = W - g['padw']
                     draw_paddle()
-                elif pt == PW_MULTI and balls:
-                    ob = balls[0]
-                    balls.append([ob[0], ob[1], -ob[2], ob[3]])
+                elif pt == PW_MULTI and balls.count:
+                    for i in range(balls.top):
+                        if balls.alive(i):
+                            balls.alloc(bx_[i], by_[i], -bvx[i], bvy[i], BSZ, BSZ,
+                                        color=st7789.WHITE)
+                            aim.reset()
+                            break
                 elif pt == PW_SLOW:
-                    for b in balls:
-                        b[2] *= 0.7
-                        b[3] *= 0.7
-                        if abs(b[3]) < 1.0:
-                            b[3] = -1.0 if b[3] < 0 else 1.0
+                    for i in range(balls.top):
+                        if balls.alive(i):
+                            bvx[i] = fmul(bvx[i], 179)          # * 0.7
+                            bvy[i] = fmul(bvy[i], 179)
+                            if abs(bvy[i]) < ONE:
+                                bvy[i] = -ONE if bvy[i] < 0 else ONE
                 elif pt == PW_LIFE:
                     g['lives'] = min(g['lives'] + 1, 5)
                     draw_hud()
-                powerups.remove(pw)
-                continue
-
-            # Off screen?
-            if ppy > H:
-                powerups.remove(pw)
-                continue
-
-            # Draw at new position
-            draw_powerup(pw)
+                powerups.release(j)
+        powerups.draw(tft)
 
         # ---- Level cleared? ----
 
-        if not blocks_alive():
+        if not blocks.count:
+            print('level {} cleared in {}ms'.format(
+                g['level'], utime.ticks_diff(utime.ticks_ms(), level_ms)))
             g['level'] += 1
             tft.fill(st7789.BLACK)
             tft.text(font, 'LEVEL {}'.format(g['level']),
                      24, H // 2, st7789.GREEN)
             utime.sleep(2)
             start_level()
+            level_ms = utime.ticks_ms()
 
         # ---- Frame rate control ----
 
@@ -9,21 +9,45 @@ print ("heap: %dkB" % gc.mem_free())
 import network
 import utime
 from utime import sleep_ms,ticks_ms, ticks_us, ticks_diff
-from math import sqrt
 import gameESP
+from kinematics import FP, scale, hypot, complement, clamp
+from kinematics import bounce as wall_bounce   # bounce() is the bricks'
+from blockgrid import BlockGrid
+from levelpack import LevelPack
+from intercept import Intercept
 # all dislplay, buttons, paddle, sound logics are in gameESP.mpy module
 from gameESP import *
 g=gameESP(rotation=0)
+# sound effects, compiled once so playing one does not allocate
+SFX_BRICK  = g.compileSfx(('c6', 10))
+SFX_PADDLE = g.compileSfx((900, 10))
+SFX_LOST   = g.compileSfx(('g4', 500, 'c5', 200, 'f4', 500))
+SFX_LEVEL  = g.compileSfx(('c5', 20, 'd5', 20, 'e5', 20, 'f5', 20,
+                           'g5', 20, 'a5', 20, 'b5', 20, 'c6', 20))
 paddle_width = 22
 frameRate = 30
 
+# the ball's fixed point bounds: walls, ceiling and no floor
+BALL_LEFT  = const(3 << FP)
+BALL_RIGHT = const(131 << FP)
+BALL_TOP   = const(16 << FP)
+BALL_FLOOR = const(1 << 20)
+MAX_SPEED  = const(3 << FP)
+
+
 class Ball(object):
-    """Ball."""
+    """Ball.
+
+    Moves in fixed point (kinematics.FP): fx, fy and the speeds carry
+    the fractions, x and y are the pixel position.
+    """
 
     def __init__(self, x, y, x_speed, y_speed, display, width=4, height=4,
                  frozen=False):
         self.x = x
         self.y = y
+        self.fx = x << FP
+        self.fy = y << FP
         self.x2 = x + width - 1
         self.y2 = y + height - 1
         self.prev_x = x
@@ -31,14 +55,10 @@ class Ball(object):
         self.width = width
         self.height = height
         self.center = width // 2
-        self.max_x_speed = 3
-        self.max_y_speed = 3
         self.frozen = frozen
         self.display = display
-        self.x_speed = x_speed
-        self.y_speed = y_speed
-        self.x_speed2 = 0.0
-        self.y_speed2 = 0.0
+        self.x_speed = x_speed << FP
+        self.y_speed = y_speed << FP
         self.created = ticks_ms()
 
     def clear(self):
@@ -64,133 +84,152 @@ class Ball(object):
         # Check if frozen to paddle
         if self.frozen:
             # Freeze ball to top center of paddle
-            self.x = paddle_x + (paddle_center - self.center)
-            self.y = paddle_y - self.height
+            self.fx = (paddle_x + (paddle_center - self.center)) << FP
+            self.fy = (paddle_y - self.height) << FP
+            self.x = self.fx >> FP
+            self.y = self.fy >> FP
             if ticks_diff(ticks_ms(), self.created) >= 2000:
                 # Release frozen ball after 2 seconds
                 self.frozen = False
             else:
                 return
-        self.x += int(self.x_speed) + int(self.x_speed2)
-        self.x_speed2 -= int(self.x_speed2)
-        self.x_speed2 += self.x_speed - int(self.x_speed)
-
-        self.y += int(self.y_speed) + int(self.y_speed2)
-        self.y_speed2 -= int(self.y_speed2)
-        self.y_speed2 += self.y_speed - int(self.y_speed)
+        fx = self.fx + self.x_speed
+        fy = self.fy + self.y_speed
 
         # Bounces off walls
-        if self.y < 16:
-            self.y = 16
-            self.y_speed = -self.y_speed
-            bounced = True
-        if self.x + self.width >= 135:
-            self.x = 135 - self.width
-            self.x_speed = -self.x_speed
-            bounced = True
-        elif self.x < 3:
-            self.x = 3
-            self.x_speed = -self.x_speed
+        x_speed = wall_bounce(fx, self.x_speed, BALL_LEFT, BALL_RIGHT)
+        y_speed = wall_bounce(fy, self.y_speed, BALL_TOP, BALL_FLOOR)
+        if x_speed != self.x_speed or y_speed != self.y_speed:
+            self.x_speed = x_speed
+            self.y_speed = y_speed
+            fx = clamp(fx, BALL_LEFT, BALL_RIGHT)
+            fy = max(fy, BALL_TOP)
             bounced = True
+        self.x = fx >> FP
+        self.y = fy >> FP
 
         # Check for collision with Paddle
         if (self.y2 >= paddle_y and
            self.x <= paddle_x2 and
            self.x2 >= paddle_x):
-            # Ball bounces off paddle
+            # Ball bounces off paddle, steeper nearer the middle, at the
+            # same speed
             self.y = paddle_y - (self.height + 1)
-            ratio = ((self.x + self.center) -
-                     (paddle_x + paddle_center)) / paddle_center
-            self.x_speed = ratio * self.max_x_speed
-            self.y_speed = -sqrt(max(1, self.max_y_speed ** 2 - self.x_speed ** 2))
+            fy = self.y << FP
+            self.x_speed = scale((self.x + self.center) -
+                                 (paddle_x + paddle_center), MAX_SPEED, paddle_center)
+            self.y_speed = -complement(self.x_speed, MAX_SPEED)
             bounced = True
 
+        self.fx = fx
+        self.fy = fy
+
         self.x2 = self.x + self.width - 1
         self.y2 = self.y + self.height - 1
         return bounced
 
 
-class Brick(object):
-    """Brick."""
-
-    def __init__(self, x, y, color, display, width=16, height=6):
-        """Initialize brick.
-
-        Args:
-            x, y (int):  X,Y coordinates.
-            color (string):  Blue, Green, Pink, Red or Yellow.
-            display (SSD1351): OLED g.display.
-            width (Optional int): Blick width
-            height (Optional int): Blick height
-        """
-        self.x = x
-        self.y = y
-        self.x2 = x + width - 1
-        self.y2 = y + height - 1
-        self.center_x = x + (width // 2)
-        self.center_y = y + (height // 2)
-        self.color = color
-        self.width = width
-        self.height = height
-        self.display = display
-        self.draw()
-
-    def bounce(self, ball_x, ball_y, ball_x2, ball_y2,
-               x_speed, y_speed,
-               ball_center_x, ball_center_y):
-        """Determine bounce for ball collision with brick."""
-        x = self.x
-        y = self.y
-        x2 = self.x2
-        y2 = self.y2
-        center_x = self.center_x
-        center_y = self.center_y
-        if ((ball_center_x > center_x) and
-           (ball_center_y > center_y)):
-            if (ball_center_x - x2) < (ball_center_y - y2):
-                y_speed = -y_speed
-            elif (ball_center_x - x2) > (ball_center_y - y2):
-                x_speed = -x_speed
-            else:
-                x_speed = -x_speed
-                y_speed = -y_speed
-        elif ((ball_center_x > center_x) and
-              (ball_center_y < center_y)):
-            if (ball_center_x - x2) < -(ball_center_y - y):
-                y_speed = -y_speed
-            elif (ball_center_x - x2) > -(ball_center_y - y):
-                x_speed = -x_speed
-            else:
-                x_speed = -x_speed
-                y_speed = -y_speed
-        elif ((ball_center_x < center_x) and
-              (ball_center_y < center_y)):
-            if -(ball_center_x - x) < -(ball_center_y - y):
-                y_speed = -y_speed
-            elif -(ball_center_x - x) > -(ball_center_y - y):
-                y_speed = -y_speed
-            else:
-                x_speed = -x_speed
-                y_speed = -y_speed
-        elif ((ball_center_x < center_x) and
-              (ball_center_y > center_y)):
-            if -(ball_center_x - x) < (ball_center_y - y2):
-                y_speed = -y_speed
-            elif -(ball_center_x - x) > (ball_center_y - y2):
-                x_speed = -x_speed
-            else:
-                x_speed = -x_speed
-                y_speed = -y_speed
-
-        return [x_speed, y_speed]
-
-    def clear(self):
-        """Clear brick."""
-        self.display.fill_rect(self.x, self.y, self.width, self.height, st7789.BLACK)
-
-    def draw(self):
-        """Draw brick."""
-        self.display.rect(self.x, self.y, self.width, self.height, st7789.WHITE)
+# Bricks sit on a grid of BRICK_COLS x BRICK_ROWS cells, BRICK_DX x
+# BRICK_DY pixels each from BRICK_X0, BRICK_Y0, with a BRICK_W x BRICK_H
+# brick in the top left of a cell.  The layouts come a level at a time
+# from the level pack (host/levels/breakout.txt) into grid: bricks holds
+# each cell's hit points left, 0 for none, and grid.count the bricks left.
+BRICK_X0   = const(8)
+BRICK_Y0   = const(18)
+BRICK_DX   = const(20)
+BRICK_DY   = const(10)
+BRICK_W    = const(16)
+BRICK_H    = const(6)
+BRICK_COLS = const(6)
+BRICK_ROWS = const(10)
+
+grid = BlockGrid(BRICK_X0, BRICK_Y0, BRICK_COLS, BRICK_ROWS,
+                 BRICK_DX, BRICK_DY, BRICK_W, BRICK_H)
+bricks = grid.alive
+pack = LevelPack('breakout.lvl')
+
+
+def bounce(x, y, x_speed, y_speed, ball_center_x, ball_center_y):
+    """Determine bounce for ball collision with the brick at x, y."""
+    x2 = x + BRICK_W - 1
+    y2 = y + BRICK_H - 1
+    center_x = x + (BRICK_W // 2)
+    center_y = y + (BRICK_H // 2)
+    if ((ball_center_x > center_x) and
+       (ball_center_y > center_y)):
+        if (ball_center_x - x2) < (ball_center_y - y2):
+            y_speed = -y_speed
+        elif (ball_center_x - x2) > (ball_center_y - y2):
+            x_speed = -x_speed
+        else:
+            x_speed = -x_speed
+            y_speed = -y_speed
+    elif ((ball_center_x > center_x) and
+          (ball_center_y < center_y)):
+        if (ball_center_x - x2) < -(ball_center_y - y):
+            y_speed = -y_speed
+        elif (ball_center_x - x2) > -(ball_center_y - y):
+            x_speed = -x_speed
+        else:
+            x_speed = -x_speed
+            y_speed = -y_speed
+    elif ((ball_center_x < center_x) and
+          (ball_center_y < center_y)):
+        if -(ball_center_x - x) < -(ball_center_y - y):
+            y_speed = -y_speed
+        elif -(ball_center_x - x) > -(ball_center_y - y):
+            y_speed = -y_speed
+        else:
+            x_speed = -x_speed
+            y_speed = -y_speed
+    elif ((ball_center_x < center_x) and
+          (ball_center_y > center_y)):
+        if -(ball_center_x - x) < (ball_center_y - y2):
+            y_speed = -y_speed
+        elif -(ball_center_x - x) > (ball_center_y - y2):
+            x_speed = -x_speed
+        else:
+            x_speed = -x_speed
+            y_speed = -y_speed
+
+    return x_speed, y_speed
+
+
+def hit_bricks(ball, display):
+    """Clear the bricks the ball touches and bounce off the first one.
+
+    Only the grid cells under the ball are tested, at most 4 for a ball
+    smaller than a cell.  Returns the points scored.
+    """
+    x = ball.x
+    y = ball.y
+    x2 = ball.x2
+    y2 = ball.y2
+    if y > BRICK_Y0 + BRICK_ROWS * BRICK_DY or y2 < BRICK_Y0:
+        return 0
+    col0 = max(0, (x - BRICK_X0) // BRICK_DX)
+    col1 = min(BRICK_COLS - 1, (x2 - BRICK_X0) // BRICK_DX)
+    row0 = max(0, (y - BRICK_Y0) // BRICK_DY)
+    row1 = min(BRICK_ROWS - 1, (y2 - BRICK_Y0) // BRICK_DY)
+    points = 0
+    for row in range(row0, row1 + 1):
+        brick_y = BRICK_Y0 + row * BRICK_DY
+        if y > brick_y + BRICK_H - 1 or y2 < brick_y:
+            continue
+        for col in range(col0, col1 + 1):
+            brick_x = BRICK_X0 + col * BRICK_DX
+            i = row * BRICK_COLS + col
+            if bricks[i] and x <= brick_x + BRICK_W - 1 and x2 >= brick_x:
+                # Hit
+                if not points:
+                    ball.x_speed, ball.y_speed = bounce(
+                        brick_x, brick_y, ball.x_speed, ball.y_speed,
+                        x + ((x2 + 1 - x) // 2), y + ((y2 + 1 - y) // 2))
+                    g.mixer.playSfx(SFX_BRICK)
+                if not grid.damage(i):
+                    points += 1
+                    display.fill_rect(brick_x, brick_y, BRICK_W, BRICK_H, st7789.BLACK)
+    return points
 
 
 class Life(object):
@@ -314,13 +353,65 @@ def load_level(level, display) :
       frameRate = 60 + level * 10
     else :
       frameRate = 25 + level * 5
-    bricks = []
-    for row in range(18, 20 + 12 * level , 10):
-        brick_color = 1
-        for col in range(8, 112, 20 ):
-            bricks.append(Brick(col, row, brick_color, display))
+    rows = pack.load(level - 1, grid)
+    for i in range(rows * BRICK_COLS):
+        if bricks[i]:
+            row = i // BRICK_COLS
+            display.rect(BRICK_X0 + (i - row * BRICK_COLS) * BRICK_DX, BRICK_Y0 + row * BRICK_DY,
+                         BRICK_W, BRICK_H, pack.colors[grid.kind[i]])
+
+# The demo paddle predicts where the ball meets the paddle row, bouncing
+# off the walls and ceiling, and stands so the ball leaves toward the
+# lowest brick left.  Brick hits change the ball's velocity, which makes
+# the next call predict again.  PREDICT = False chases the ball's x.
+PREDICT = True
+AI_SPEED = const(5)     # pixels per frame, as fast as the buttons move it
+aim = Intercept(117 << FP, BALL_LEFT, BALL_RIGHT, BALL_TOP)   # fixed point
+ai_target = 55
+
+
+def aim_paddle(x, paddle):
+    """Paddle x sending a ball that meets the paddle row at x toward the
+    lowest brick left."""
+    x += 2  # ball centre
+    i = len(bricks) - 1
+    while i >= 0 and not bricks[i]:
+        i -= 1
+    lo = 3
+    hi = 125 - paddle.width
+    px = x - paddle.center
+    if i >= 0:
+        tx = BRICK_X0 + (i % BRICK_COLS) * BRICK_DX + BRICK_W // 2
+        dy = paddle.y - (BRICK_Y0 + (i // BRICK_COLS) * BRICK_DY + BRICK_H)
+        # Ball.set_position bounces at x_speed = MAX_SPEED * ratio, keeping
+        # the speed, so ratio is dx over the distance to the brick.  When
+        # the paddle can not get there aim at the brick's mirror image in
+        # the nearer wall (ball centres run from 5 to 133) instead.
+        for tx in (tx, 10 - tx if x < 69 else 266 - tx):
+            dx = tx - x
+            ratio = clamp(scale(dx, 1 << FP, hypot(dx, dy)), -205, 205)   # 0.8
+            px = x - paddle.center - scale(ratio, paddle.center, 1 << FP)
+            if lo <= px <= hi:
+                break
+        px = clamp(px, lo, hi)
+        if px == x - paddle.center:
+            # dead centre would bounce the ball straight up and down
+            # forever: take it a pixel off
+            px += 1 if px == lo else -1
+    return px
+
+
+def ai_paddle_x(ball, paddle):
+    """Where the demo paddle goes this frame."""
+    global ai_target
+    if not PREDICT:
+        return ball.x - 5 + g.random (0,7)
+    if not ball.frozen and aim.update(ball, ball.fx, ball.fy, ball.x_speed, ball.y_speed):
+        # a pixel or two of play, or the integer physics can settle into
+        # an orbit that never reaches the last bricks
+        ai_target = aim_paddle(aim.x >> FP, paddle) + g.random(-2, 2)
+    return paddle.x + max(-AI_SPEED, min(AI_SPEED, ai_target - paddle.x))
 
-    return bricks
 
 demoOn = False
 exitGame = False
@@ -385,27 +476,29 @@ while not exitGame :
 
     if not exitGame :
       g.display.fill(0)
+      # game objects draw through the renderer, flushed once per frame
+      r = g.renderer
 
       # Generate bricks
-      MAX_LEVEL = const(8)
       level = 1
-      bricks = load_level(level, g.display)
+      level_ms = ticks_ms()
+      load_level(level, r)
 
       # Initialize paddle
-      paddle = Paddle(g.display, paddle_width, 3)
+      paddle = Paddle(r, paddle_width, 3)
 
       # Initialize score
-      score = Score(g.display)
+      score = Score(r)
 
       # Initialize balls
       balls = []
       # Add first ball
-      balls.append(Ball(59, 58, -2, -1, g.display, frozen=True))
+      balls.append(Ball(59, 58, -2, -1, r, frozen=True))
 
       # Initialize lives
       lives = []
       for i in range(1, 3):
-          lives.append(Life(i, g.display))
+          lives.append(Life(i, r))
 
       prev_paddle_vect = 0
 
@@ -422,7 +515,7 @@ while not exitGame :
                   gameOver = True
                   demoOn = False
                 else :
-                  paddle.h_position(balls[0].x - 5 + g.random (0,7))
+                  paddle.h_position(ai_paddle_x(balls[0], paddle))
               elif usePaddle :
                 paddle.h_position(int(g.getPaddle() // 9.57))
               else :
@@ -443,39 +536,10 @@ while not exitGame :
               for ball in balls:
                   # move ball and check if bounced off walls and paddle
                   if ball.set_position(paddle.x, paddle.y,paddle.x2, paddle.center):
-                      g.playSound(900, 10)
+                      g.mixer.playSfx(SFX_PADDLE)
                   # Check for collision with bricks if not frozen
                   if not ball.frozen:
-                      prior_collision = False
-                      ball_x = ball.x
-                      ball_y = ball.y
-                      ball_x2 = ball.x2
-                      ball_y2 = ball.y2
-                      ball_center_x = ball.x + ((ball.x2 + 1 - ball.x) // 2)
-                      ball_center_y = ball.y + ((ball.y2 + 1 - ball.y) // 2)
-
-                      # Check for hits
-                      for brick in bricks:
-                          if(ball_x2 >= brick.x and
-                             ball_x <= brick.x2 and
-                             ball_y2 >= brick.y and
-                             ball_y <= brick.y2):
-                              # Hit
-                              if not prior_collision:
-                                  ball.x_speed, ball.y_speed = brick.bounce(
-                                      ball.x,
-                                      ball.y,
-                                      ball.x2,
-                                      ball.y2,
-                                      ball.x_speed,
-                                      ball.y_speed,
-                                      ball_center_x,
-                                      ball_center_y)
-                                  g.playTone('c6', 10)
-                                  prior_collision = True
-                              score_points += 1
-                              brick.clear()
-                              bricks.remove(brick)
+                      score_points += hit_bricks(ball, r)
 
                   # Check for missed
                   if ball.y2 > g.display.height() - 2:
@@ -485,15 +549,13 @@ while not exitGame :
                           # Lose life if last ball on screen
                           if len(lives) == 0:
                               score.game_over()
-                              g.playTone('g4', 500)
-                              g.playTone('c5', 200)
-                              g.playTone('f4', 500)
+                              g.mixer.playSfx(SFX_LOST, 1)
                               gameOver = True
                           else:
                               # Subtract Life
                               lives.pop().clear()
                               # Add ball
-                              balls.append(Ball(59, 58, 2, -3, g.display,
+                              balls.append(Ball(59, 58, 2, -3, r,
                                            frozen=True))
                   else:
                       # Draw ball
@@ -503,24 +565,19 @@ while not exitGame :
                   score.increment(score_points)
 
               # Check for level completion
-              if not bricks:
+              if not grid.count:
                   for ball in balls:
                       ball.clear()
                   balls.clear()
+                  print ('level {} cleared in {}ms'.format(level, ticks_diff(ticks_ms(), level_ms)))
+                  level_ms = ticks_ms()
                   level += 1
                   paddle_width -=2
-                  if level > MAX_LEVEL:
+                  if level > pack.count:
                       level = 1
-                  bricks = load_level(level, g.display)
-                  balls.append(Ball(59, 58, -2, -1, g.display, frozen=True))
-                  g.playTone('c5', 20)
-                  g.playTone('d5', 20)
-                  g.playTone('e5', 20)
-                  g.playTone('f5', 20)
-                  g.playTone('g5', 20)
-                  g.playTone('a5', 20)
-                  g.playTone('b5', 20)
-                  g.playTone('c6', 20)
+                  load_level(level, r)
+                  balls.append(Ball(59, 58, -2, -1, r, frozen=True))
+                  g.mixer.playSfx(SFX_LEVEL, 1)
               g.display_and_wait()
       except KeyboardInterrupt:
               g.display.cleanup()
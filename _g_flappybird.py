@@ -6,14 +6,20 @@ Either button to flap. Uses vscrdef/vscsad for efficient side-scrolling.
 import gc
 gc.collect()
 
-import random
 import utime
 import st7789
 import tft_config
 import vga1_8x16 as font
 from machine import Pin
+from sprite import Sprite
+from rng import Rng
+
+# seeded per run, rng.seed(n) makes a run replayable
+rng = Rng(utime.ticks_us())
 
 tft = tft_config.config(1)
+# closes a frame when draw call accounting is on (tft_config.STATS)
+end_frame = getattr(tft, 'frame', None)
 
 btn1 = Pin(0, mode=Pin.IN, pull=Pin.PULL_UP)
 btn2 = Pin(35, mode=Pin.IN, pull=Pin.PULL_UP)
@@ -62,47 +68,25 @@ def main():
 
     # ---- Bird drawing ----
 
+    # 10x8 bird: yellow body, orange wing, white eye with black pupil,
+    # red beak, converted once to an RGB565 buffer
+    BIRD = Sprite((
+        'YYYYYYYYYY',
+        'YYYYYYYWWY',
+        'YYYYYYYWKY',
+        'YYYYYYYYYR',
+        'YOOOOOYYYR',
+        'YOOOOOYYYY',
+        'YYYYYYYYYY',
+        'YYYYYYYYYY'),
+        {'Y': YELLOW, 'O': ORANGE, 'W': st7789.WHITE, 'K': st7789.BLACK, 'R': RED_BEAK})
+
     def draw_bird(fb_x, y, erase=False):
         """Draw or erase the bird at framebuffer position fb_x, screen y."""
         if erase:
-            for dx in range(BIRD_W):
-                tft.vline((fb_x + dx) % W, max(0, y), min(BIRD_H, GND_Y - y), st7789.BLACK)
+            BIRD.erase(tft, fb_x, max(0, y), st7789.BLACK, W, GND_Y)
             return
-
-        by = int(y)
-        # Body (yellow) - full 10x8 block first
-        for dx in range(BIRD_W):
-            col_x = (fb_x + dx) % W
-            h = min(BIRD_H, GND_Y - by)
-            if h > 0:
-                tft.vline(col_x, by, h, YELLOW)
-
-        # Wing stripe (orange) - row 4-5, cols 1-5
-        for dx in range(1, 6):
-            col_x = (fb_x + dx) % W
-            if by + 4 < GND_Y:
-                tft.pixel(col_x, by + 4, ORANGE)
-            if by + 5 < GND_Y:
-                tft.pixel(col_x, by + 5, ORANGE)
-
-        # Eye (white bg + black pupil) at col 7, row 1-2
-        ex = (fb_x + 7) % W
-        if by + 1 < GND_Y:
-            tft.pixel(ex, by + 1, st7789.WHITE)
-        if by + 2 < GND_Y:
-            tft.pixel(ex, by + 2, st7789.WHITE)
-        ex2 = (fb_x + 8) % W
-        if by + 1 < GND_Y:
-            tft.pixel(ex2, by + 1, st7789.WHITE)
-        if by + 2 < GND_Y:
-            tft.pixel(ex2, by + 2, st7789.BLACK)
-
-        # Beak (red) at cols 9, row 3-4
-        bx = (fb_x + 9) % W
-        if by + 3 < GND_Y:
-            tft.pixel(bx, by + 3, RED_BEAK)
-        if by + 4 < GND_Y:
-            tft.pixel(bx, by + 4, RED_BEAK)
+        BIRD.draw(tft, fb_x, int(y), W, GND_Y)
 
     # ---- Column drawing ----
 
@@ -249,7 +233,7 @@ def main():
 
             # Generate new pipes if needed
             while next_pipe_x <= world_dist + W:
-                gy = random.randint(18, GND_Y - gap_h - 10)
+                gy = rng.randint(18, GND_Y - gap_h - 10)
                 pipes.append([next_pipe_x, gy, False, gap_h])
                 next_pipe_x += PIPE_SPACE
 
@@ -317,6 +301,8 @@ def main():
                 draw_score_bar_full(score)
 
             # 9. Frame rate control
+            if end_frame:
+                end_frame()
             elapsed = utime.ticks_diff(utime.ticks_ms(), t0)
             if elapsed < FRAME_MS:
                 utime.sleep_ms(FRAME_MS - elapsed)
@@ -13,6 +13,10 @@ from math import sqrt
 # all dislplay, buttons, paddle, sound logics are in gameESP.mpy module
 from gameESP import *
 g=gameESP()
+# sound effects, compiled once so playing one does not allocate
+SFX_BAT   = g.compileSfx(('c6', 10))
+SFX_SCORE = g.compileSfx(('g4', 100))
+SFX_OVER  = g.compileSfx(('c5', 200, 'g4', 200, 'g4', 200, 'a4', 200, 'g4', 400, 'b4', 200, 'c5', 400))
 
 scores = [0,0]
 
@@ -48,7 +52,6 @@ class bat(Rect):
 
     elif self.up_key == -1 : # use Paddle
       self.y = int (g.getPaddle() / (1024 / (board_height-pong.bat_HEIGHT)))
-      self.y = int (g.getPaddle() / (1024 / (board_height-pong.bat_HEIGHT)))
 
     elif self.up_key == -2 : # use Paddle 2
       self.y = int (g.getPaddle2() / (1024 / (board_height-pong.bat_HEIGHT)))
@@ -65,8 +68,7 @@ class Ball(Rect):
         super().__init__(*args, **kwargs)
 
     def move_ball(self):
-        self.x += self.velocity
-        self.y += self.angle
+        self.move(self.velocity, self.angle)
 
 
 class Pong:
@@ -95,6 +97,8 @@ class Pong:
         # Create the player objects.
         self.bats = []
         self.balls = []
+        # bats and balls are bucketed in a grid, balls only test nearby bats
+        self.grid = Grid(self.WIDTH, self.HEIGHT, 16)
 
         if demo or onePlayer:
           self.bats.append(bat(  # The left bat, AI
@@ -163,20 +167,26 @@ class Pong:
             self.BALL_WIDTH,
             self.BALL_WIDTH))
 
+        for b in self.bats :
+          self.grid.add(b)
+        self.grid.add(self.balls[0])
+
 
     def score(self, player, ball):
       global gameOver
       global scores
       scores[player] += 1
-      g.playTone ('g4', 100)
+      g.mixer.playSfx(SFX_SCORE)
 
       if len (self.balls) > 1 :
           self.balls.remove(ball)
+          self.grid.remove(ball)
       else :
           ball.velocity = - ball.velocity
           ball.angle = g.random(0,3) - 2
           ball.x = int(self.WIDTH / 2 - self.BALL_WIDTH / 2)
           ball.y = int(self.HEIGHT / 2 - self.BALL_WIDTH / 2)
+          self.grid.update(ball)
 
 
       if scores[player] >= maxScore :
@@ -194,16 +204,17 @@ class Pong:
 
         if ball.y > self.HEIGHT - self.BALL_WIDTH or ball.y < 0:
           ball.angle = -ball.angle
-          g.display.fill(0)
+          g.renderer.fill(0)
 
 
     def check_ball_hits_bat(self):
+      grid = self.grid
       for ball in self.balls:
-          for bat in self.bats:
-            if ball.colliderect(bat):
+          for i in range(grid.query(ball)):
+            if isinstance(grid.hits[i], bat):
                   ball.velocity = -ball.velocity
                   ball.angle = g.random (0,3) - 2
-                  g.playTone ('c6', 10)
+                  g.mixer.playSfx(SFX_BAT)
                   break
 
     def game_loop(self):
@@ -285,7 +296,8 @@ class Pong:
         self.init(onePlayer, demo, usePaddle)
         g.display.fill(0)
         
-        # Game loop
+        # Game loop, drawing is queued on the renderer and flushed each frame
+        r = g.renderer
         while not gameOver:
           g.getBtn()
 #           if g.pressed (g.btnB) and g.justReleased(g.btnL) :
@@ -299,29 +311,24 @@ class Pong:
           # g.display.fill(0)
 
           for bat in self.bats:
-            g.display.fill_rect(bat.x, bat.y, self.bat_WIDTH, self.bat_HEIGHT, st7789.BLACK)
+            r.fill_rect(bat.x, bat.y, self.bat_WIDTH, self.bat_HEIGHT, st7789.BLACK)
             bat.move_bat(self.HEIGHT, self.bat_HEIGHT,self.balls)
-            g.display.fill_rect(bat.x, bat.y, self.bat_WIDTH, self.bat_HEIGHT, self.bat_COLOR)
+            self.grid.update(bat)
+            r.fill_rect(bat.x, bat.y, self.bat_WIDTH, self.bat_HEIGHT, self.bat_COLOR)
 
           for ball in self.balls:
-            g.display.fill_rect(ball.x, ball.y, self.BALL_WIDTH, self.BALL_WIDTH, st7789.BLACK)
+            r.fill_rect(ball.x, ball.y, self.BALL_WIDTH, self.BALL_WIDTH, st7789.BLACK)
             ball.move_ball()
-            g.display.fill_rect(ball.x, ball.y, self.BALL_WIDTH, self.BALL_WIDTH, self.BALL_COLOR)
+            r.fill_rect(ball.x, ball.y, self.BALL_WIDTH, self.BALL_WIDTH, self.BALL_COLOR)
 
 
-          g.display.text (font, '{} : {}'.format (scores[0], scores[1]), 112, 0, st7789.YELLOW)
+          r.text (font, '{} : {}'.format (scores[0], scores[1]), 112, 0, st7789.YELLOW)
 
           if gameOver :
-            g.display.fill_rect(125, 25, 80, 30, st7789.RED)
-            g.display.text (font, "Game Over", 130, 34, st7789.BLUE, st7789.RED)
+            r.fill_rect(125, 25, 80, 30, st7789.RED)
+            r.text (font, "Game Over", 130, 34, st7789.BLUE, st7789.RED)
             # g.display.show()
-            g.playTone ('c5', 200)
-            g.playTone ('g4', 200)
-            g.playTone ('g4', 200)
-            g.playTone ('a4', 200)
-            g.playTone ('g4', 400)
-            g.playTone ('b4', 200)
-            g.playTone ('c5', 400)
+            g.mixer.playSfx(SFX_OVER, 1)
           elif len(self.balls) < self.maxballs and g.random(0,10000) < self.ballschance :
                   self.balls.append(Ball(
                       self.BALL_VELOCITY,
@@ -329,6 +336,7 @@ class Pong:
                       int(self.HEIGHT / 2 - self.BALL_WIDTH / 2),
                       self.BALL_WIDTH,
                       self.BALL_WIDTH))
+                  self.grid.add(self.balls[-1])
 
           g.display_and_wait()
 
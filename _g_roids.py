@@ -3,12 +3,15 @@ roids.py - Asteroids style game demo using polygons.
 """
 
 import math
-import random
 import utime
 import micropython
 import st7789
 import tft_config
 from machine import Pin
+from rng import Rng
+
+# seeded per run, rng.seed(n) makes a run replayable
+rng = Rng(utime.ticks_us())
 
 tft = tft_config.config(1, buffer_size=64*64*2)
 
@@ -46,19 +49,19 @@ def main():
                 polygon if scale is None else [(int(scale*x[0]), int(scale*x[1])) for x in polygon])
 
             # if no location given assign a random location
-            self.x = random.randint(0, width) if x is None else x
-            self.y = random.randint(0, width) if y is None else y
+            self.x = rng.randint(0, width) if x is None else x
+            self.y = rng.randint(0, width) if y is None else y
 
             # set angle if given
             self.angle = float(0) if angle is None else angle
 
             # set random spin unless one was given
-            self.spin = random.randint(-3, 3) / 16 if spin is None else spin
+            self.spin = rng.randint(-3, 3) / 16 if spin is None else spin
 
             # set random velocity unless one was given
-            self.velocity_x = random.uniform(
+            self.velocity_x = rng.uniform(
                 0.50, 0.99)*6-3 + 0.75 if v_x is None else v_x
-            self.velocity_y = random.uniform(
+            self.velocity_y = rng.uniform(
                 0.50, 0.99)*6-3 + 0.75 if v_y is None else v_y
 
             # set radius, max_velocity and radius counter
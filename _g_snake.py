@@ -8,13 +8,21 @@ gc.collect()
 print ("heap: %dkB" % gc.mem_free())
 import utime
 from utime import sleep_ms
+from array import array
 # all dislplay, buttons, paddle, sound logics are in gameESP.mpy module
 from gameESP import *
+from sprite import Sprite
 g=gameESP()
+# sound effects, compiled once so playing one does not allocate
+SFX_APPLE = g.compileSfx(('d6', 20, 'c5', 20, 'f4', 20))
+SFX_CRASH = g.compileSfx(('c4', 500))
+SFX_OVER  = g.compileSfx(('c4', 100, 'e4', 100, 'g4', 100))
+SFX_GO    = g.compileSfx(('c5', 100))
 
 SNAKE_SIZE    = 8
 SNAKE_LENGTH  = 4
 SNAKE_EXTENT  = 2
+PLAN_US       = 10000   # demo AI planning budget per tick
 COLS          = 0
 ROWS          = 0
 OX            = 0
@@ -40,26 +48,27 @@ MODE_EXIT     = 6
 # ----------------------------------------------------------
 
 def tick():
+    global hungry
     handleButtons()
     if not game['refresh']:
         clearSnakeTail()
-    if game['mode'] == MODE_PLAY:
+    mode = game['mode']
+    if mode == MODE_PLAY:
         moveSnake()
         if game['refresh']:
             game['refresh'] = False
         if didSnakeEatApple():
-            g.playTone('d6', 20)
-            g.playTone('c5', 20)
-            g.playTone('f4', 20)
+            g.mixer.playSfx(SFX_APPLE)
             game['score'] += 1
+            hungry = 0
             game['refresh'] = True
             extendSnakeTail()
             spawnApple()
         if didSnakeBiteItsTail() or didSnakeHitTheWall():
-            g.playTone('c4', 500)
+            g.mixer.playSfx(SFX_CRASH, 1)
             game['mode'] = MODE_LOST
             game['refresh'] = True
-    elif game['mode'] == MODE_LOST:
+    elif mode == MODE_LOST:
         print ('LOST')
         game['life'] -= 1
 
@@ -69,16 +78,16 @@ def tick():
             game['mode'] = MODE_START
         print (game['mode'])
         sleep_ms(1000)
-    elif game['mode'] == MODE_GAMEOVER:
+    elif mode == MODE_GAMEOVER:
         print('gameOver')
+        if planTicks :
+            print ('plan: %dus/tick, max %dus' % (planUs // planTicks, planMax))
         game['mode'] = MODE_MENU
-        g.playTone('c4', 100)
-        g.playTone('e4', 100)
-        g.playTone('g4', 100)
+        g.mixer.playSfx(SFX_OVER, 1)
         sleep_ms(1000)
-    elif game['mode'] == MODE_MENU:
+    elif mode == MODE_MENU:
         pass
-    elif game['mode'] == MODE_START:
+    elif mode == MODE_START:
         print ("======================")
         game['refresh'] = True
         resetSnake()
@@ -88,13 +97,13 @@ def tick():
         game['time']  = 0
         if game['demo'] :
             game['demoOn'] = True
-    elif game['mode'] == MODE_READY:
+    elif mode == MODE_READY:
         game['refresh'] = False
         moveSnake()
         if snakeHasMoved():
-            g.playTone('c5', 100)
+            g.mixer.playSfx(SFX_GO)
             game['mode'] = MODE_PLAY
-    elif game['mode'] == MODE_EXIT:
+    elif mode == MODE_EXIT:
         return
     else:
         handleButtons()
@@ -105,8 +114,9 @@ def tick():
 
 
 def spawnApple():
-    apple['x'] = g.random (1, COLS - 2)
-    apple['y'] = g.random (1, ROWS - 2)
+    global ax, ay
+    ax = g.random (1, COLS - 2)
+    ay = g.random (1, ROWS - 2)
 
 def smart():
     if g.random(0,199) < 200 :
@@ -114,18 +124,161 @@ def smart():
         return False
 
 def noCrash (x,y):
-    h = snake['head']
-    n = snake['len']
     # hit walls ?
     if x < 0 or x > COLS-1 or y < 0 or y > ROWS-1:
         return False
-    # hit snake body ?
-    for i in range(n):
-        if i !=h and snake['x'][i] == x and snake['y'][i] == y:
+    # hit snake body ? (the head itself does not count)
+    n = occ[y * COLS + x]
+    if bx[head] == x and by[head] == y:
+        n -= 1
+    return not n
+
+# ----------------------------------------------------------
+# Demo AI
+# ----------------------------------------------------------
+# A BFS from the apple gives every free cell its distance to it.  The
+# head steps to the nearest neighbour whose flood fill still has room for
+# the whole body, or reaches the tail.  If there is none it chases its tail: the roomiest
+# neighbour from which the tail is reachable, else just the roomiest,
+# with some randomness once it has circled the board without eating.
+# The tail cell counts as free, it moves on with the head.  All searches
+# share the preallocated queue and stamp arrays, nothing is allocated,
+# and planning gives up after PLAN_US, the greedy steering takes over.
+
+def newStamp():
+    # marks cells visited by one search, without clearing pmark each time
+    global stamp
+    stamp += 1
+    if stamp > 65535 :
+        for i in range(len(pmark)) :
+            pmark[i] = 0
+        stamp = 1
+    return stamp
+
+def bfsApple(t0):
+    # pdist to the apple for every reachable free cell, False if out of time
+    s = newStamp()
+    q = pq
+    a = ay * COLS + ax
+    pmark[a] = s
+    pdist[a] = 0
+    q[0] = a
+    r = 0
+    w = 1
+    while r < w :
+        c = q[r]
+        r += 1
+        if not r & 15 and utime.ticks_diff(utime.ticks_us(), t0) > PLAN_US :
+            return False
+        d = pdist[c] + 1
+        for k in range(c * 4, c * 4 + 4) :
+            n = nbr[k]
+            if n >= 0 and not occ[n] and pmark[n] != s :
+                pmark[n] = s
+                pdist[n] = d
+                q[w] = n
+                w += 1
+    return True
+
+def flood(c, limit, t0):
+    # free cells reachable from c, counting stops at limit, -1 if out of time
+    s = newStamp()
+    q = pq
+    pmark[c] = s
+    q[0] = c
+    r = 0
+    w = 1
+    while r < w and w < limit :
+        c = q[r]
+        r += 1
+        if not r & 15 and utime.ticks_diff(utime.ticks_us(), t0) > PLAN_US :
+            return -1
+        for k in range(c * 4, c * 4 + 4) :
+            n = nbr[k]
+            if n >= 0 and not occ[n] and pmark[n] != s :
+                pmark[n] = s
+                q[w] = n
+                w += 1
+    return w
+
+def plan():
+    # steer the demo snake, False when out of time
+    global planUs, planTicks, planMax, hungry
+    if not (0 <= bx[head] < COLS and 0 <= by[head] < ROWS) :
+        return False
+    t0 = utime.ticks_us()
+    t = by[tail] * COLS + bx[tail]
+    occ[t] -= 1
+    done = planMoves(t0, t)
+    occ[t] += 1
+    dt = utime.ticks_diff(utime.ticks_us(), t0)
+    planUs += dt
+    planTicks += 1
+    hungry += 1
+    planMax = max(planMax, dt)
+    return done
+
+def planMoves(t0, t):
+    h = by[head] * COLS + bx[head]
+    if not bfsApple(t0) :
+        return False
+    s = stamp
+    # candidates nearest to the apple first, unreachable ones last
+    tried = 0
+    for _ in range(4) :
+        best = -1
+        for k in range(h * 4, h * 4 + 4) :
+            n = nbr[k]
+            if n >= 0 and not occ[n] and not tried & (1 << (k & 3)) :
+                d = pdist[n] if pmark[n] == s else 65535
+                if best < 0 or d < bestD :
+                    best = k
+                    bestD = d
+        if best < 0 :
+            break
+        tried |= 1 << (best & 3)
+        if bestD == 65535 :
+            break
+        room = flood(nbr[best], slen, t0)
+        if room < 0 :
             return False
-        i = (i + 1) % n
+        # a fill cut short of the body is still safe if it reaches the
+        # tail, unless the step eats the apple and the tail stays put
+        if room >= slen or bestD and pmark[t] == stamp :
+            stepTo(h, nbr[best])
+            return True
+    # no safe way to the apple, chase the tail
+    best = -1
+    bestRoom = -1
+    for k in range(h * 4, h * 4 + 4) :
+        n = nbr[k]
+        if n >= 0 and not occ[n] :
+            room = flood(n, len(occ), t0)
+            if room < 0 :
+                return False
+            if pmark[t] == stamp :
+                room += len(occ)
+                # circling without eating, shake the loop up
+                if hungry > len(occ) :
+                    room += g.random(0, len(occ) - 1)
+            if room > bestRoom :
+                best = n
+                bestRoom = room
+    if best < 0 :
+        return False
+    stepTo(h, best)
     return True
 
+def stepTo(h, n):
+    if n == h + 1 :
+        dirSnake(1, 0)
+    elif n == h - 1 :
+        dirSnake(-1, 0)
+    elif n > h :
+        dirSnake(0, 1)
+    else :
+        dirSnake(0, -1)
+
 def handleButtons():
   global SNAKE_SIZE
   g.getBtn()
@@ -166,29 +319,29 @@ def handleButtons():
         if g.justReleased (g.btnB):
             game['demoOn'] = False
             game['mode'] = MODE_GAMEOVER
-            g.playTone('g5', 100)
-            g.playTone('f5', 100)
-            g.playTone('e5', 100)
+            g.playSfx(('g5', 100, 'f5', 100, 'e5', 100), priority=1)
 
         #get snake's head position
 
-        h = snake['head']
-        Hx = snake['x'][h]
-        Hy = snake['y'][h]
+        Hx = bx[head]
+        Hy = by[head]
         #get snake's neck position
-        # # print ("h={} {}:{}  C={} R={}".format (h,Hx,Hy, COLS, ROWS))
+        # # print ("h={} {}:{}  C={} R={}".format (head,Hx,Hy, COLS, ROWS))
 
+        # plan a safe path to the apple, or
         # move closer to the apple, if smart enough
-        if Hx < apple['x'] and smart() and noCrash(Hx+1, Hy):
+        if plan():
+            pass
+        elif Hx < ax and smart() and noCrash(Hx+1, Hy):
             dirSnake(1, 0)
             # # print ("A")
-        elif Hx > apple['x'] and smart() and noCrash(Hx-1, Hy):
+        elif Hx > ax and smart() and noCrash(Hx-1, Hy):
             dirSnake(-1, 0)
             # # print ("B")
-        elif Hy < apple['y'] and smart() and noCrash(Hx, Hy+1):
+        elif Hy < ay and smart() and noCrash(Hx, Hy+1):
             dirSnake(0, 1)
             # # print ("C")
-        elif Hy > apple['y'] and smart() and noCrash(Hx, Hy-1):
+        elif Hy > ay and smart() and noCrash(Hx, Hy-1):
             dirSnake(0, -1)
             # # print ("D")
         elif  noCrash(Hx+1, Hy):
@@ -213,26 +366,26 @@ def handleButtons():
 #         elif g.justPressed(g.btnD):
 #             dirSnake(0, 1)
         if g.justPressed(g.btnB):
-            if snake['vx'] == 1:
+            if vx == 1:
                 dirSnake(0, 1)
-            elif snake['vx'] == -1:
+            elif vx == -1:
                 dirSnake(0, -1)
-            elif snake['vy'] == 1:
+            elif vy == 1:
                 dirSnake(-1, 0)
-            elif snake['vy'] == -1:
+            elif vy == -1:
                 dirSnake(1, 0)
-            elif snake['vx']==0 and snake['vy']==0 :
+            elif vx==0 and vy==0 :
                 dirSnake(0, 1)
         elif g.justPressed(g.btnA):
-            if snake['vx'] == 1:
+            if vx == 1:
                 dirSnake(0, -1)
-            elif snake['vx'] == -1:
+            elif vx == -1:
                 dirSnake(0, 1)
-            elif snake['vy'] == 1:
+            elif vy == 1:
                 dirSnake(1, 0)
-            elif snake['vy'] == -1:
+            elif vy == -1:
                 dirSnake(-1, 0)
-            elif snake['vx']==0 and snake['vy']==0 :
+            elif vx==0 and vy==0 :
                 dirSnake(1, 0)
 
 
@@ -243,80 +396,119 @@ def handleButtons():
 # ----------------------------------------------------------
 
 def resetSnake():
-    global COLS, ROWS, OX, OY
+    global COLS, ROWS, OX, OY, occ, bx, by, head, tail, slen, vx, vy
+    global nbr, pq, pmark, pdist, stamp, APPLE
     COLS          = (g.screenW  - 4) // SNAKE_SIZE
     ROWS          = (g.screenH - 4) // SNAKE_SIZE
     OX            = (g.screenW  - COLS * SNAKE_SIZE) // 2
     OY            = (g.screenH - ROWS * SNAKE_SIZE) // 2
     x = COLS // SNAKE_SIZE
     y = ROWS // SNAKE_SIZE
-    snake['vx'] = 0
-    snake['vy'] = 0
+    vx = 0
+    vy = 0
     # print (game['reset'])
     if game['reset'] :
         game['reset'] = False
         s = SNAKE_LENGTH
     else :
-        s = snake['len']
-
-    snake['x'] = []
-    snake['y'] = []
-    for _ in range(s):
-        snake['x'].append(x)
-        snake['y'].append(y)
-        snake['head'] = s - 1
-        snake['len']  = s
+        s = slen
+
+    # the body ring buffer and the occupancy grid are sized to the board,
+    # reallocated only when SNAKE_SIZE changes it
+    if len(occ) != COLS * ROWS :
+        occ = bytearray(COLS * ROWS)
+        bx = array('h', [0] * (COLS * ROWS + SNAKE_LENGTH))
+        by = array('h', [0] * (COLS * ROWS + SNAKE_LENGTH))
+        # demo AI: the 4 neighbours of each cell (-1 off the board), the
+        # search queue, visit stamps and distances to the apple
+        nbr = array('h', [-1] * (COLS * ROWS * 4))
+        for c in range(COLS * ROWS) :
+            if c % COLS :
+                nbr[c * 4] = c - 1
+            if c % COLS < COLS - 1 :
+                nbr[c * 4 + 1] = c + 1
+            if c >= COLS :
+                nbr[c * 4 + 2] = c - COLS
+            if c < COLS * (ROWS - 1) :
+                nbr[c * 4 + 3] = c + COLS
+        pq = array('H', [0] * (COLS * ROWS))
+        pmark = array('H', [0] * (COLS * ROWS))
+        pdist = array('H', [0] * (COLS * ROWS))
+        stamp = 0
+    else :
+        for i in range(len(occ)) :
+            occ[i] = 0
+    if APPLE is None or APPLE.w != SNAKE_SIZE :
+        APPLE = appleSprite(SNAKE_SIZE)
+    # all segments start on one cell, whose count has to fit a byte
+    s = min(s, len(bx), 255)
+    for i in range(s):
+        bx[i] = x
+        by[i] = y
+    tail = 0
+    head = s - 1
+    slen = s
+    occupy(x, y, s)
+
+# occ counts the body segments in each cell, segments can stack (the
+# snake starts folded up and grows in place), cells off the board are
+# not counted.  Kept up to date on every move and extension.
+def occupy(x, y, n):
+    if 0 <= x < COLS and 0 <= y < ROWS :
+        occ[y * COLS + x] += n
 
 
 def dirSnake(dx, dy):
-    snake['vx'] = dx
-    snake['vy'] = dy
+    global vx, vy
+    vx = dx
+    vy = dy
 
+# The body lives in the bx/by ring buffers, from tail to head.  Moving
+# frees the tail slot and writes the new head, growing pushes the tail
+# back, both O(1).
 def moveSnake():
-    h = snake['head']
-    x = snake['x'][h]
-    y = snake['y'][h]
-    h = (h + 1) % snake['len']
-    snake['x'][h] = x + snake['vx']
-    snake['y'][h] = y + snake['vy']
-    snake['head'] = h
+    global head, tail
+    x = bx[head] + vx
+    y = by[head] + vy
+    occupy(bx[tail], by[tail], -1)
+    n = len(bx)
+    tail = (tail + 1) % n
+    head = (head + 1) % n
+    bx[head] = x
+    by[head] = y
+    occupy(x, y, 1)
 
 def snakeHasMoved():
-    return snake['vx'] or snake['vy']
+    return vx or vy
 
 def didSnakeEatApple():
-    h = snake['head']
-    return snake['x'][h] == apple['x'] and snake['y'][h] == apple['y']
+    return bx[head] == ax and by[head] == ay
 
 def extendSnakeTail():
-    i = snake['head']
-    n = snake['len']
-    i = (i + 1) % n
-    x = snake['x'][i]
-    y = snake['y'][i]
-    for _ in range(SNAKE_EXTENT):
-        snake['x'].insert(i, x)
-        snake['y'].insert(i, y)
-    snake['len'] += SNAKE_EXTENT
+    # stack SNAKE_EXTENT segments on the tail, they unfold as it moves on
+    global tail, slen
+    x = bx[tail]
+    y = by[tail]
+    n = len(bx)
+    e = min(SNAKE_EXTENT, n - slen)
+    for _ in range(e):
+        tail = (tail - 1) % n
+        bx[tail] = x
+        by[tail] = y
+    occupy(x, y, e)
+    slen += e
 
 def didSnakeBiteItsTail():
-    h = snake['head']
-    n = snake['len']
-    x = snake['x'][h]
-    y = snake['y'][h]
-    i = (h + 1) % n
-    for _ in range(n-1):
-        if snake['x'][i] == x and snake['y'][i] == y:
-            return True
-        i = (i + 1) % n
-    return False
+    # another segment shares the head's cell
+    x = bx[head]
+    y = by[head]
+    return 0 <= x < COLS and 0 <= y < ROWS and occ[y * COLS + x] > 1
 
 
 
 def didSnakeHitTheWall():
-    h = snake['head']
-    x = snake['x'][h]
-    y = snake['y'][h]
+    x = bx[head]
+    y = by[head]
     return x < 0 or x == COLS or y < 0 or y == ROWS
 
 # ----------------------------------------------------------
@@ -367,45 +559,40 @@ def drawWalls():
     g.display.rect(0, 0, g.screenW, g.screenH,color)
 
 def debugSnake():
-    n = snake['len']
-    i = snake['head']
-    for _ in range(n):
+    i = head
+    for _ in range(slen):
 
-        # # print(snake['x'][i], snake['y'][i])
-        if (i - 1) < 0 :
-            i=n-1
-        else :
-            i-=1
+        # # print(bx[i], by[i])
+        i = (i - 1) % len(bx)
 
 
 def drawSnake():
     isTimeToBlink = game['time'] % 4 < 2
     color = COLOR_LOST_FG if game['mode'] == MODE_LOST and isTimeToBlink else COLOR_SNAKE
-    h = snake['head']
-    n = snake['len']
-    for i in range(n):
-        if i == h :
-          drawBox(snake['x'][i], snake['y'][i], color)
-        else :
-          drawDot(snake['x'][i], snake['y'][i], color)
+    i = tail
+    for _ in range(slen - 1):
+        drawDot(bx[i], by[i], color)
+        i = (i + 1) % len(bx)
+    drawBox(bx[head], by[head], color)
 
 def drawSnakeHead():
-    h = snake['head']
-    drawBox(snake['x'][h], snake['y'][h], COLOR_SNAKE)
+    drawBox(bx[head], by[head], COLOR_SNAKE)
 
 def clearSnakeTail():
-    h = snake['head']
-    n = snake['len']
-    t = (h + 1) % n
-    drawDot(snake['x'][t], snake['y'][t], COLOR_BG)
+    drawDot(bx[tail], by[tail], COLOR_BG)
 
 def drawScore():
     g.display.text(font, 'S {}'.format(game['score'] ), 10, 0, st7789.YELLOW)
     g.display.text(font, 'L {}'.format( game['life'] ), 80, 0, st7789.YELLOW)
 
+def appleSprite(size):
+    # the outline drawBox() draws, in COLOR_APPLE round a COLOR_BG cell
+    edge = 'r' * size
+    rows = [edge] + ['r' + '.' * (size - 2) + 'r'] * (size - 2) + [edge]
+    return Sprite(rows, {'.': COLOR_BG, 'r': COLOR_APPLE})
+
 def drawApple():
-    drawBox(apple['x'], apple['y'], COLOR_APPLE)
-    g.display.rect(OX + apple['x']* SNAKE_SIZE + int(SNAKE_SIZE/2), OY + apple['y'] * SNAKE_SIZE-1, 1,1, COLOR_APPLE)
+    APPLE.draw(g.display, OX + ax * SNAKE_SIZE, OY + ay * SNAKE_SIZE)
 
 def drawDot(x, y, color):
     g.display.fill_rect(OX + x * SNAKE_SIZE, OY + y * SNAKE_SIZE, SNAKE_SIZE, SNAKE_SIZE,color)
@@ -430,16 +617,32 @@ game = {
     'demoOn' : False
 }
 
-snake = {
-    'x':    [],
-    'y':    [],
-    'head': 0,
-    'len':  0,
-    'vx':   0,
-    'vy':   0
-}
-
-apple = { 'x': 0, 'y': 0 }
+# the snake, plain globals rather than a dict, they are read every tick
+bx    = array('h')  # body ring buffer, x and y per segment
+by    = array('h')
+head  = 0           # ring index of the head
+tail  = 0           # ring index of the tail
+slen  = 0           # segments from tail to head
+vx    = 0
+vy    = 0
+
+ax    = 0           # the apple
+ay    = 0
+
+occ = bytearray(0)
+
+nbr   = array('h')  # demo AI search state, sized in resetSnake()
+pq    = array('H')
+pmark = array('H')
+pdist = array('H')
+stamp = 0
+hungry    = 0       # demo AI ticks since the last apple
+planUs    = 0       # planning time, for benchmarks
+planTicks = 0
+planMax   = 0
+
+# one SNAKE_SIZE cell, drawn with a single blit_buffer, made in resetSnake()
+APPLE = None
 
 # ----------------------------------------------------------
 # Main loop
@@ -1,13 +1,17 @@
 # micropython port based on https://github.com/VolosR/TTGOTetris/blob/main/TTgOTetris.ino
 # TETRIS with M5STACK : 2018.01.20 Transplant by macsbug
 
-import random
 import utime
 import micropython
+from array import array
 import st7789
 import tft_config
 import tft_buttons
 from machine import Pin
+from rng import Rng
+
+# seeded per run, rng.seed(n) makes a run replayable
+rng = Rng(utime.ticks_us())
 
 import gc
 gc.collect()
@@ -18,9 +22,15 @@ buttons = tft_buttons.Buttons()
 Length = micropython.const(11)    # the number of pixels for a side of a block
 Width  = micropython.const(10)    # the number of horizontal blocks
 Height = micropython.const(20)    # the number of vertical blocks
-# playing field storing color of each space
-screen = [[0 for j in range(Height)] for i in range(Width)]    
-prev_screen = [[0 for j in range(Height)] for i in range(Width)]
+FULL   = micropython.const((1 << Width) - 1)    # a complete row
+# playing field: rows holds one bitmask per row of the dropped blocks, bit
+# i for column i, and cells the color of each space, the falling piece
+# included, Width to a row.  dirty has a bitmask per row of the cells
+# written since the last Draw(), the only ones it looks at
+rows = array('H', [0] * Height)
+cells = bytearray(Width * Height)
+prev_cells = bytearray(Width * Height)
+dirty = array('H', [0] * Height)
 
 # Parametric frame dimensions
 TopLeft = (Length, tft_typeset.font1.HEIGHT+2)
@@ -28,28 +38,17 @@ TopRight = (Length + (Length * Width), tft_typeset.font1.HEIGHT+2)
 BotLeft = (Length, tft_typeset.font1.HEIGHT+2 + (Length * Height))
 BotRight = (Length + (Length * Width), tft_typeset.font1.HEIGHT+2 + (Length * Height))
 
-class Point():
-  def __init__(self, X:int=0, Y:int=0):
-    self.X = X
-    self.Y = Y
-  def __getitem__(self, i):
-    return (self.X, self.Y)[i]
-
-class Block():
-  def __init__(self, points=[[Point() for i in range(4)] for j in range(4)], numRotate:int=0, color=st7789.WHITE):
-    self.square = []
-    for rot in range(4):
-      rots = []
-      for n in range(4):
-        rots.append(Point(points[rot][n][0], points[rot][n][1]))
-      self.square.append(rots)
-    self.numRotate = numRotate
-    self.color = color
-
-pos = Point()
-block = Block()
-
+# the falling piece, and where GetNextPosRot() would move it
+piece = 0       # index into blocks
+numRotate = 1
+color = 1
+posX = 0
+posY = 0
 rot = 0
+nextX = 0
+nextY = 0
+nextRot = 0
+
 fall_cnt = 0
 game_over = 0     # timeout before starting a new game
 but_LEFT = False
@@ -60,6 +59,35 @@ turbo = False
 game_speed_init = 100
 game_speed = game_speed_init
 
+# demo player, which takes over after DEMO_IDLE ticks without a button
+# press and hands back at the next one.  It tries every rotation and
+# column of the falling piece, dropped straight down, and scores the board
+# each leaves with the usual weighted heuristic, in thousandths: lines
+# cleared against aggregate column height, holes under blocks and the
+# bumpiness of the skyline.  Planning is spread over ticks, AI_TICK_US at
+# a time, and settles for the best placement so far after AI_PIECE_US.
+DEMO_IDLE   = micropython.const(300)
+AI_TICK_US  = micropython.const(8000)
+AI_PIECE_US = micropython.const(40000)
+AI_TRIES    = micropython.const(14)     # presses before dropping anyway
+W_LINES     = micropython.const(760)
+W_HEIGHT    = micropython.const(-510)
+W_HOLES     = micropython.const(-357)
+W_BUMPS     = micropython.const(-184)
+demo = False
+idle = 0
+heights = bytearray(Width)
+aiR = 0         # next placement to score
+aiX = 0
+aiStep = 0      # -1 scoring columns leftwards from the piece, 1 rightwards
+aiBest = 0
+aiBestR = 0
+aiBestX = 0
+aiSpent = 0
+aiDone = False
+aiTries = 0
+aiDrop = False
+
 # tetrominoes as four points, rotation, color index
 blocks = (
   # I straight tetromino "Hero" cyan
@@ -96,6 +124,32 @@ blockColors=[
     0xa014,  # purple
     ]
 
+# blocks as row masks, STRIDE entries per piece and rotation: the
+# columns x0..x1 and rows y0..y1 the squares span around the piece's
+# position, a mask for each row y0..y1 with bit 0 for column x0, and the
+# four squares as dx, dy pairs
+STRIDE = micropython.const(16)
+
+def BuildPieces():
+  pieces = array('b', [0] * (len(blocks) * 4 * STRIDE))
+  for t in range(len(blocks)):
+    for r in range(blocks[t][1]):
+      squares = blocks[t][0][r]
+      p = (t * 4 + r) * STRIDE
+      x0 = min(sq[0] for sq in squares)
+      y0 = min(sq[1] for sq in squares)
+      pieces[p] = x0
+      pieces[p + 1] = max(sq[0] for sq in squares)
+      pieces[p + 2] = y0
+      pieces[p + 3] = max(sq[1] for sq in squares)
+      for n in range(4):
+        pieces[p + 4 + squares[n][1] - y0] |= 1 << (squares[n][0] - x0)
+        pieces[p + 8 + 2 * n] = squares[n][0]
+        pieces[p + 9 + 2 * n] = squares[n][1]
+  return pieces
+
+pieces = BuildPieces()
+
 pom=0
 pom2=0
 pom3=0
@@ -112,21 +166,31 @@ def DrawFrame():
   TD.tft.line(TopLeft[0], TopLeft[1], BotLeft[0], BotLeft[1], TMOMAGENTA)
   TD.tft.line(TopRight[0], TopRight[1], BotRight[0], BotRight[1], TMOMAGENTA)
   TD.tft.line(BotLeft[0], BotLeft[1], BotRight[0], BotRight[1], TMOMAGENTA)
-  
+  DrawScore()
+
+
+def DrawScore():
+  global score, lvl
   TD.typeset("Score: {}".format(score), 0, 0, font=tft_typeset.font1)
   TD.typeset("LVL:{}".format(lvl), 10, 0, font=tft_typeset.font1)
 
 
 def Draw(refresh=False):
-  global screen, prev_screen, blackColors, Height, Width, Length
-  for i in range(Width):
-    for j in range(Height):
-      if screen[i][j] != prev_screen[i][j] or refresh:  
-        TD.tft.fill_rect(i * Length + TopLeft[0]+1, j * Length + TopLeft[1]+1, Length-1, Length-1, blockColors[screen[i][j]])
-        prev_screen[i][j] = screen[i][j]
-        ## Draw a little specular highlight
-        # if screen[i][j] != 0:
-        #   TD.tft.fill_rect(i * Length + (TopLeft[0] + 3), j * Length + TopLeft[1] + 3, 2, 2, st7789.WHITE)
+  ## Repaint the dirty cells that changed, or every cell
+  global cells, prev_cells, dirty, Height, Width, Length
+  for j in range(Height):
+    m = FULL if refresh else dirty[j]
+    if m:
+      dirty[j] = 0
+      k = j * Width
+      for i in range(Width):
+        if (m >> i & 1) and (cells[k] != prev_cells[k] or refresh):
+          TD.tft.fill_rect(i * Length + TopLeft[0]+1, j * Length + TopLeft[1]+1, Length-1, Length-1, blockColors[cells[k]])
+          prev_cells[k] = cells[k]
+          ## Draw a little specular highlight
+          # if cells[k] != 0:
+          #   TD.tft.fill_rect(i * Length + (TopLeft[0] + 3), j * Length + TopLeft[1] + 3, 2, 2, st7789.WHITE)
+        k += 1
 
 
 def ClearKeys():
@@ -138,7 +202,10 @@ def ClearKeys():
 
 
 def KeyPadLoop() -> bool:
-  global pom, pom2, pom3, pom4, but_A, but_B, but_LEFT, but_RIGHT
+  global pom, pom2, pom3, pom4, but_A, but_B, but_LEFT, but_RIGHT, idle, demo
+  idle += 1
+  if idle > DEMO_IDLE:
+    demo = True
   # Move left
   if (buttons.left.value() == Pin.DRIVE_0 and buttons.right.value() == Pin.DRIVE_1):
     if (pom == 0):
@@ -179,126 +246,280 @@ def KeyPadLoop() -> bool:
 
 
 def PutStartPos():
-  global pos, block, blocks, rot, turbo
-  pos.X = random.randint(1,Width-3)
-  pos.Y = 1
+  global posX, posY, piece, numRotate, color, blocks, rot, turbo
+  posX = rng.randint(1,Width-3)
+  posY = 1
   turbo = False
-  randblock = random.randint(0,len(blocks)-1)
-  block = Block(blocks[randblock][0],blocks[randblock][1],blocks[randblock][2])
-  rot = random.randint(0, block.numRotate-1)
+  piece = rng.randint(0,len(blocks)-1)
+  numRotate = blocks[piece][1]
+  color = blocks[piece][2]
+  rot = rng.randint(0, numRotate-1)
+  AiReset()
 
 
 def GameOver():
-  global Width, Height, screen
+  global Width, Height, cells, dirty
   utime.sleep(1)
   # Cycle colors to blank
-  for i in range(Width):
-    for j in range(Height):
-      if (screen[i][j] != 0):
-        screen[i][j] = (screen[i][j] + 1) % 8
+  for k in range(Width * Height):
+    if (cells[k] != 0):
+      cells[k] = (cells[k] + 1) % 8
+  for j in range(Height):
+    dirty[j] = FULL
   Draw()
   TD.typeset("GAME".format(score), 2, 3, font=tft_typeset.font2, fg=st7789.RED)
   TD.typeset("OVER".format(score), 2, 4, font=tft_typeset.font2, fg=st7789.RED)
 
 
-def GetNextPosRot(rot):
-  global but_LEFT, but_RIGHT, but_A, but_B, turbo, block, pos, fall_cnt, screen
-  pnext_pos = Point(pos.X, pos.Y)
-  pnext_rot = rot
+def GetNextPosRot():
+  global but_LEFT, but_RIGHT, but_A, but_B, turbo, fall_cnt, nextX, nextY, nextRot
+  nextX = posX
+  nextY = posY
+  nextRot = rot
   fall_cnt = (fall_cnt + 1) % 10
   if (fall_cnt == 0 or turbo):
-    pnext_pos.Y += 1
+    nextY += 1
   else:
     if but_LEFT == True:
       but_LEFT = False
-      pnext_pos.X -= 1
+      nextX -= 1
     elif but_RIGHT == True:
       but_RIGHT = False
-      pnext_pos.X += 1
+      nextX += 1
     elif but_A == True:
       but_A = False
-      pnext_rot = (rot + block.numRotate - 1) % block.numRotate
-  turbo = buttons.b.value() == Pin.DRIVE_0
-  return (pnext_pos, pnext_rot)  
+      nextRot = (rot + numRotate - 1) % numRotate
+  turbo = aiDrop if demo else buttons.b.value() == Pin.DRIVE_0
+
+
+def ClearRow(j):
+  ## Drop the rows above row j down by one, marking the cells that change
+  global rows, cells, dirty
+  for r in range(j, 0, -1):
+    rows[r] = rows[r - 1]
+    k = r * Width
+    for i in range(Width):
+      if cells[k] != cells[k - Width]:
+        cells[k] = cells[k - Width]
+        dirty[r] |= 1 << i
+      k += 1
+  rows[0] = 0
+  for i in range(Width):
+    if cells[i]:
+      cells[i] = 0
+      dirty[0] |= 1 << i
 
 
 def DeleteLine():
   ## Check for completed rows
-  global Height, Width, screen, score, lvl, game_speed
+  global Height, Width, rows, score, lvl, game_speed
   points = 1
   for j in range(Height):
-    Delete = True
-    for i in range(Width):
-      if (screen[i][j] == 0):
-        Delete = False
-    if (Delete):
-      for k in range(j, 0, -1): 
-        for i in range(Width):
-          screen[i][k] = screen[i][k - 1]  
+    if (rows[j] == FULL):
+      ClearRow(j)
       score += points
       points *= 2
-      lvl = min(int(score / 10.0),10)
+      lvl = min(score // 10, 10)
       game_speed = game_speed_init - (10 * lvl)
-      DrawFrame()
-      Draw(refresh=True)
+      DrawScore()
+      Draw()
       utime.sleep(0.2)
-      
-      
-def GetSquares(block, pos, rot):
-  ## Collision check with boundaries and dropped blocks in screen
-  global Height, Width, screen
-  squares = [Point() for i in range(4)]
-  overlap = False
-  for i in range(4):
-    p = Point()
-    p.X = pos.X + block.square[rot][i].X
-    p.Y = pos.Y + block.square[rot][i].Y
-    overlap |= p.X < 0 or p.X >= Width or p.Y < 0 or p.Y >= Height or screen[p.X][p.Y] != 0
-    squares[i] = p
-  return (not bool(overlap), squares)
-
-
-def ReviseScreen(next_pos, next_rot):
-  global pos, rot, block, screen, game_over, score
-  for i in range(4):
-    screen[pos.X + block.square[rot][i].X][pos.Y + block.square[rot][i].Y] = 0
-  (movable, next_squares) = GetSquares(block, next_pos, next_rot)
-  if movable:
-    for i in range(4):
-      screen[next_squares[i].X][next_squares[i].Y] = block.color
-    pos = next_pos
-    rot = next_rot
-  else:
-    for i in range(4):
-      screen[pos.X + block.square[rot][i].X][pos.Y + block.square[rot][i].Y] = block.color
-    if (next_pos.Y == pos.Y + 1):
-      DeleteLine()
-      PutStartPos()
-      (movable, next_squares) = GetSquares(block, pos, rot)
-      if not movable:
-        for i in range(4):
-          screen[pos.X + block.square[rot][i].X][pos.Y + block.square[rot][i].Y] = block.color
-        game_over = 10
-        print(f"Final score: %d" % score)
+
+
+def Fits(t, r, X, Y):
+  ## Collision check with boundaries and dropped blocks, a row mask at a time
+  p = (t * 4 + r) * STRIDE
+  x = X + pieces[p]
+  if x < 0 or X + pieces[p + 1] >= Width:
+    return False
+  j = Y + pieces[p + 2]
+  last = Y + pieces[p + 3]
+  if j < 0 or last >= Height:
+    return False
+  p += 4
+  while j <= last:
+    if rows[j] & (pieces[p] << x):
+      return False
+    j += 1
+    p += 1
+  return True
+
+
+def Lock(t, r, X, Y):
+  ## Add the piece, where it Fits(), to the dropped blocks, or take it
+  ## back out again
+  p = (t * 4 + r) * STRIDE
+  x = X + pieces[p]
+  j = Y + pieces[p + 2]
+  last = Y + pieces[p + 3]
+  p += 4
+  while j <= last:
+    rows[j] ^= pieces[p] << x
+    j += 1
+    p += 1
+
+
+def Paint(t, r, X, Y, c):
+  ## Set the piece's squares to color c
+  p = (t * 4 + r) * STRIDE + 8
+  for n in range(4):
+    j = Y + pieces[p + 1]
+    cells[j * Width + X + pieces[p]] = c
+    dirty[j] |= 1 << (X + pieces[p])
+    p += 2
+
+
+def ReviseScreen():
+  ## Move the piece to nextX, nextY, nextRot if it fits there
+  global posX, posY, rot, piece, color, game_over, score
+  if nextX == posX and nextY == posY and nextRot == rot:
+    return
+  if Fits(piece, nextRot, nextX, nextY):
+    Paint(piece, rot, posX, posY, 0)
+    Paint(piece, nextRot, nextX, nextY, color)
+    posX = nextX
+    posY = nextY
+    rot = nextRot
+  elif (nextY == posY + 1):
+    Lock(piece, rot, posX, posY)
+    DeleteLine()
+    PutStartPos()
+    if not Fits(piece, rot, posX, posY):
+      Paint(piece, rot, posX, posY, color)
+      game_over = 10
+      print(f"Final score: %d" % score)
+    else:
+      Paint(piece, rot, posX, posY, color)
   if game_over <= 0:
     Draw()
 
 
+def AiReset():
+  ## Start planning for a new piece
+  global aiR, aiX, aiStep, aiBest, aiBestR, aiBestX, aiSpent, aiDone, aiTries, aiDrop
+  aiR = 0
+  aiX = posX
+  aiStep = -1
+  aiBest = -1 << 29
+  aiBestR = rot
+  aiBestX = posX
+  aiSpent = 0
+  aiDone = False
+  aiTries = 0
+  aiDrop = False
+
+
+def AiScore():
+  ## Weighted score of the dropped blocks, full rows counted as cleared
+  lines = 0
+  for j in range(Height):
+    if rows[j] == FULL:
+      lines += 1
+  for i in range(Width):
+    heights[i] = 0
+  left = Height - lines   # rows from this one down once they are cleared
+  seen = 0                # columns with a block above
+  holes = 0
+  for j in range(Height):
+    r = rows[j]
+    if r != FULL:
+      m = r & ~seen       # columns whose top block is in this row
+      i = 0
+      while m:
+        if m & 1:
+          heights[i] = left
+        m >>= 1
+        i += 1
+      m = seen & ~r
+      while m:
+        m &= m - 1
+        holes += 1
+      seen |= r
+      left -= 1
+  height = heights[0]
+  bumps = 0
+  for i in range(1, Width):
+    height += heights[i]
+    bumps += abs(heights[i] - heights[i - 1])
+  return W_LINES * lines + W_HEIGHT * height + W_HOLES * holes + W_BUMPS * bumps
+
+
+def AiPlan():
+  ## Score placements of the falling piece for up to AI_TICK_US, each
+  ## rotation in place, then the columns it can slide to either side
+  global aiR, aiX, aiStep, aiBest, aiBestR, aiBestX, aiSpent, aiDone
+  t0 = utime.ticks_us()
+  while aiR < numRotate:
+    if Fits(piece, aiR, aiX, posY):
+      X = aiX
+      Y = posY
+      aiX += aiStep
+      while Fits(piece, aiR, X, Y + 1):
+        Y += 1
+      Lock(piece, aiR, X, Y)
+      score = AiScore()
+      Lock(piece, aiR, X, Y)
+      if score > aiBest:
+        aiBest = score
+        aiBestR = aiR
+        aiBestX = X
+    elif aiStep < 0 and aiX != posX:
+      aiX = posX + 1
+      aiStep = 1
+    else:
+      aiR += 1
+      aiX = posX
+      aiStep = -1
+    dt = utime.ticks_diff(utime.ticks_us(), t0)
+    if dt > AI_TICK_US:
+      aiSpent += dt
+      aiDone = aiSpent > AI_PIECE_US
+      return
+  aiSpent += utime.ticks_diff(utime.ticks_us(), t0)
+  aiDone = True
+
+
+def AiTick():
+  ## The demo player's buttons: plan, then rotate, move and drop the piece
+  global demo, idle, but_A, but_LEFT, but_RIGHT, aiTries, aiDrop
+  if (buttons.left.value() == Pin.DRIVE_0 or buttons.right.value() == Pin.DRIVE_0
+      or buttons.b.value() == Pin.DRIVE_0):
+    demo = False
+    idle = 0
+    return
+  if not aiDone:
+    AiPlan()
+    return
+  ClearKeys()
+  aiTries += 1
+  if aiTries > AI_TRIES:
+    aiDrop = True     # blocked on the way, drop it where it is
+  elif rot != aiBestR:
+    but_A = True
+  elif posX > aiBestX:
+    but_LEFT = True
+  elif posX < aiBestX:
+    but_RIGHT = True
+  else:
+    aiDrop = True
+
+
 def ResetGame():
   global game_over, game_speed, buttons, Height, Width, score, lvl
-  global turbo, screen, pos, block, rot
+  global turbo, rows, cells, rot
   ## Reset for new game
   for j in range(Height):
-    for i in range(Width):
-      screen[i][j] = 0
-      prev_screen[i][j] = 0
+    rows[j] = 0
+    dirty[j] = 0
+  for k in range(Width * Height):
+    cells[k] = 0
+    prev_cells[k] = 0
   game_over = 0
   score = 0
   game_speed = game_speed_init
   lvl = 1
   PutStartPos()
-  for i in range(4):
-    screen[pos.X + block.square[rot][i].X][pos.Y + block.square[rot][i].Y] = block.color
+  Paint(piece, rot, posX, posY, color)
   DrawFrame()
   Draw(refresh=True)
 
@@ -308,13 +529,12 @@ def setup():
     TD.tft.rotation(0)
     DrawFrame()
     PutStartPos()
-    for i in range(block.numRotate):
-      screen[pos.X + block.square[rot][i].X][pos.Y + block.square[rot][i].Y] = block.color
+    Paint(piece, rot, posX, posY, color)
     Draw(refresh=True)
 
 
 def loop():
-  global game_over, buttons, game_speed, turbo, pos, rot
+  global game_over, buttons, game_speed, turbo, idle
   if game_over > 0:
     GameOver() 
     if (buttons.left.value() == Pin.DRIVE_0) or game_over == 1:
@@ -323,13 +543,15 @@ def loop():
       game_over += 1000  # let user revel in their score a bit longer
     game_over -= 1
     return
-  KeyPadLoop()
+  if demo:
+    AiTick()
+  elif KeyPadLoop():
+    idle = 0
   if game_over <= 0:
-    (next_pos, next_rot) = GetNextPosRot(rot)
-    ReviseScreen(next_pos, next_rot)
-    gc.collect()
+    GetNextPosRot()
+    ReviseScreen()
     if not turbo:
-      utime.sleep(game_speed / 1000.0)
+      utime.sleep_ms(game_speed)
 
 #========================================================================
 # main
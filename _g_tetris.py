@@ -30,6 +30,10 @@ from utime import sleep_ms
 # all dislplay, buttons, paddle, sound logics are in gameESP.mpy module
 from gameESP import *
 g=gameESP(rotation=0)
+# sound effects, compiled once so playing one does not allocate
+SFX_LINE = g.compileSfx(('c4', 100, 'e4', 100, 'g4', 100, 'e4', 100, 'c4', 100))
+SFX_LIFE = g.compileSfx(('g4', 100, 'e4', 100, 'c4', 100))
+SFX_OVER = g.compileSfx(('c4', 100, 'e4', 100, 'g4', 100))
 
 g.frameRate = 30
 g.bgm = 3
@@ -59,6 +63,10 @@ bgmBuf= [
     329,4,261,4,293,4,246,4,261,4,220,4,207,4,246,4,329,4,261,4,293,4,246,4,261,2,329,2,440,4,415,6,0,2,
     g.songLoop]
     ]
+# compile the songs to frequency/duration arrays once, then free the lists
+bgmSongs = [g.compileSong(song) for song in bgmBuf]
+del bgmBuf
+gc.collect()
 
 size = width, height = 80, 160
 color ={'black': st7789.BLACK, 'white': st7789.WHITE}
@@ -252,7 +260,7 @@ exitGame = False
 demo = False
 while not exitGame:
 
-  g.startSong(bgmBuf[g.bgm])
+  g.startSong(bgmSongs[g.bgm])
 
   #menu screen
   while True:
@@ -295,7 +303,7 @@ while not exitGame:
     elif g.justPressed(g.btnB) :
         g.bgm = 0 if g.bgm >= g.maxBgm else g.bgm + 1
         if g.bgm :
-            g.startSong(bgmBuf[g.bgm])
+            g.startSong(bgmSongs[g.bgm])
         else :
             g.stopSong()
     sleep_ms(10)
@@ -325,15 +333,13 @@ while not exitGame:
             gameOver = True
             break
         else :
-           g.playTone('g4', 100)
-           g.playTone('e4', 100)
-           g.playTone('c4', 100)
+           g.mixer.playSfx(SFX_LIFE, 1)
            # g.display.show()
            sleep_ms(2000)
            reset_board()
            g.bgm = 0 if g.bgm >= g.maxBgm else g.bgm + 1
            if g.bgm :
-                g.startSong(bgmBuf[g.bgm])
+                g.startSong(bgmSongs[g.bgm])
            continue
 
     while True:
@@ -402,20 +408,14 @@ while not exitGame:
                 score+=10
                 drawScore()
                 # g.display.show()
-                g.playTone('c4', 100)
-                g.playTone('e4', 100)
-                g.playTone('g4', 100)
-                g.playTone('e4', 100)
-                g.playTone('c4', 100)
+                g.mixer.playSfx(SFX_LINE)
         # g.display.show()
 
   if gameOver :
        g.display.fill_rect(20, 120, 90, 35, st7789.RED)
        g.display.text(font, "Game Over", 30, 130, st7789.BLUE, st7789.RED)
        # g.display.show()
-       g.playTone('c4', 100)
-       g.playTone('e4', 100)
-       g.playTone('g4', 100)
+       g.mixer.playSfx(SFX_OVER, 1)
        sleep_ms(2000)
 if g.ESP32 :
     g.deinit()
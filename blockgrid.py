@@ -0,0 +1,192 @@
+# blockgrid.py
+#
+# A grid of breakable blocks with swept collision for fast balls.
+#
+# Blocks are w x h pixels, one per cell of a cols x rows grid whose cells
+# are dx x dy pixels from x0, y0.  alive is a bytearray, one byte per
+# cell in row order holding the block's hit points left (0 for none), and
+# kind another with the block's type (see levelpack).  count and masks (a
+# bit per column, one int per row) follow alive as long as blocks come and
+# go through add(), damage() and remove(), so "any blocks left?" and
+# "anything in this row?" are O(1).
+#
+# sweep() moves a square ball one frame along its velocity and stops at
+# the first live block on the way, bounces off the face it meets and
+# carries on for the rest of the frame, so a ball faster than a block is
+# thick still hits it, and a ball that meets two blocks in a frame hits
+# them in the order it reaches them.  Only the cells under the ball's
+# path are looked at.
+#
+# Positions and velocities are fixed point (see kinematics), like the
+# EntityPool columns sweep() works on, and it never allocates: products
+# stay below 2**30 for balls up to 16 pixels a frame.
+#
+#       from blockgrid import BlockGrid
+#       grid = BlockGrid(0, 20, 9, 10, 15, 8, 15, 7)
+#       grid.add(k)
+#       ...
+#       grid.sweep(balls.x, balls.y, balls.vx, balls.vy, i, 3, hit)
+
+from array import array
+from micropython import const
+from kinematics import FP, scale
+
+# times are in 1/FRAME of a frame, finer than FP so a ball that only
+# clips a block's corner still hits it
+TB = const(14)
+FRAME = const(1 << TB)
+NEVER = const(1 << 24)      # a time after any frame's end
+HITS = const(4)             # blocks a ball can hit in one frame
+
+
+class BlockGrid(object):
+    def __init__(self, x0, y0, cols, rows, dx, dy, w, h):
+        self.x0 = x0
+        self.y0 = y0
+        self.cols = cols
+        self.rows = rows
+        self.dx = dx
+        self.dy = dy
+        self.w = w
+        self.h = h
+        self.alive = bytearray(cols * rows)
+        self.kind = bytearray(cols * rows)
+        self.masks = array('I', [0] * rows)
+        self.count = 0
+
+    def clear(self):
+        alive = self.alive
+        for k in range(len(alive)) :
+            alive[k] = 0
+        for r in range(self.rows) :
+            self.masks[r] = 0
+        self.count = 0
+
+    def add(self, k, hits=1, kind=0):
+        if not self.alive[k] :
+            self.count += 1
+            r = k // self.cols
+            self.masks[r] |= 1 << (k - r * self.cols)
+        self.alive[k] = hits
+        self.kind[k] = kind
+
+    def damage(self, k):
+        # take a hit point off block k, returns the hit points left
+        hits = self.alive[k] - 1
+        if hits > 0 :
+            self.alive[k] = hits
+            return hits
+        self.remove(k)
+        return 0
+
+    def remove(self, k):
+        if self.alive[k] :
+            self.alive[k] = 0
+            self.count -= 1
+            r = k // self.cols
+            self.masks[r] &= ~(1 << (k - r * self.cols))
+
+    def sweep(self, xs, ys, vxs, vys, i, size, hit):
+        # Move the size x size pixel ball i of the xs, ys, vxs, vys
+        # columns one frame, bouncing off the live blocks it meets.  Each
+        # block hit is damage()d and passed to hit(k) at once, alive[k]
+        # is 0 if that broke it.  Returns the number of blocks hit.
+        x0 = self.x0
+        y0 = self.y0
+        cols = self.cols
+        dx = self.dx
+        dy = self.dy
+        w = self.w
+        h = self.h
+        masks = self.masks
+        x = xs[i]
+        y = ys[i]
+        vx = vxs[i]
+        vy = vys[i]
+        left = FRAME    # of the frame
+        hits = 0
+        while hits < HITS :
+            # the cells under the box the ball sweeps for the rest of the
+            # frame
+            ex = x + (vx * left >> TB)
+            ey = y + (vy * left >> TB)
+            c0 = max(0, ((min(x, ex) >> FP) - x0) // dx)
+            c1 = min(cols - 1, (((max(x, ex) - 1) >> FP) + size - x0) // dx)
+            r0 = max(0, ((min(y, ey) >> FP) - y0) // dy)
+            r1 = min(self.rows - 1, (((max(y, ey) - 1) >> FP) + size - y0) // dy)
+            if c1 < c0 :
+                break
+            best = -1
+            bt = left
+            bax = 0
+            bay = 0
+            for r in range(r0, r1 + 1) :
+                m = masks[r]
+                if not m >> c0 & ((2 << (c1 - c0)) - 1) :
+                    continue
+                # the ball's y range overlapping the row's blocks
+                top = (y0 + r * dy - size) << FP
+                bottom = (y0 + r * dy + h) << FP
+                if vy > 0 :
+                    tyin = scale(top - y, FRAME, vy)
+                    tyout = scale(bottom - y, FRAME, vy)
+                elif vy < 0 :
+                    tyin = scale(bottom - y, FRAME, vy)
+                    tyout = scale(top - y, FRAME, vy)
+                elif top < y < bottom :
+                    tyin = -NEVER
+                    tyout = NEVER
+                else :
+                    continue
+                for c in range(c0, c1 + 1) :
+                    if m >> c & 1 :
+                        lo = (x0 + c * dx - size) << FP
+                        hi = lo + ((size + w) << FP)
+                        if vx > 0 :
+                            txin = scale(lo - x, FRAME, vx)
+                            txout = scale(hi - x, FRAME, vx)
+                        elif vx < 0 :
+                            txin = scale(hi - x, FRAME, vx)
+                            txout = scale(lo - x, FRAME, vx)
+                        elif lo < x < hi :
+                            txin = -NEVER
+                            txout = NEVER
+                        else :
+                            txin = NEVER
+                            txout = -NEVER
+                        # overlapping from the later entry to the earlier
+                        # exit, a ball already inside hits at once
+                        t = max(txin, tyin, 0)
+                        if t < bt and t < txout and t < tyout :
+                            best = r * cols + c
+                            bt = t
+                            # the face hit is on the axis entered last,
+                            # both on a corner
+                            bax = txin >= tyin
+                            bay = tyin >= txin
+            if best < 0 :
+                break
+            # move to the block and bounce off it
+            x += vx * bt >> TB
+            y += vy * bt >> TB
+            left -= bt
+            r = best // cols
+            c = best - r * cols
+            if bax :
+                x = (x0 + c * dx - size) << FP if vx > 0 else (x0 + c * dx + w) << FP
+                vx = -vx
+            if bay :
+                y = (y0 + r * dy - size) << FP if vy > 0 else (y0 + r * dy + h) << FP
+                vy = -vy
+            self.damage(best)
+            hits += 1
+            hit(best)
+        if hits == HITS :
+            # out of hits: stop at the last block rather than go through
+            # the next
+            left = 0
+        xs[i] = x + (vx * left >> TB)
+        ys[i] = y + (vy * left >> TB)
+        vxs[i] = vx
+        vys[i] = vy
+        return hits
@@ -0,0 +1,208 @@
+# drawstats.py
+#
+# Draw call and SPI byte accounting for the st7789 driver.
+#
+# DrawStats wraps the display object handed out by tft_config.config() and
+# counts calls, pixels written and estimated bus bytes per primitive, for
+# the whole app and per frame.  Everything it does not count is passed
+# straight to the driver.  Turn it on before launching an app:
+#
+#       import tft_config
+#       tft_config.STATS = True
+#       exec(open('_g_flappybird.py').read())
+#       tft_config.last.dump()
+#
+# Frames are closed by frame(), gameESP.display_and_wait() calls it.
+#
+# Bus bytes are estimated the way st7789_mpy talks to the panel: every
+# window costs CASET, RASET and RAMWR (11 bytes), every pixel 2.  text()
+# and write() open one window per character, line() and polygon() one per
+# pixel.
+
+from array import array
+from micropython import const
+
+WINDOW = const(11)
+
+# primitives, indexes into the counter arrays
+P_FILL_RECT   = const(0)
+P_FILL        = const(1)
+P_RECT        = const(2)
+P_HLINE       = const(3)
+P_VLINE       = const(4)
+P_PIXEL       = const(5)
+P_LINE        = const(6)
+P_POLYGON     = const(7)
+P_TEXT        = const(8)
+P_WRITE       = const(9)
+P_BLIT_BUFFER = const(10)
+P_JPG         = const(11)
+P_COUNT       = const(12)
+
+NAMES = ('fill_rect', 'fill', 'rect', 'hline', 'vline', 'pixel', 'line',
+         'polygon', 'text', 'write', 'blit_buffer', 'jpg')
+
+
+class DrawStats(object):
+    def __init__(self, display):
+        self.display = display
+        self.w = display.width()
+        self.h = display.height()
+        # app totals, the frame being drawn, the last frame and the worst
+        # frame (by bytes) per primitive
+        self.calls = array('I', [0] * P_COUNT)
+        self.pixels = array('I', [0] * P_COUNT)
+        self.bytes = array('I', [0] * P_COUNT)
+        self.frameCalls = array('I', [0] * P_COUNT)
+        self.framePixels = array('I', [0] * P_COUNT)
+        self.frameBytes = array('I', [0] * P_COUNT)
+        self.lastCalls = array('I', [0] * P_COUNT)
+        self.lastPixels = array('I', [0] * P_COUNT)
+        self.lastBytes = array('I', [0] * P_COUNT)
+        self.maxBytes = array('I', [0] * P_COUNT)
+        self.frames = 0
+        self.jpgSizes = {}
+
+    def __getattr__(self, name):
+        # anything not counted goes straight to the driver
+        return getattr(self.display, name)
+
+    def count(self, p, calls, pixels, windows):
+        b = pixels * 2 + windows * WINDOW
+        self.frameCalls[p] += calls
+        self.framePixels[p] += pixels
+        self.frameBytes[p] += b
+
+    def area(self, x, y, w, h):
+        # pixels of x, y, w, h on the screen
+        w = min(x + w, self.w) - max(x, 0)
+        h = min(y + h, self.h) - max(y, 0)
+        return w * h if w > 0 and h > 0 else 0
+
+    def frame(self):
+        # Close the frame, remembering it as the last and worst frame
+        for p in range(P_COUNT) :
+            b = self.frameBytes[p]
+            self.lastCalls[p] = self.frameCalls[p]
+            self.lastPixels[p] = self.framePixels[p]
+            self.lastBytes[p] = b
+            if b > self.maxBytes[p] :
+                self.maxBytes[p] = b
+        self.fold()
+        self.frames += 1
+
+    def fold(self):
+        # add the frame's counters to the app totals
+        for p in range(P_COUNT) :
+            self.calls[p] += self.frameCalls[p]
+            self.pixels[p] += self.framePixels[p]
+            self.bytes[p] += self.frameBytes[p]
+            self.frameCalls[p] = 0
+            self.framePixels[p] = 0
+            self.frameBytes[p] = 0
+
+    def reset(self):
+        for a in (self.calls, self.pixels, self.bytes, self.frameCalls,
+                  self.framePixels, self.frameBytes, self.lastCalls,
+                  self.lastPixels, self.lastBytes, self.maxBytes) :
+            for p in range(P_COUNT) :
+                a[p] = 0
+        self.frames = 0
+
+    def dump(self):
+        # Print the counters over serial.  Draws since the last frame() are
+        # added to the totals first.
+        self.fold()
+        frames = max(1, self.frames)
+        total = 0
+        for p in range(P_COUNT) :
+            total += self.bytes[p]
+        print ("draw stats: %d frames, %d bytes, %d bytes/frame" % (frames, total, total // frames))
+        print ("%-12s %8s %9s %10s %5s %8s %8s %8s" % ('primitive', 'calls', 'pixels', 'bytes', '%', 'B/frame', 'last', 'max'))
+        for p in range(P_COUNT) :
+            if self.calls[p] :
+                print ("%-12s %8d %9d %10d %5.1f %8d %8d %8d" % (
+                    NAMES[p], self.calls[p], self.pixels[p], self.bytes[p],
+                    100 * self.bytes[p] / max(1, total), self.bytes[p] // frames,
+                    self.lastBytes[p], self.maxBytes[p]))
+
+    # ---- counted primitives ----
+
+    def rotation(self, r):
+        self.display.rotation(r)
+        self.w = self.display.width()
+        self.h = self.display.height()
+
+    def fill_rect(self, x, y, w, h, color):
+        self.count(P_FILL_RECT, 1, self.area(x, y, w, h), 1)
+        self.display.fill_rect(x, y, w, h, color)
+
+    def fill(self, color):
+        self.count(P_FILL, 1, self.w * self.h, 1)
+        self.display.fill(color)
+
+    def rect(self, x, y, w, h, color):
+        self.count(P_RECT, 1, self.area(x, y, w, 1) * 2 + self.area(x, y, 1, h) * 2, 4)
+        self.display.rect(x, y, w, h, color)
+
+    def hline(self, x, y, w, color):
+        self.count(P_HLINE, 1, self.area(x, y, w, 1), 1)
+        self.display.hline(x, y, w, color)
+
+    def vline(self, x, y, h, color):
+        self.count(P_VLINE, 1, self.area(x, y, 1, h), 1)
+        self.display.vline(x, y, h, color)
+
+    def pixel(self, x, y, color):
+        self.count(P_PIXEL, 1, 1, 1)
+        self.display.pixel(x, y, color)
+
+    def line(self, x0, y0, x1, y1, color):
+        n = max(abs(x1 - x0), abs(y1 - y0)) + 1
+        self.count(P_LINE, 1, n, n)
+        self.display.line(x0, y0, x1, y1, color)
+
+    def polygon(self, points, x, y, color, *args):
+        # measured on the unrotated outline, rotation barely changes it
+        n = 0
+        for i in range(len(points) - 1) :
+            n += max(abs(points[i + 1][0] - points[i][0]), abs(points[i + 1][1] - points[i][1])) + 1
+        self.count(P_POLYGON, 1, n, n)
+        self.display.polygon(points, x, y, color, *args)
+
+    def text(self, font, s, x, y, *args):
+        n = 1 if isinstance(s, int) else len(s)
+        self.count(P_TEXT, 1, self.area(x, y, n * font.WIDTH, font.HEIGHT), n)
+        self.display.text(font, s, x, y, *args)
+
+    def write(self, font, s, x, y, *args):
+        w = self.display.write_len(font, s)
+        self.count(P_WRITE, 1, self.area(x, y, w, font.HEIGHT), len(s))
+        return self.display.write(font, s, x, y, *args)
+
+    def blit_buffer(self, buffer, x, y, w, h):
+        self.count(P_BLIT_BUFFER, 1, self.area(x, y, w, h), 1)
+        self.display.blit_buffer(buffer, x, y, w, h)
+
+    def jpg(self, filename, x, y, *args):
+        size = self.jpgSizes.get(filename)
+        if size is None :
+            size = self.jpgSizes[filename] = jpgSize(filename)
+        # one window per 8 line strip of MCUs
+        self.count(P_JPG, 1, self.area(x, y, size[0], size[1]), (size[1] + 7) // 8)
+        self.display.jpg(filename, x, y, *args)
+
+
+def jpgSize(filename):
+    # width and height from a JPEG's start of frame marker, (0, 0) if none
+    with open(filename, 'rb') as f :
+        f.read(2)
+        while True :
+            head = f.read(4)
+            if len(head) < 4 or head[0] != 0xFF :
+                return (0, 0)
+            length = head[2] << 8 | head[3]
+            if 0xC0 <= head[1] <= 0xCF and head[1] not in (0xC4, 0xC8, 0xCC) :
+                sof = f.read(5)
+                return (sof[3] << 8 | sof[4], sof[1] << 8 | sof[2])
+            f.read(length - 2)
@@ -0,0 +1,186 @@
+# entitypool.py
+#
+# Fixed capacity entity pool for games, stored as a struct of arrays.
+#
+# Missiles, balls, powerups and the like live in one pool per kind of
+# object instead of one heap object (or list) each.  Every column is a
+# preallocated array indexed by slot number, so creating and destroying
+# entities during play only pushes and pops slot numbers on a free list
+# and never feeds the garbage collector.
+#
+# Positions and velocities are fixed point with FP fraction bits
+# (x >> FP is the pixel column, see kinematics), sizes are in pixels.
+#
+#       from entitypool import EntityPool, FP
+#       shots = EntityPool(16)
+#       i = shots.alloc(x << FP, y << FP, 0, -2 << FP, 2, 4, color=st7789.CYAN, life=30)
+#       ...
+#       shots.erase(tft)
+#       shots.update()
+#       shots.draw(tft)
+
+import gc
+from array import array
+from micropython import const
+from utime import ticks_us, ticks_diff
+from kinematics import FP
+
+# flags
+ALIVE = const(0x01)
+WRAP  = const(0x02)    # wrap around at the pool bounds
+CULL  = const(0x04)    # released on leaving the pool bounds
+HIDE  = const(0x08)    # skipped by draw() and erase()
+
+
+class EntityPool(object):
+    def __init__(self, capacity, width=240, height=135):
+        self.capacity = capacity
+        self.width = width << FP
+        self.height = height << FP
+        self.x = array('i', [0] * capacity)
+        self.y = array('i', [0] * capacity)
+        self.vx = array('i', [0] * capacity)
+        self.vy = array('i', [0] * capacity)
+        self.w = array('h', [0] * capacity)
+        self.h = array('h', [0] * capacity)
+        self.life = array('h', [0] * capacity)   # frames left, 0 = forever
+        self.color = array('H', [0] * capacity)
+        self.flags = bytearray(capacity)
+        self.kind = bytearray(capacity)
+        # free slots are a stack, lowest numbers on top
+        self.free = array('h', range(capacity - 1, -1, -1))
+        self.nfree = capacity
+        self.count = 0
+        self.top = 0            # one past the highest slot ever used
+
+    def alloc(self, x, y, vx=0, vy=0, w=1, h=1, kind=0, color=0, life=0, flags=0):
+        # Returns the new entity's slot, or -1 if the pool is full
+        if not self.nfree :
+            return -1
+        self.nfree -= 1
+        i = self.free[self.nfree]
+        self.x[i] = x
+        self.y[i] = y
+        self.vx[i] = vx
+        self.vy[i] = vy
+        self.w[i] = w
+        self.h[i] = h
+        self.kind[i] = kind
+        self.color[i] = color
+        self.life[i] = life
+        self.flags[i] = flags | ALIVE
+        self.count += 1
+        if i >= self.top :
+            self.top = i + 1
+        return i
+
+    def release(self, i):
+        if self.flags[i] & ALIVE :
+            self.flags[i] = 0
+            self.free[self.nfree] = i
+            self.nfree += 1
+            self.count -= 1
+
+    def clear(self):
+        for i in range(self.top) :
+            self.release(i)
+
+    def alive(self, i):
+        return self.flags[i] & ALIVE
+
+    def update(self):
+        # Move every entity by its velocity, count down lives and apply the
+        # WRAP/CULL bounds.  Expired or culled entities are released.
+        x = self.x
+        y = self.y
+        vx = self.vx
+        vy = self.vy
+        life = self.life
+        flags = self.flags
+        width = self.width
+        height = self.height
+        for i in range(self.top) :
+            f = flags[i]
+            if not f & ALIVE :
+                continue
+            if life[i] :
+                life[i] -= 1
+                if not life[i] :
+                    self.release(i)
+                    continue
+            nx = x[i] + vx[i]
+            ny = y[i] + vy[i]
+            if f & WRAP :
+                nx %= width
+                ny %= height
+            elif f & CULL and (nx < 0 or nx >= width or ny < 0 or ny >= height) :
+                self.release(i)
+                continue
+            x[i] = nx
+            y[i] = ny
+
+    def draw(self, display):
+        self.fill(display, -1)
+
+    def erase(self, display, color=0):
+        self.fill(display, color)
+
+    def fill(self, display, color):
+        # color -1 draws each entity in its own colour
+        x = self.x
+        y = self.y
+        w = self.w
+        h = self.h
+        flags = self.flags
+        for i in range(self.top) :
+            if flags[i] & (ALIVE | HIDE) == ALIVE :
+                display.fill_rect(x[i] >> FP, y[i] >> FP, w[i], h[i],
+                                  self.color[i] if color < 0 else color)
+
+    def hit(self, i, x, y, w, h):
+        # True if entity i overlaps the pixel rectangle x, y, w, h
+        ex = self.x[i] >> FP
+        ey = self.y[i] >> FP
+        return ex < x + w and x < ex + self.w[i] and ey < y + h and y < ey + self.h[i]
+
+
+def benchGC(count=64, frames=300):
+    # Churn count short-lived entities for frames frames, first as a list of
+    # [x, y, vx, vy] lists (as the games did) and then in an EntityPool.
+    # Reports bytes allocated and the gc.collect() pause each leaves behind.
+    # On the host run it with host/benchmodules.py gc, for the real clock.
+    def measure(run):
+        gc.collect()
+        before = gc.mem_alloc() if hasattr(gc, 'mem_alloc') else 0
+        t = ticks_us()
+        run()
+        frame = ticks_diff(ticks_us(), t) / frames
+        used = (gc.mem_alloc() if hasattr(gc, 'mem_alloc') else 0) - before
+        t = ticks_us()
+        gc.collect()
+        return used, ticks_diff(ticks_us(), t), frame
+
+    def lists():
+        shots = []
+        for f in range(frames) :
+            shots.append([120.0, 130.0, (f % 7 - 3) * 0.5, -2.5])
+            for s in list(shots) :
+                s[0] += s[2]
+                s[1] += s[3]
+                if s[1] < 0 :
+                    shots.remove(s)
+
+    pool = EntityPool(count)
+
+    def entities():
+        for f in range(frames) :
+            pool.alloc(120 << FP, 130 << FP, (f % 7 - 3) << (FP - 1), -640, flags=CULL)
+            pool.update()
+
+    gc.disable()
+    try :
+        for name, run in (('lists', lists), ('pool', entities)) :
+            used, pause, frame = measure(run)
+            print ("%s: %d bytes allocated, gc pause %dus, %dus/frame" % (name, used, pause, frame))
+    finally :
+        gc.enable()
@@ -99,12 +99,13 @@
 #
 #-----------------------------------------
 import utime
+from array import array
 from utime import sleep_ms, ticks_ms, ticks_us, ticks_diff
-from machine import Pin, SPI, I2C, PWM, ADC, Timer
-from random import getrandbits, seed
+from machine import Pin, SPI, I2C, PWM, ADC, Timer, disable_irq, enable_irq
 import st7789
 import tft_config
 import vga1_8x16 as font
+from rng import Rng
 
 # MicroPython SSD1306 OLED driver, I2C and SPI interfaces
 
@@ -131,8 +132,18 @@ SET_PRECHARGE       = const(0xd9)
 SET_VCOM_DESEL      = const(0xdb)
 SET_CHARGE_PUMP     = const(0x8d)
 
+# Renderer op kinds
+R_FILL              = const(0)
+R_TEXT              = const(1)
+R_BLIT              = const(2)
+R_DEAD              = const(3)
+
 # Subclassing FrameBuffer provides support for graphics primitives
 # http://docs.micropython.org/en/latest/pyboard/library/framebuf.html
+#
+# Drawing marks the columns it touches in each page dirty, show() then
+# sends only the dirty span of each page.  Call invalidate() after
+# writing self.buffer directly or drawing with methods not wrapped here.
 class SSD1306(framebuf.FrameBuffer):
     def __init__(self, width, height, external_vcc):
         self.width = width
@@ -140,6 +151,13 @@ class SSD1306(framebuf.FrameBuffer):
         self.external_vcc = external_vcc
         self.pages = self.height // 8
         self.buffer = bytearray(self.pages * self.width)
+        self.mv = memoryview(self.buffer)
+        # dirty columns per page, lo > hi when the page is clean
+        self.lo = bytearray(self.pages)
+        self.hi = bytearray(self.pages)
+        # one command transaction, cmd[0] is left for the I2C control byte
+        self.cmd = bytearray(8)
+        self.cmdmv = memoryview(self.cmd)
         super().__init__(self.buffer, self.width, self.height, framebuf.MONO_VLSB)
         self.init_display()
 
@@ -177,40 +195,133 @@ class SSD1306(framebuf.FrameBuffer):
         self.write_cmd(SET_DISP | 0x01)
 
     def contrast(self, contrast):
-        self.write_cmd(SET_CONTRAST)
-        self.write_cmd(contrast)
+        self.cmd[1] = SET_CONTRAST
+        self.cmd[2] = contrast
+        self.write_cmds(2)
 
     def invert(self, invert):
         self.write_cmd(SET_NORM_INV | (invert & 1))
 
+    def write_cmd(self, cmd):
+        self.cmd[1] = cmd
+        self.write_cmds(1)
+
+    # ---- dirty tracking ----
+
+    def mark(self, x, y, w, h):
+        x0 = max(x, 0)
+        x1 = min(x + w, self.width) - 1
+        y0 = max(y, 0)
+        y1 = min(y + h, self.height) - 1
+        if x0 > x1 or y0 > y1 :
+            return
+        lo = self.lo
+        hi = self.hi
+        for p in range(y0 >> 3, (y1 >> 3) + 1) :
+            if x0 < lo[p] :
+                lo[p] = x0
+            if x1 > hi[p] :
+                hi[p] = x1
+
+    def invalidate(self):
+        for p in range(self.pages) :
+            self.lo[p] = 0
+            self.hi[p] = self.width - 1
+
+    def fill(self, c):
+        super().fill(c)
+        self.invalidate()
+
+    def pixel(self, x, y, c=None):
+        if c is None :
+            return super().pixel(x, y)
+        super().pixel(x, y, c)
+        self.mark(x, y, 1, 1)
+
+    def hline(self, x, y, w, c):
+        super().hline(x, y, w, c)
+        self.mark(x, y, w, 1)
+
+    def vline(self, x, y, h, c):
+        super().vline(x, y, h, c)
+        self.mark(x, y, 1, h)
+
+    def line(self, x1, y1, x2, y2, c):
+        super().line(x1, y1, x2, y2, c)
+        self.mark(min(x1, x2), min(y1, y2), abs(x2 - x1) + 1, abs(y2 - y1) + 1)
+
+    def rect(self, x, y, w, h, c, *f):
+        super().rect(x, y, w, h, c, *f)
+        self.mark(x, y, w, h)
+
+    def fill_rect(self, x, y, w, h, c):
+        super().fill_rect(x, y, w, h, c)
+        self.mark(x, y, w, h)
+
+    def text(self, s, x, y, c=1):
+        super().text(s, x, y, c)
+        self.mark(x, y, len(s) * 8, 8)
+
+    def blit(self, fbuf, x, y, *args):
+        super().blit(fbuf, x, y, *args)
+        if isinstance(fbuf, SSD1306) :
+            self.mark(x, y, fbuf.width, fbuf.height)
+        else :
+            self.invalidate()
+
+    def scroll(self, xstep, ystep):
+        super().scroll(xstep, ystep)
+        self.invalidate()
+
+    # ---- refresh ----
+
+    def window(self, x0, x1, p0, p1):
+        cmd = self.cmd
+        cmd[1] = SET_COL_ADDR
+        cmd[2] = x0
+        cmd[3] = x1
+        cmd[4] = SET_PAGE_ADDR
+        cmd[5] = p0
+        cmd[6] = p1
+        self.write_cmds(6)
+
     def show(self):
-        x0 = 0
-        x1 = self.width - 1
-        if self.width == 64:
-            # displays with width of 64 pixels are shifted by 32
-            x0 += 32
-            x1 += 32
-        self.write_cmd(SET_COL_ADDR)
-        self.write_cmd(x0)
-        self.write_cmd(x1)
-        self.write_cmd(SET_PAGE_ADDR)
-        self.write_cmd(0)
-        self.write_cmd(self.pages - 1)
-        self.write_data(self.buffer)
+        # Sends the dirty span of every page, or the whole buffer in one
+        # go when every page is fully dirty
+        w = self.width
+        lo = self.lo
+        hi = self.hi
+        # displays with width of 64 pixels are shifted by 32
+        off = 32 if w == 64 else 0
+        full = True
+        for p in range(self.pages) :
+            if lo[p] or hi[p] != w - 1 :
+                full = False
+                break
+        if full :
+            self.window(off, off + w - 1, 0, self.pages - 1)
+            self.write_data(self.buffer)
+        else :
+            for p in range(self.pages) :
+                if lo[p] <= hi[p] :
+                    self.window(off + lo[p], off + hi[p], p, p)
+                    self.write_data(self.mv[p * w + lo[p]:p * w + hi[p] + 1])
+        for p in range(self.pages) :
+            lo[p] = 0xff
+            hi[p] = 0
 
 
 class SSD1306_I2C(SSD1306):
     def __init__(self, width, height, i2c, addr=0x3c, external_vcc=False):
         self.i2c = i2c
         self.addr = addr
-        self.temp = bytearray(2)
         self.write_list = [b'\x40', None] # Co=0, D/C#=1
         super().__init__(width, height, external_vcc)
 
-    def write_cmd(self, cmd):
-        self.temp[0] = 0x80 # Co=1, D/C#=0
-        self.temp[1] = cmd
-        self.i2c.writeto(self.addr, self.temp)
+    def write_cmds(self, n):
+        # n command bytes from cmd[1:] in one transfer
+        self.cmd[0] = 0x00 # Co=0, D/C#=0
+        self.i2c.writeto(self.addr, self.cmdmv[:n + 1])
 
     def write_data(self, buf):
         self.write_list[1] = buf
@@ -227,20 +338,20 @@ class SSD1306_SPI(SSD1306):
         self.dc = dc
         self.res = res
         self.cs = cs
-        import time
         self.res(1)
-        time.sleep_ms(1)
+        sleep_ms(1)
         self.res(0)
-        time.sleep_ms(10)
+        sleep_ms(10)
         self.res(1)
         super().__init__(width, height, external_vcc)
 
-    def write_cmd(self, cmd):
+    def write_cmds(self, n):
+        # n command bytes from cmd[1:] in one transaction
         self.spi.init(baudrate=self.rate, polarity=0, phase=0)
         self.cs(1)
         self.dc(0)
         self.cs(0)
-        self.spi.write(bytearray([cmd]))
+        self.spi.write(self.cmdmv[1:n + 1])
         self.cs(1)
 
     def write_data(self, buf):
@@ -251,6 +362,565 @@ class SSD1306_SPI(SSD1306):
         self.spi.write(buf)
         self.cs(1)
 
+
+def benchSSD1306 (frames=200, width=128, height=64) :
+    # A sprite moving across a 128x64 OLED with a score line, shown every
+    # frame over counting SPI and I2C stand-ins.  Compares bytes, bus
+    # transactions and time per frame for full refreshes against dirty
+    # page spans.  On the host run it with host/benchmodules.py ssd1306,
+    # for the real clock; the byte and transfer counts are the same on both.
+    class Bus(object):
+        def __init__(self):
+            self.bytes = 0
+            self.transfers = 0
+        def init(self, *args, **kwargs):
+            pass
+        def write(self, buf):
+            self.bytes += len(buf)
+            self.transfers += 1
+        def writeto(self, addr, buf):
+            self.write(buf)
+        def writevto(self, addr, bufs):
+            self.transfers += 1
+            for b in bufs :
+                self.bytes += len(b)
+
+    class FakePin(object):
+        OUT = 1
+        def init(self, *args, **kwargs):
+            pass
+        def __call__(self, v):
+            pass
+
+    results = []
+    for name in ('spi', 'i2c') :
+        for full in (True, False) :
+            bus = Bus()
+            if name == 'spi' :
+                oled = SSD1306_SPI(width, height, bus, FakePin(), FakePin(), FakePin())
+            else :
+                oled = SSD1306_I2C(width, height, bus)
+            oled.show()
+            bus.bytes = 0
+            bus.transfers = 0
+            x = 0
+            t = ticks_us()
+            for f in range(frames) :
+                oled.fill_rect(x, 30, 8, 8, 0)
+                x = (x + 1) % (width - 8)
+                oled.fill_rect(x, 30, 8, 8, 1)
+                if not f % 10 :
+                    oled.fill_rect(0, 0, 48, 8, 0)
+                    oled.text(str(f), 0, 0, 1)
+                if full :
+                    oled.invalidate()
+                oled.show()
+            us = ticks_diff(ticks_us(), t) // frames
+            label = '%s %s' % (name, 'full' if full else 'dirty')
+            print ("%-9s %6d bytes/frame %3d transfers/frame %5dus/frame" % (
+                label, bus.bytes // frames, bus.transfers // frames, us))
+            results.append((label, bus.bytes // frames, bus.transfers // frames, us))
+    return results
+
+
+class Mixer(object):
+    # Time-multiplexes a music voice and a sound effect voice on one PWM
+    # output, driven by a single periodic timer.
+    #
+    # Sounds are compiled up front into a schedule: freqs is an array('H')
+    # of frequencies and events an array('H') of (first, count, ticks)
+    # triples, each sounding freqs[first:first+count] for ticks timer ticks.
+    # count 0 is a rest, count > 1 a chord arpeggiated one note per tick.
+    # While an effect sounds the ticks alternate between the two voices and
+    # the music is ducked to duty // duck.
+    tickMs = 5
+    queueLen = 8
+
+    def __init__(self, pwm, timer, duty=0):
+        self.pwm = pwm
+        self.timer = timer
+        self.duty = duty
+        self.duck = 4
+        self.running = False
+        self.tick = 0
+        self.outFreq = 0
+        self.outDuty = 0
+        # music voice
+        self.song = None
+        self.lastSong = None
+        self.songRepeat = False
+        self.songEvent = 0
+        self.songLeft = 0
+        # sound effect voice
+        self.sfx = None
+        self.sfxEvent = 0
+        self.sfxLeft = 0
+        self.sfxPriority = 0
+        # effects waiting, highest priority first, in preallocated slots
+        self.sfxQueue = [None] * self.queueLen
+        self.sfxQueued = bytearray(self.queueLen)     # their priorities
+        self.sfxWaiting = 0
+
+    def compile(self, pairs):
+        # pairs is a flat sequence of frequency(Hz) or tuple of frequencies,
+        # duration(ms).  Returns (freqs, events).
+        freqs = array('H')
+        events = array('H')
+        for i in range(0, len(pairs) - 1, 2) :
+            ticks = (pairs[i+1] + self.tickMs // 2) // self.tickMs
+            if ticks <= 0 :
+                continue
+            chord = pairs[i] if isinstance(pairs[i], tuple) else (pairs[i],)
+            first = len(freqs)
+            for f in chord :
+                if f :
+                    freqs.append(f)
+            events.append(first)
+            events.append(len(freqs) - first)
+            events.append(min(ticks, 0xffff))
+        return freqs, events
+
+    def start(self):
+        if not self.running :
+            self.running = True
+            self.timer.init(period=self.tickMs, mode=Timer.PERIODIC, callback=self.handleTick)
+
+    def stop(self):
+        self.timer.deinit()
+        self.running = False
+        self.song = None
+        self.sfx = None
+        self.clearQueue()
+        self.output(0, 0)
+
+    def deinit(self):
+        self.stop()
+
+    def startSong(self, song, repeat=True):
+        state = disable_irq()
+        self.song = song
+        self.lastSong = song
+        self.songRepeat = repeat
+        self.songEvent = -3
+        self.songLeft = 0
+        enable_irq(state)
+        self.start()
+
+    def stopSong(self):
+        self.song = None
+
+    def playSfx(self, sfx, priority=0):
+        # sfx is a compiled (freqs, events), queued without allocating
+        if not sfx[1] :
+            return False
+        state = disable_irq()
+        q = self.sfxQueue
+        p = self.sfxQueued
+        if self.sfx is not None and priority > self.sfxPriority :
+            # preempt: drop the effect playing and anything queued below
+            while self.sfxWaiting and p[self.sfxWaiting - 1] < priority :
+                self.unqueue(self.sfxWaiting - 1)
+            self.sfx = None
+        i = self.sfxWaiting
+        while i and p[i-1] < priority :
+            i -= 1
+        if self.sfxWaiting >= self.queueLen :
+            if i == self.sfxWaiting :
+                enable_irq(state)
+                return False
+            self.unqueue(self.sfxWaiting - 1)
+        for j in range(self.sfxWaiting, i, -1) :
+            q[j] = q[j-1]
+            p[j] = p[j-1]
+        q[i] = sfx
+        p[i] = priority
+        self.sfxWaiting += 1
+        enable_irq(state)
+        self.start()
+        return True
+
+    def unqueue(self, i):
+        # drop queue slot i, moving the ones after it up
+        n = self.sfxWaiting - 1
+        q = self.sfxQueue
+        p = self.sfxQueued
+        for j in range(i, n) :
+            q[j] = q[j+1]
+            p[j] = p[j+1]
+        q[n] = None
+        self.sfxWaiting = n
+
+    def clearQueue(self):
+        for i in range(self.sfxWaiting) :
+            self.sfxQueue[i] = None
+        self.sfxWaiting = 0
+
+    def stopSfx(self):
+        state = disable_irq()
+        self.clearQueue()
+        self.sfx = None
+        enable_irq(state)
+
+    def stepSong(self):
+        freqs, events = self.song
+        if not self.songLeft :
+            e = self.songEvent + 3
+            if e >= len(events) :
+                if not self.songRepeat :
+                    self.song = None
+                    return 0
+                e = 0   # repeat from first note
+            self.songEvent = e
+            self.songLeft = events[e+2]
+        self.songLeft -= 1
+        e = self.songEvent
+        n = events[e+1]
+        if not n :
+            return 0
+        return freqs[events[e] + (events[e+2] - self.songLeft - 1) % n]
+
+    def stepSfx(self):
+        if not self.sfxLeft or self.sfx is None :
+            e = self.sfxEvent + 3
+            if self.sfx is None or e >= len(self.sfx[1]) :
+                if not self.sfxWaiting :
+                    self.sfx = None
+                    return 0
+                self.sfxPriority = self.sfxQueued[0]
+                self.sfx = self.sfxQueue[0]
+                self.unqueue(0)
+                e = 0
+            self.sfxEvent = e
+            self.sfxLeft = self.sfx[1][e+2]
+        self.sfxLeft -= 1
+        freqs, events = self.sfx
+        e = self.sfxEvent
+        n = events[e+1]
+        if not n :
+            return 0
+        return freqs[events[e] + (events[e+2] - self.sfxLeft - 1) % n]
+
+    def handleTick(self, timer):
+        self.tick += 1
+        music = self.stepSong() if self.song is not None else 0
+        sfx = self.stepSfx() if self.sfx is not None or self.sfxWaiting else 0
+        if sfx and not (music and self.tick & 1) :
+            self.output(sfx, self.duty)
+        elif music :
+            self.output(music, self.duty // self.duck if self.sfx is not None else self.duty)
+        else :
+            self.output(self.outFreq, 0)
+            if self.song is None and self.sfx is None and not self.sfxWaiting :
+                self.timer.deinit()
+                self.running = False
+
+    def output(self, freq, duty):
+        if freq != self.outFreq and freq :
+            self.pwm.freq(freq)
+            self.outFreq = freq
+        if duty != self.outDuty :
+            self.pwm.duty(duty)
+            self.outDuty = duty
+
+
+class Paddle(object):
+    # Samples the paddle potentiometer from a periodic timer so games never
+    # wait on the ADC.  Raw readings go into a ring buffer, each new one is
+    # median-of-3 filtered against the two before it to drop spikes, then
+    # smoothed by an integer IIR (acc keeps the value << shift).  value is
+    # the calibrated 0-1023 position of the latest sample.
+    ringLen = 8
+
+    def __init__(self, adc, timer, periodMs=4, shift=2):
+        self.adc = adc
+        self.timer = timer
+        self.periodMs = periodMs
+        self.shift = shift
+        self.ring = array('H', [0] * self.ringLen)
+        self.pos = 0
+        self.acc = 0
+        self.value = 0
+        self.samples = 0
+        self.running = False
+
+    def start(self):
+        if self.running :
+            return
+        # prime the ring and the filter with real readings
+        raw = self.adc.read()
+        for i in range(self.ringLen) :
+            self.ring[i] = raw
+        self.acc = raw << self.shift
+        self.value = self.calibrate(raw)
+        self.running = True
+        self.timer.init(period=self.periodMs, mode=Timer.PERIODIC, callback=self.sample)
+
+    def stop(self):
+        self.timer.deinit()
+        self.running = False
+
+    def deinit(self):
+        self.stop()
+
+    @staticmethod
+    def calibrate(raw):
+        # ESP32 reads 142 to 3155 across the paddle, raw / 2.935 - 48
+        return max(min(((raw * 349) >> 10) - 48, 1023), 0)
+
+    def sample(self, timer):
+        ring = self.ring
+        pos = self.pos
+        a = ring[(pos - 2) & (self.ringLen - 1)]
+        b = ring[(pos - 1) & (self.ringLen - 1)]
+        c = self.adc.read()
+        ring[pos] = c
+        self.pos = (pos + 1) & (self.ringLen - 1)
+        # median of the last three readings
+        if a > b :
+            a, b = b, a
+        m = b if c > b else (c if c > a else a)
+        self.acc += m - (self.acc >> self.shift)
+        self.value = self.calibrate(self.acc >> self.shift)
+        self.samples += 1
+
+    def jitter(self, count=250):
+        # Hold the paddle still: compares count blocking raw reads with the
+        # filtered value sampled at the same rate.  Prints and returns
+        # (raw peak-to-peak, raw stddev, filtered peak-to-peak, filtered
+        # stddev), all in calibrated 0-1023 units.  The host's ADC reads a
+        # fixed value, host/benchmodules.py jitter adds noise to it.
+        self.start()
+        raw = array('H', [0] * count)
+        filtered = array('H', [0] * count)
+        for i in range(count) :
+            sleep_ms(self.periodMs)
+            raw[i] = self.calibrate(self.adc.read())
+            filtered[i] = self.value
+        result = []
+        for a in (raw, filtered) :
+            mean = sum(a) / count
+            var = 0
+            for v in a :
+                var += (v - mean) * (v - mean)
+            result.append(max(a) - min(a))
+            result.append((var / count) ** 0.5)
+        print ("paddle jitter: raw p-p %d sd %.2f, filtered p-p %d sd %.2f" % tuple(result))
+        return tuple(result)
+
+
+class Renderer(object):
+    # Collects a frame's drawing and sends it to the display in one flush.
+    #
+    # Games call fill_rect/rect/hline/vline/pixel/text/fill on the renderer
+    # as they would on the display.  At flush() an op fully painted over by a
+    # later op is dropped, an op partly painted over along a whole edge is
+    # trimmed, and same-colour fills that join into one rectangle are merged,
+    # so erase-then-draw pairs cost one SPI window instead of two.
+    # Every op is treated as opaque over its bounding box (text draws its bg,
+    # blit_buffer covers its whole rectangle).
+    # After each flush queuedOps/queuedPixels hold what was asked for and
+    # ops/pixels what was sent to the display.
+    def __init__(self, display, size=96):
+        self.display = display
+        self.size = size
+        self.n = 0
+        self.x = array('h', [0] * size)
+        self.y = array('h', [0] * size)
+        self.w = array('h', [0] * size)
+        self.h = array('h', [0] * size)
+        self.color = array('H', [0] * size)
+        self.kind = bytearray(size)
+        self.args = [None] * size
+        self.queuedOps = 0
+        self.queuedPixels = 0
+        self.ops = 0
+        self.pixels = 0
+
+    def width(self):
+        return self.display.width()
+
+    def height(self):
+        return self.display.height()
+
+    def add(self, kind, x, y, w, h, color, args=None):
+        if w <= 0 or h <= 0 :
+            return
+        if self.n == self.size :
+            self.flush()
+        i = self.n
+        self.kind[i] = kind
+        self.x[i] = x
+        self.y[i] = y
+        self.w[i] = w
+        self.h[i] = h
+        self.color[i] = color
+        self.args[i] = args
+        self.n = i + 1
+
+    def fill_rect(self, x, y, w, h, color):
+        self.add(R_FILL, x, y, w, h, color)
+
+    def fill(self, color):
+        # everything queued so far is painted over
+        for i in range(self.n) :
+            self.args[i] = None
+        self.n = 0
+        self.add(R_FILL, 0, 0, self.display.width(), self.display.height(), color)
+
+    def rect(self, x, y, w, h, color):
+        self.add(R_FILL, x, y, w, 1, color)
+        self.add(R_FILL, x, y + h - 1, w, 1, color)
+        self.add(R_FILL, x, y + 1, 1, h - 2, color)
+        self.add(R_FILL, x + w - 1, y + 1, 1, h - 2, color)
+
+    def hline(self, x, y, w, color):
+        self.add(R_FILL, x, y, w, 1, color)
+
+    def vline(self, x, y, h, color):
+        self.add(R_FILL, x, y, 1, h, color)
+
+    def pixel(self, x, y, color):
+        self.add(R_FILL, x, y, 1, 1, color)
+
+    def text(self, font, s, x, y, fg=st7789.WHITE, bg=st7789.BLACK):
+        self.add(R_TEXT, x, y, len(s) * font.WIDTH, font.HEIGHT, fg, (font, s, bg))
+
+    def blit_buffer(self, buf, x, y, w, h):
+        self.add(R_BLIT, x, y, w, h, 0, buf)
+
+    def overlaps(self, i, j):
+        x = self.x
+        y = self.y
+        return (x[i] < x[j] + self.w[j] and x[j] < x[i] + self.w[i] and
+                y[i] < y[j] + self.h[j] and y[j] < y[i] + self.h[i])
+
+    def clear(self, i, a, b):
+        # True if no live op strictly between a and b overlaps op i
+        kind = self.kind
+        for k in range(a + 1, b) :
+            if kind[k] != R_DEAD and self.overlaps(i, k) :
+                return False
+        return True
+
+    def trim(self, i, j):
+        # Remove from op i the part painted over later by op j.  Returns True
+        # if nothing of op i is left.
+        x = self.x
+        y = self.y
+        w = self.w
+        h = self.h
+        x0 = x[i]
+        y0 = y[i]
+        x1 = x0 + w[i]
+        y1 = y0 + h[i]
+        cx0 = x[j]
+        cy0 = y[j]
+        cx1 = cx0 + w[j]
+        cy1 = cy0 + h[j]
+        if cx0 <= x0 and cx1 >= x1 :
+            if cy0 <= y0 and cy1 >= y1 :
+                return True
+            if self.kind[i] == R_FILL :
+                if cy0 <= y0 < cy1 :
+                    y[i] = cy1
+                    h[i] = y1 - cy1
+                elif cy0 < y1 <= cy1 :
+                    h[i] = cy0 - y0
+        elif cy0 <= y0 and cy1 >= y1 and self.kind[i] == R_FILL :
+            if cx0 <= x0 < cx1 :
+                x[i] = cx1
+                w[i] = x1 - cx1
+            elif cx0 < x1 <= cx1 :
+                w[i] = cx0 - x0
+        return False
+
+    def merge(self, i, j):
+        # Merge same-colour fills i < j if together they form one rectangle.
+        # Returns True if op i was folded into op j or j into i.
+        x = self.x
+        y = self.y
+        w = self.w
+        h = self.h
+        if x[i] == x[j] and w[i] == w[j] and y[i] <= y[j] + h[j] and y[j] <= y[i] + h[i] :
+            ux = x[i]
+            uw = w[i]
+            uy = min(y[i], y[j])
+            uh = max(y[i] + h[i], y[j] + h[j]) - uy
+        elif y[i] == y[j] and h[i] == h[j] and x[i] <= x[j] + w[j] and x[j] <= x[i] + w[i] :
+            uy = y[i]
+            uh = h[i]
+            ux = min(x[i], x[j])
+            uw = max(x[i] + w[i], x[j] + w[j]) - ux
+        else :
+            return False
+        if self.clear(i, i, j) :
+            k = j       # i can be delayed to j
+        elif self.clear(j, i, j) :
+            k = i       # j can be brought forward to i
+        else :
+            return False
+        x[k] = ux
+        y[k] = uy
+        w[k] = uw
+        h[k] = uh
+        self.kind[i + j - k] = R_DEAD
+        return True
+
+    def flush(self):
+        n = self.n
+        kind = self.kind
+        color = self.color
+        w = self.w
+        h = self.h
+        queued = 0
+        for i in range(n) :
+            queued += w[i] * h[i]
+        self.queuedOps = n
+        self.queuedPixels = queued
+
+        # drop or trim ops painted over later in the frame
+        for i in range(n) :
+            for j in range(i + 1, n) :
+                if kind[j] != R_DEAD and self.overlaps(i, j) and self.trim(i, j) :
+                    kind[i] = R_DEAD
+                    break
+
+        # merge same-colour fills that join into one rectangle
+        for i in range(n) :
+            if kind[i] != R_FILL :
+                continue
+            for j in range(i + 1, n) :
+                if kind[j] == R_FILL and color[j] == color[i] and self.merge(i, j) :
+                    break
+
+        ops = 0
+        pixels = 0
+        display = self.display
+        x = self.x
+        y = self.y
+        args = self.args
+        for i in range(n) :
+            if kind[i] == R_FILL :
+                display.fill_rect(x[i], y[i], w[i], h[i], color[i])
+            elif kind[i] == R_TEXT :
+                font, s, bg = args[i]
+                display.text(font, s, x[i], y[i], color[i], bg)
+                args[i] = None
+            elif kind[i] == R_BLIT :
+                display.blit_buffer(args[i], x[i], y[i], w[i], h[i])
+                args[i] = None
+            else :
+                continue
+            ops += 1
+            pixels += w[i] * h[i]
+        self.ops = ops
+        self.pixels = pixels
+        self.n = 0
+
+    def stats(self):
+        return self.queuedOps, self.queuedPixels, self.ops, self.pixels
+
+
 class gameESP():
     max_vol = 6
     # duty={0:0,1:0.05,2:0.1,3:0.5,4:1,5:2,6:70}
@@ -301,7 +971,7 @@ class gameESP():
         self.useSPI = True
         self.timer = 0
         self.vol = int(self.max_vol/2) + 1
-        seed(ticks_us())
+        self.rng = Rng(ticks_us())
         # self.btnU = 1 << 1
         # self.btnL = 1 << 2
         # self.btnR = 1 << 3
@@ -322,25 +992,28 @@ class gameESP():
 
         self.maxBgm = 1
         self.bgm = 1
-        self.songIndex = 0
         self.songStart = -1
         self.songEnd   = -1
         self.songLoop  = -3
         self.silence  = 0
         self.songSpeed = 1
-        self.timeunit = 1
-        self.notes = False
-        self.songBuf = []
         self.PinBuzzer = Pin(26, Pin.OUT)
         self.beeper = PWM(self.PinBuzzer, freq=500, duty=0)
-        self.beeper2 = PWM(self.PinBuzzer, freq=500, duty=0)        
-        self.timerInitialized = False
+        # music and sound effects share self.beeper through the mixer
+        self.mixer = Mixer(self.beeper, Timer(0), self.duty[self.vol])
+        # effects played as tuples, compiled once: {sfx: (freqs, events)}
+        self.sfxCache = {}
 
         # configure oled display SPI ST7789
         self.spi = SPI(1, baudrate=30000000, sck=Pin(18), mosi=Pin(19))
         self.display = tft_config.config(0)
         self.display.rotation(rotation)
         self.display.init()
+        # games may queue their per-frame drawing here, it is flushed by
+        # display_and_wait()
+        self.renderer = Renderer(self.display)
+        # set when tft_config.STATS wraps the display in a DrawStats
+        self.endFrame = getattr(self.display, 'frame', None)
 
         self.PinBtnA  = Pin(0, Pin.IN, Pin.PULL_UP)
         self.PinBtnB  = Pin(35, Pin.IN, Pin.PULL_UP)
@@ -350,22 +1023,26 @@ class gameESP():
         # self.adcX.atten(ADC.ATTN_11DB)
         # self.adcY.atten(ADC.ATTN_11DB)
         self.adc.atten(ADC.ATTN_11DB)
+        # sampled in the background once a game first reads the paddle
+        self.paddle = Paddle(self.adc, Timer(1))
 
 
     def deinit(self) :
+      self.mixer.deinit()
+      self.paddle.deinit()
       self.beeper.deinit()
-      self.beeper2.deinit()
       self.adc.deinit()
       # self.adcX.deinit()
       # self.adcY.deinit()
       if self.useSPI :
         self.spi.deinit()
-      if self.timerInitialized :
-          self.timer.deinit()
 
     def getPaddle (self) :
-      # ESP32 - 142 to 3155
-      return max ( min (int (self.adc.read() / 2.935) - 48, 1023),0)
+      # ESP32 - 142 to 3155, filtered by the background sampler
+      paddle = self.paddle
+      if not paddle.running :
+        paddle.start()
+      return paddle.value
 
     def pressed (self,btn) :
       return (self.Btns & btn)
@@ -400,10 +1077,12 @@ class gameESP():
         if self.pressed(self.btnB):
             if self.justPressed(self.btnB) :
                 self.vol= min (self.vol+1, self.max_vol)
+                self.mixer.duty = self.duty[self.vol]
                 self.playTone('c4', 100)
                 return True
             elif self.justPressed(self.btnA) :
                 self.vol= max (self.vol-1, 0)
+                self.mixer.duty = self.duty[self.vol]
                 self.playTone('d4', 100)
                 return True
 
@@ -420,58 +1099,163 @@ class gameESP():
             return True
         return False
 
-    def playTone(self, tone, tone_duration, rest_duration=0):
-        beeper = PWM(self.PinBuzzer, freq=self.tones[tone], duty=self.duty[self.vol])
-        sleep_ms(tone_duration)
-        beeper.deinit()
-        sleep_ms(rest_duration)
-
-    def playSound(self, freq, tone_duration, rest_duration=0):
-        beeper = PWM(self.PinBuzzer, freq, duty=self.duty[self.vol])
-        sleep_ms(tone_duration)
-        beeper.deinit()
-        sleep_ms(rest_duration)
-
-    def handleInterrupt(self, timer):
-        self.beeper2.deinit() # note has been played long enough, now stop sound
-
-        if self.songBuf[self.songIndex] == self.songLoop :
-            self.songIndex = 3 # repeat from first note
-
-        if self.songBuf[self.songIndex] != self.songEnd :
-            if self.songBuf[self.songIndex] == 0 :
-                self.beeper2 = PWM(self.PinBuzzer, freq=100, duty=0)
-            elif self.notes :
-                self.beeper2 = PWM(self.PinBuzzer, freq=self.tones[self.songBuf[self.songIndex]], duty=self.duty[self.vol])
-            else :
-                self.beeper2 = PWM(self.PinBuzzer, freq=self.songBuf[self.songIndex], duty=self.duty[self.vol])
-            self.timer.init(period=int(self.songBuf[self.songIndex+1] * self.timeunit * self.songSpeed), mode=Timer.ONE_SHOT, callback=self.handleInterrupt)
-            self.songIndex +=2
+    def playTone(self, tone, tone_duration, rest_duration=0, priority=0):
+        return self.playSfx((tone, tone_duration, 0, rest_duration), priority)
+
+    def playSound(self, freq, tone_duration, rest_duration=0, priority=0):
+        return self.playSfx((freq, tone_duration, 0, rest_duration), priority)
+
+    def playToneBlocking(self, tone, tone_duration, rest_duration=0):
+        self.playSoundBlocking(self.tones[tone], tone_duration, rest_duration)
+
+    def playSoundBlocking(self, freq, tone_duration, rest_duration=0):
+        self.stopSfx()
+        self.playSfx((freq, tone_duration), 255)
+        sleep_ms(tone_duration + rest_duration)
+
+    def toFreq(self, tone):
+        # note name, frequency in Hz or a tuple of either for a chord
+        if isinstance(tone, tuple) :
+            return tuple(self.tones[t] if isinstance(t, str) else t for t in tone)
+        return self.tones[tone] if isinstance(tone, str) else tone
+
+    def compileSfx(self, sfx):
+        # sfx is a flat sequence of tone, duration(ms) pairs.  Tones are note
+        # names from self.tones or frequencies in Hz, 0 is a rest, and a tuple
+        # of tones is played as an arpeggiated chord.  Returns the mixer's
+        # (freqs, events), for games to compile their effects once and queue
+        # them with playSfx() or mixer.playSfx() without allocating.
+        pairs = []
+        for i in range(0, len(sfx) - 1, 2) :
+            pairs.append(self.toFreq(sfx[i]))
+            pairs.append(sfx[i+1])
+        return self.mixer.compile(pairs)
+
+    def playSfx(self, sfx, priority=0):
+        # sfx is compiled by compileSfx() or a tuple for it, compiled the
+        # first time it is played and kept in sfxCache after that.
+        # A higher priority effect cuts off the one playing and drops anything
+        # queued below it, otherwise it waits behind effects of the same or
+        # higher priority.  Returns False if the queue had no room for it.
+        if not isinstance(sfx[1], array) :
+            compiled = self.sfxCache.get(sfx)
+            if compiled is None :
+                compiled = self.compileSfx(sfx)
+                self.sfxCache[sfx] = compiled
+            sfx = compiled
+        return self.mixer.playSfx(sfx, priority)
+
+    def stopSfx(self):
+        self.mixer.stopSfx()
+
+    def sfxPlaying(self):
+        return self.mixer.sfx is not None
+
+    def compileSong(self, songBuf):
+        # Convert a songBuf list
+        #   [songStart, notes, timeunit, tone, duration, ..., songLoop or songEnd]
+        # into the mixer's event schedule, so that playing a note needs no
+        # tone lookup, float maths or PWM object.  With notes False tones are
+        # frequencies in Hz; either way a tuple of tones is a chord.
+        # Songs ending in songLoop repeat from the first note.
+        # Returns (song, repeat).
+        if songBuf[0] != self.songStart :
+            raise ValueError("invalid songBuf")
+        notes = songBuf[1]
+        scale = songBuf[2] * self.songSpeed
+        pairs = []
+        i = 3
+        while i + 1 < len(songBuf) :
+            tone = songBuf[i]
+            pairs.append(self.toFreq(tone) if notes and tone else tone)
+            pairs.append(int(songBuf[i+1] * scale))
+            i += 2
+        return self.mixer.compile(pairs), songBuf[-1] == self.songLoop
 
     def startSong(self, songBuf=None):
+        # songBuf is either a songBuf list or a (song, repeat) pair returned
+        # by compileSong(), to avoid compiling the same song again
         if self.bgm :
             if songBuf != None :
-                self.songBuf = songBuf
-            if self.songBuf[0] != self.songStart :
-                print ("Cannot start Song, Invalid songBuf")
-                return False
-            self.notes = self.songBuf[1]
-            self.timeunit = self.songBuf[2]
-            self.songIndex = 3
-            if not self.timerInitialized :
-                self.timerInitialized = True
-                self.timer = Timer(1)
-            self.timer.init(period=100, mode=Timer.ONE_SHOT, callback=self.handleInterrupt)
+                if isinstance(songBuf, list) :
+                    try :
+                        songBuf = self.compileSong(songBuf)
+                    except ValueError :
+                        print ("Cannot start Song, Invalid songBuf")
+                        return False
+                self.mixer.startSong(songBuf[0], songBuf[1])
+            elif self.mixer.lastSong is not None :
+                self.mixer.startSong(self.mixer.lastSong, self.mixer.songRepeat)
+            return True
 
     def stopSong(self):
-        self.songIndex = 0
+        self.mixer.stopSong()
+
+    def benchSong(self, songBuf, count=200):
+        # Time the per-note work of the music in microseconds: the old list
+        # walk (tone lookup, float multiply, new PWM per note) against one
+        # mixer tick stepping the compiled schedule.  On the host run it with
+        # host/benchmodules.py song, for the real clock.
+        self.mixer.stop()
+        duty = self.duty[0]
+        notes = songBuf[1]
+        timeunit = songBuf[2]
+        n = (len(songBuf) - 4) // 2
+        t = ticks_us()
+        for c in range(count) :
+            i = 3 + 2 * (c % n)
+            tone = songBuf[i]
+            freq = self.tones[tone] if notes and tone else tone
+            beeper = PWM(self.PinBuzzer, freq=freq or 100, duty=duty)
+            period = int(songBuf[i+1] * timeunit * self.songSpeed)
+            beeper.deinit()
+        legacy = ticks_diff(ticks_us(), t) / count
+        self.beeper.init(freq=500, duty=0)
+        self.mixer.outFreq = self.mixer.outDuty = -1
+
+        song, repeat = self.compileSong(songBuf)
+        mixer = self.mixer
+        mixer.song = song
+        mixer.songRepeat = True
+        mixer.songEvent = -3
+        mixer.songLeft = 0
+        mixerDuty = mixer.duty
+        mixer.duty = duty
+        t = ticks_us()
+        for c in range(count) :
+            mixer.songLeft = 0    # force a new note every tick
+            mixer.handleTick(None)
+        compiled = ticks_diff(ticks_us(), t) / count
+
+        # a c5-e5-g5 chord effect over the song: the ticks alternate between
+        # the voices and the chord is arpeggiated one note per effect tick
+        chord = self.compileSfx((('c5', 'e5', 'g5'), 12 * mixer.tickMs))
+        mixer.sfx = chord
+        mixer.sfxEvent = -3
+        mixer.sfxLeft = 0
+        heard = []
+        for c in range(12) :
+            mixer.handleTick(None)
+            heard.append(mixer.outFreq)
+        mixer.stop()
+        mixer.duty = mixerDuty
+        print ("per note: list %.1fus, mixer %.1fus" % (legacy, compiled))
+        print ("c5-e5-g5 chord over the song, Hz per tick:", *heard)
+        return legacy, compiled
 
 
     def random (self, x, y) :
-        return  getrandbits(20) % (y-x+1) + x
+        return self.rng.randint(x, y)
+
+    def seed (self, s) :
+        # Fix the random sequence, e.g. for a replayable demo or benchmark
+        self.rng.seed(s)
 
     def display_and_wait(self) :
         # self.display.show()
+        self.renderer.flush()
+        if self.endFrame :
+          self.endFrame()
         timer_dif = int(1000/self.frameRate) - ticks_diff(ticks_ms(), self.timer)
         if timer_dif > 0 :
             sleep_ms(timer_dif)
@@ -484,11 +1268,14 @@ class Rect (object):
         self.y = y
         self.w = w
         self.h = h
+        self.grid = None
 
 
     def move (self, vx, vy) :
         self.x = self.x + vx
         self.y = self.y + vy
+        if self.grid is not None :
+            self.grid.update(self)
 
 
     def colliderect (self, rect1) :
@@ -498,4 +1285,174 @@ class Rect (object):
         self.y < rect1.y + rect1.h) :
         return True
       else:
-        return False
\ No newline at end of file
+        return False
+
+class Grid (object):
+    # Uniform grid broad phase for Rects.
+    #
+    # Each Rect added is kept in the list of every cell it overlaps; its cell
+    # span (c0, r0, c1, r1) is stored on the Rect and the lists are only
+    # touched when Rect.move() (or update() after setting x/y directly)
+    # changes that span.  Rects outside the grid are kept in the border
+    # cells.  Queries write into the preallocated hits, pairA and pairB lists
+    # and return a count, so they do not allocate.
+    def __init__(self, w, h, cell=16, size=64) :
+        self.cell = cell
+        self.cols = (w + cell - 1) // cell
+        self.rows = (h + cell - 1) // cell
+        self.cells = [[] for _ in range(self.cols * self.rows)]
+        self.size = size
+        self.hits = [None] * size
+        self.pairA = [None] * size
+        self.pairB = [None] * size
+        self.stamp = 0
+
+    def span (self, rect) :
+        cell = self.cell
+        c0 = min(max(rect.x // cell, 0), self.cols - 1)
+        r0 = min(max(rect.y // cell, 0), self.rows - 1)
+        c1 = min(max((rect.x + rect.w - 1) // cell, 0), self.cols - 1)
+        r1 = min(max((rect.y + rect.h - 1) // cell, 0), self.rows - 1)
+        return c0, r0, c1, r1
+
+    def link (self, rect, add) :
+        cols = self.cols
+        cells = self.cells
+        for r in range(rect.r0, rect.r1 + 1) :
+            for c in range(rect.c0, rect.c1 + 1) :
+                if add :
+                    cells[r * cols + c].append(rect)
+                else :
+                    cells[r * cols + c].remove(rect)
+
+    def add (self, rect) :
+        rect.grid = self
+        rect.stamp = 0
+        rect.c0, rect.r0, rect.c1, rect.r1 = self.span(rect)
+        self.link(rect, True)
+
+    def remove (self, rect) :
+        if rect.grid is self :
+            self.link(rect, False)
+            rect.grid = None
+
+    def clear (self) :
+        for cell in self.cells :
+            for rect in cell :
+                rect.grid = None
+            cell.clear()
+
+    def update (self, rect) :
+        cell = self.cell
+        c0 = min(max(rect.x // cell, 0), self.cols - 1)
+        r0 = min(max(rect.y // cell, 0), self.rows - 1)
+        c1 = min(max((rect.x + rect.w - 1) // cell, 0), self.cols - 1)
+        r1 = min(max((rect.y + rect.h - 1) // cell, 0), self.rows - 1)
+        if c0 != rect.c0 or r0 != rect.r0 or c1 != rect.c1 or r1 != rect.r1 :
+            self.link(rect, False)
+            rect.c0 = c0
+            rect.r0 = r0
+            rect.c1 = c1
+            rect.r1 = r1
+            self.link(rect, True)
+
+    def query (self, rect, exact=True) :
+        # Rects sharing a cell with rect (and colliding with it if exact)
+        # are put in self.hits.  Returns their count.
+        self.stamp += 1
+        stamp = self.stamp
+        if rect.grid is self :
+            rect.stamp = stamp
+            c0, r0, c1, r1 = rect.c0, rect.r0, rect.c1, rect.r1
+        else :
+            c0, r0, c1, r1 = self.span(rect)
+        cols = self.cols
+        hits = self.hits
+        n = 0
+        for r in range(r0, r1 + 1) :
+            for c in range(c0, c1 + 1) :
+                for other in self.cells[r * cols + c] :
+                    if other.stamp == stamp :
+                        continue
+                    other.stamp = stamp
+                    if exact and not rect.colliderect(other) :
+                        continue
+                    if n == self.size :
+                        return n
+                    hits[n] = other
+                    n += 1
+        return n
+
+    def pairs (self, exact=True) :
+        # Every pair of Rects sharing a cell (and colliding if exact) is put
+        # in self.pairA[i], self.pairB[i] once.  Returns the pair count.
+        cols = self.cols
+        cells = self.cells
+        pairA = self.pairA
+        pairB = self.pairB
+        n = 0
+        for ci in range(len(cells)) :
+            cell = cells[ci]
+            m = len(cell)
+            if m < 2 :
+                continue
+            cy = ci // cols
+            cx = ci - cy * cols
+            for i in range(m - 1) :
+                a = cell[i]
+                for j in range(i + 1, m) :
+                    b = cell[j]
+                    # report a pair only from the first cell the two share
+                    if (a.c0 if a.c0 > b.c0 else b.c0) != cx or (a.r0 if a.r0 > b.r0 else b.r0) != cy :
+                        continue
+                    if exact and not a.colliderect(b) :
+                        continue
+                    if n == self.size :
+                        return n
+                    pairA[n] = a
+                    pairB[n] = b
+                    n += 1
+        return n
+
+
+def benchGrid (count=300, frames=20, size=4, cell=16, w=240, h=135) :
+    # Stress test: count small Rects wandering over a w x h field.  Times a
+    # pairwise colliderect scan against Grid.pairs() per frame, in ms, and
+    # checks both find the same number of collisions.  On the host run it
+    # with host/benchmodules.py grid, for the real clock.
+    rng = Rng(count)
+    rects = []
+    speeds = []
+    grid = Grid(w, h, cell, size=count * 4)
+    for _ in range(count) :
+        r = Rect(rng.below(w - size), rng.below(h - size), size, size)
+        rects.append(r)
+        speeds.append((rng.randint(-2, 1) or 1, rng.randint(-2, 1) or 1))
+        grid.add(r)
+    brute = 0
+    grid_ms = 0
+    for _ in range(frames) :
+        for i in range(count) :
+            r = rects[i]
+            vx, vy = speeds[i]
+            if not 0 <= r.x + vx <= w - size :
+                vx = -vx
+            if not 0 <= r.y + vy <= h - size :
+                vy = -vy
+            speeds[i] = (vx, vy)
+            r.move(vx, vy)
+        t = ticks_us()
+        found = 0
+        for i in range(count - 1) :
+            a = rects[i]
+            for j in range(i + 1, count) :
+                if a.colliderect(rects[j]) :
+                    found += 1
+        brute += ticks_diff(ticks_us(), t)
+        t = ticks_us()
+        n = grid.pairs()
+        grid_ms += ticks_diff(ticks_us(), t)
+        if n != found :
+            print ("mismatch: grid %d, pairwise %d" % (n, found))
+    print ("%d rects: pairwise %.1fms, grid %.1fms per frame" % (count, brute / frames / 1000, grid_ms / frames / 1000))
+    return brute / frames / 1000, grid_ms / frames / 1000
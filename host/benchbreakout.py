@@ -0,0 +1,120 @@
+# benchbreakout.py - brick collision cost per frame of _g_breakout
+#
+# Plays the breakout demo on the virtual clock with every level loaded as
+# --level, and times the brick collision test of each ball each frame,
+# grouped by the bricks alive at the time.  hit_bricks() is timed where
+# the game has it; a copy of the game from before the brick grid, which
+# tested every Brick object inline in the main loop, is timed by patching
+# timers round that loop into a temporary copy:
+#
+#   python3 host/benchbreakout.py
+#   git show 'HEAD^{/Look up breakout bricks on a grid}~1:_g_breakout.py' > _g_breakout_list.py
+#   python3 host/benchbreakout.py --script _g_breakout_list.py
+
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+HOST = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HOST)
+
+import run
+
+ROOT = os.path.dirname(HOST)
+DEMO = [(35, 3000, 100), (0, 4000, 100)]
+GROUPS = ((0, 19), (20, 39), (40, 59), (60, 255))
+
+# the inline scan of the list version, and what is put round it
+LOOP = '                      # Check for hits\n                      for brick in bricks:\n'
+REMOVE = '                              bricks.remove(brick)\n'
+START = '                      _n0 = len(bricks)\n                      _t0 = _clock()\n'
+STOP = '                      _acc(_t0, _n0)\n'
+
+
+def instrument(source):
+    # the list version with timers round its brick loop, None if the
+    # game has no such loop
+    if LOOP not in source or REMOVE not in source :
+        return None
+    source = source.replace(LOOP, '                      # Check for hits\n' + START +
+                            '                      for brick in bricks:\n', 1)
+    return source.replace(REMOVE, REMOVE + STOP, 1)
+
+
+def bench(script='_g_breakout.py', minutes=10, level=8):
+    # Returns {group: [seconds, tests]} and the frames played
+    groups = {}
+
+    def acc(t0, n):
+        spent = time.perf_counter() - t0
+        for lo, hi in GROUPS :
+            if lo <= n <= hi :
+                g = groups.setdefault((lo, hi), [0.0, 0])
+                g[0] += spent
+                g[1] += 1
+
+    def check(scope):
+        if 'load_level' not in scope or '_wrapped' in scope :
+            return
+        scope['_wrapped'] = True
+        load = scope['load_level']
+        scope['load_level'] = lambda n, display: load(level, display)
+        scope['_clock'] = time.perf_counter
+        scope['_acc'] = acc
+        if 'hit_bricks' in scope :
+            hit = scope['hit_bricks']
+
+            def timed(ball, display):
+                n = scope['grid'].count if 'grid' in scope else scope['alive']
+                t0 = time.perf_counter()
+                points = hit(ball, display)
+                acc(t0, n)
+                return points
+
+            scope['hit_bricks'] = timed
+
+    with open(os.path.join(ROOT, script)) as f :
+        patched = instrument(f.read())
+    name = script
+    if patched is not None :
+        fd, name = tempfile.mkstemp(suffix='.py', dir=ROOT)
+        with os.fdopen(fd, 'w') as f :
+            f.write(patched)
+    try :
+        with redirect_stdout(io.StringIO()):
+            stats = run.run(name, minutes * 60000, presses=DEMO, verbose=False, check=check)
+    finally :
+        if patched is not None :
+            os.remove(name)
+    if stats['stop'] == 'error' :
+        raise RuntimeError('%s stopped with an error' % script)
+    return groups, stats['frames']
+
+
+def main(argv):
+    import argparse
+    p = argparse.ArgumentParser(description='Time the breakout brick collision test per ball per frame.')
+    p.add_argument('--script', default='_g_breakout.py')
+    p.add_argument('--minutes', type=int, default=10, help='virtual minutes')
+    p.add_argument('--level', type=int, default=8, help='the level every level is loaded as')
+    args = p.parse_args(argv)
+
+    groups, frames = bench(args.script, args.minutes, args.level)
+    if not groups :
+        print('%s: no brick collision tests timed' % args.script)
+        return 1
+    print('%s: %d frames' % (args.script, frames))
+    for lo, hi in GROUPS :
+        if (lo, hi) in groups :
+            spent, tests = groups[(lo, hi)]
+            label = '%d+' % lo if hi == 255 else '%d-%d' % (lo, hi)
+            print('  %-6s bricks alive: %6d tests, %5.1fus per ball per frame' % (
+                label, tests, spent * 1e6 / tests))
+    return 0
+
+
+if __name__ == '__main__' :
+    sys.exit(main(sys.argv[1:]))
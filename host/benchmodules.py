@@ -0,0 +1,99 @@
+# benchmodules.py - the benchmarks built into the device modules, on host time
+#
+# gameESP, entitypool, sprite and kinematics carry benchmarks meant to be
+# called from the REPL on the device, timed with utime.ticks_us().  Under
+# host/run.py's default clock ticks_us() moves --tick-us per read, not
+# with the work done, so the times they print there are a count of clock
+# reads.  This runs them on the host with tick_us 0, the real clock:
+#
+#   python3 host/benchmodules.py                # all of them
+#   python3 host/benchmodules.py song grid gc
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import run
+from hostsim import sim
+
+# a few bars for benchSong: tone, duration pairs of a _g_tetris songBuf
+NOTES = ['e4', 4, 'b3', 2, 'c4', 2, 'd4', 4, 'c4', 2, 'b3', 2,
+         'a3', 4, 'a3', 2, 'c4', 2, 'e4', 4, 'd4', 2, 'c4', 2, 0, 4]
+
+
+def song():
+    import gameESP
+    g = gameESP.gameESP()
+    g.benchSong([g.songStart, True, 100] + NOTES + [g.songLoop])
+
+
+def grid():
+    import gameESP
+    gameESP.benchGrid()
+
+
+def gc():
+    import entitypool
+    entitypool.benchGC()
+
+
+def sprite():
+    import gameESP
+    from sprite import Sprite
+    g = gameESP.gameESP()
+    ball = Sprite((
+        '.yyyy.',
+        'yyyyyy',
+        'yyyyyy',
+        'yyyyyy',
+        'yyyyyy',
+        '.yyyy.'), {'.': 0, 'y': 0xffe0})
+    ball.bench(g.display)
+
+
+def jitter():
+    # a paddle held still on a noisy ADC, +-40 counts on each read
+    import gameESP
+    g = gameESP.gameESP()
+    sim.setAdc(12, 1600)
+    sim.adcNoise[12] = 40
+    g.paddle.jitter()
+
+
+def ssd1306():
+    import gameESP
+    gameESP.benchSSD1306()
+
+
+def kinematics():
+    import kinematics
+    kinematics.benchKinematics()
+
+
+BENCHES = (song, grid, gc, sprite, jitter, ssd1306, kinematics)
+
+
+def main(argv):
+    import argparse
+    names = [b.__name__ for b in BENCHES]
+    p = argparse.ArgumentParser(description='Run the device modules\' benchmarks on the host clock.')
+    p.add_argument('bench', nargs='*', help='%s, default all' % ', '.join(names))
+    args = p.parse_args(argv)
+    for name in args.bench :
+        if name not in names :
+            p.error('no benchmark %s' % name)
+
+    run.install()
+    for bench in BENCHES :
+        if args.bench and bench.__name__ not in args.bench :
+            continue
+        run.forget()
+        sim.reset(0)
+        print('--- %s' % bench.__name__)
+        bench()
+    return 0
+
+
+if __name__ == '__main__' :
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,64 @@
+# benchpaddle.py - self-play benchmark of the breakout and arkanoid demos
+#
+# Runs the demo paddles on the virtual clock, with the ball predictor and
+# with the old chase-the-ball steering (PREDICT = False), and reports
+# how many levels each clears and how long a level takes.
+#
+#   python3 host/benchpaddle.py --minutes 20 --seeds 3
+#   python3 host/benchpaddle.py _g_arkanoid.py
+
+import io
+import os
+import re
+import sys
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import run
+
+# buttons that start each game's demo, (pin, ms, hold)
+DEMO = {
+    '_g_breakout.py': [(35, 3000, 100), (0, 4000, 100)],
+    '_g_arkanoid.py': [(35, 3000, 100)],
+}
+
+CLEARED = re.compile(r'level (\d+) cleared in (\d+)ms')
+
+
+def bench(script, minutes=20, seed=0, predict=True):
+    # Returns the clear times in ms of the levels cleared
+    def check(scope):
+        scope['PREDICT'] = predict
+
+    out = io.StringIO()
+    with redirect_stdout(out):
+        stats = run.run(script, minutes * 60000, seed=seed * 1000003,
+                        presses=DEMO[script], verbose=False, check=check)
+    if stats['stop'] == 'error' :
+        raise RuntimeError('%s stopped with an error' % script)
+    return [int(m.group(2)) for m in CLEARED.finditer(out.getvalue())]
+
+
+def main(argv):
+    import argparse
+    p = argparse.ArgumentParser(description='Self-play benchmark of the paddle demos.')
+    p.add_argument('scripts', nargs='*', default=sorted(DEMO))
+    p.add_argument('--minutes', type=int, default=20, help='virtual minutes per run')
+    p.add_argument('--seeds', type=int, default=3)
+    args = p.parse_args(argv)
+
+    for script in args.scripts :
+        for predict in (True, False) :
+            times = []
+            for seed in range(args.seeds) :
+                times += bench(script, args.minutes, seed, predict)
+            mean = sum(times) / len(times) / 1000 if times else 0
+            print('%s %-9s %3d levels in %d min, %.1fs per level' % (
+                script, 'predict' if predict else 'chase', len(times),
+                args.minutes * args.seeds, mean))
+    return 0
+
+
+if __name__ == '__main__' :
+    sys.exit(main(sys.argv[1:]))
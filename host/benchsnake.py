@@ -0,0 +1,186 @@
+# benchsnake.py - self-play benchmark of the snake demo AI
+#
+# Runs _g_snake.py in demo mode on the virtual clock and reports how long
+# the snake gets and what planning costs per tick, on the host.
+#
+#   python3 host/benchsnake.py --minutes 10 --seeds 4
+#   python3 host/benchsnake.py --greedy        # the old greedy steering
+#
+# Lengths are sampled every tick the snake is playing, a game ends when
+# the third life is lost and its length is the longest it got.
+#
+# --lengths times the body itself instead: on a SNAKE_SIZE 4 board the
+# snake is grown to each length going round a cycle through every cell
+# (a serpentine over the columns right of the first, back up the first),
+# then moved on round it with the apple, bite and wall checks each tick,
+# and ticks/s and the time per growth are reported.  --script runs it on
+# another copy of the game, also the body lists version before the ring
+# buffer:
+#
+#   python3 host/benchsnake.py --lengths 10,100,1000
+#   git show 'HEAD^{/Track snake occupancy}:_g_snake.py' > _g_snake_lists.py
+#   python3 host/benchsnake.py --lengths 10,100,1000 --script _g_snake_lists.py
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import run
+
+
+def bench(minutes=10, seed=0, greedy=False, verbose=False):
+    state = {'ticks': 0, 'len': 0, 'wall': 0.0, 'game': 0, 'games': [],
+             'lives': 0, 'wrapped': False}
+
+    def check(scope):
+        # called at every sleep, with the game's globals
+        if 'plan' not in scope or 'game' not in scope :
+            return
+        if not state['wrapped'] :
+            state['wrapped'] = True
+            plan = scope['plan']
+
+            def timed():
+                if greedy :
+                    return False
+                t = time.perf_counter()
+                done = plan()
+                state['wall'] += time.perf_counter() - t
+                return done
+
+            scope['plan'] = timed
+        game = scope['game']
+        if game['mode'] == scope['MODE_PLAY'] :
+            state['ticks'] += 1
+            state['len'] += scope['slen']
+            state['game'] = max(state['game'], scope['slen'])
+        if game['life'] > state['lives'] and state['game'] :
+            # a new game started
+            state['games'].append(state['game'])
+            state['game'] = 0
+        state['lives'] = game['life']
+
+    stats = run.run('_g_snake.py', minutes * 60000, seed=seed * 1000003,
+                    presses=[(35, 1000, 100), (0, 2000, 100)],
+                    verbose=verbose, check=check)
+    if state['game'] :
+        state['games'].append(state['game'])
+    state['stop'] = stats['stop']
+    return state
+
+
+def head(scope):
+    # the head cell, ring buffer or body lists
+    if 'bx' in scope :
+        return scope['bx'][scope['head']], scope['by'][scope['head']]
+    snake = scope['snake']
+    return snake['x'][snake['head']], snake['y'][snake['head']]
+
+
+def length(scope):
+    return scope['slen'] if 'slen' in scope else scope['snake']['len']
+
+
+def sweep(lengths, script='_g_snake.py', moves=2000):
+    # Returns {length: (ticks/s, us per growth)}
+    res = {}
+
+    def check(scope):
+        if res or 'game' not in scope or scope['game']['mode'] != scope['MODE_READY'] :
+            return
+        scope['SNAKE_SIZE'] = 4
+        for n in lengths :
+            scope['game']['reset'] = True
+            scope['resetSnake']()
+            cols = scope['COLS']
+            rows = scope['ROWS']
+
+            def step():
+                x, y = head(scope)
+                if x == 0 :
+                    scope['dirSnake'](*((0, -1) if y > 0 else (1, 0)))
+                elif y & 1 :
+                    scope['dirSnake'](*((-1, 0) if x > 1 or y == rows - 1 else (0, 1)))
+                else :
+                    scope['dirSnake'](*((1, 0) if x < cols - 1 else (0, 1)))
+                scope['moveSnake']()
+                scope['didSnakeEatApple']()
+                scope['didSnakeBiteItsTail']()
+                scope['didSnakeHitTheWall']()
+
+            grow = 0.0
+            grown = 0
+            while length(scope) < n :
+                # enough steps for the stacked tail to unfold
+                for _ in range(scope['SNAKE_EXTENT'] + 1) :
+                    step()
+                t = time.perf_counter()
+                scope['extendSnakeTail']()
+                grow += time.perf_counter() - t
+                grown += 1
+            t = time.perf_counter()
+            for _ in range(moves) :
+                step()
+            res[n] = (moves / (time.perf_counter() - t), grow * 1e6 / max(1, grown))
+        raise SystemExit
+
+    out = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try :
+        run.run(script, 20000, presses=[(0, 1000, 100), (0, 1500, 100)],
+                verbose=False, check=check)
+    finally :
+        sys.stdout.close()
+        sys.stdout = out
+    return res
+
+
+def main(argv):
+    import argparse
+    p = argparse.ArgumentParser(description='Self-play benchmark of the snake demo AI.')
+    p.add_argument('--minutes', type=int, default=10, help='virtual minutes per seed')
+    p.add_argument('--seeds', type=int, default=4)
+    p.add_argument('--greedy', action='store_true', help='steer without the planner')
+    p.add_argument('--lengths', help='time the body at these snake lengths, comma separated')
+    p.add_argument('--script', default='_g_snake.py', help='the game to time with --lengths')
+    args = p.parse_args(argv)
+
+    if args.lengths :
+        res = sweep([int(n) for n in args.lengths.split(',')], args.script)
+        if not res :
+            return 1
+        for n in sorted(res) :
+            print('length %4d: %6.0f ticks/s, grow %.2fus' % (n, res[n][0], res[n][1]))
+        return 0
+
+    out = sys.stdout
+    ticks = length = 0
+    wall = 0.0
+    games = []
+    for seed in range(args.seeds) :
+        sys.stdout = open(os.devnull, 'w')     # the game prints every life
+        try :
+            s = bench(args.minutes, seed, args.greedy)
+        finally :
+            sys.stdout.close()
+            sys.stdout = out
+        if s['stop'] == 'error' :
+            return 1
+        print('seed %d: %d ticks, mean length %.1f, games %s' % (
+            seed, s['ticks'], s['len'] / max(1, s['ticks']), s['games']))
+        ticks += s['ticks']
+        length += s['len']
+        wall += s['wall']
+        games += s['games']
+    print('%s: mean length %.1f over %d ticks, %d games, mean best %.1f, max %d' % (
+        'greedy' if args.greedy else 'planner', length / max(1, ticks), ticks,
+        len(games), sum(games) / max(1, len(games)), max(games or [0])))
+    if not args.greedy :
+        print('planning %.0fus/tick on this host' % (wall * 1000000 / max(1, ticks)))
+    return 0
+
+
+if __name__ == '__main__' :
+    sys.exit(main(sys.argv[1:]))
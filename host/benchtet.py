@@ -0,0 +1,140 @@
+# benchtet.py - piece placement throughput of the _g_tet playfield
+#
+# Loads _g_tet.py on the virtual clock and, from its first sleep, drops
+# random pieces straight down at random columns and rotations with the
+# game's own Fits(), Lock() and ClearRow() on its row masks, clearing the
+# well when a piece no longer fits at the top.  The same placements are
+# then made the old way, a square at a time in a list of columns with a
+# row clear that copies a square at a time, and both are reported in
+# placements and collision probes per second, on the host.
+#
+#   python3 host/benchtet.py --pieces 20000 --seed 1
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import run
+
+
+def masks(scope, moves):
+    # moves is a list of (piece, rot, x); returns probes and seconds
+    Fits = scope['Fits']
+    Lock = scope['Lock']
+    ClearRow = scope['ClearRow']
+    rows = scope['rows']
+    cells = scope['cells']
+    FULL = scope['FULL']
+    Height = scope['Height']
+    for j in range(Height) :
+        rows[j] = 0
+    probes = 0
+    t = time.perf_counter()
+    for piece, rot, x in moves :
+        y = 1
+        probes += 1
+        if not Fits(piece, rot, x, y) :
+            for j in range(Height) :
+                rows[j] = 0
+            for k in range(len(cells)) :
+                cells[k] = 0
+            continue
+        while Fits(piece, rot, x, y + 1) :
+            probes += 1
+            y += 1
+        probes += 1
+        Lock(piece, rot, x, y)
+        for j in range(Height) :
+            if rows[j] == FULL :
+                ClearRow(j)
+    return probes, time.perf_counter() - t
+
+
+def squares(scope, moves):
+    # the same with the old screen[i][j] lists
+    blocks = scope['blocks']
+    Width = scope['Width']
+    Height = scope['Height']
+    screen = [[0 for j in range(Height)] for i in range(Width)]
+
+    def fits(square, x, y):
+        for i in range(4) :
+            px = x + square[i][0]
+            py = y + square[i][1]
+            if px < 0 or px >= Width or py < 0 or py >= Height or screen[px][py] != 0 :
+                return False
+        return True
+
+    probes = 0
+    t = time.perf_counter()
+    for piece, rot, x in moves :
+        square = blocks[piece][0][rot]
+        color = blocks[piece][2]
+        y = 1
+        probes += 1
+        if not fits(square, x, y) :
+            screen = [[0 for j in range(Height)] for i in range(Width)]
+            continue
+        while fits(square, x, y + 1) :
+            probes += 1
+            y += 1
+        probes += 1
+        for i in range(4) :
+            screen[x + square[i][0]][y + square[i][1]] = color
+        for j in range(Height) :
+            full = True
+            for i in range(Width) :
+                if screen[i][j] == 0 :
+                    full = False
+            if full :
+                for k in range(j, 0, -1) :
+                    for i in range(Width) :
+                        screen[i][k] = screen[i][k - 1]
+                for i in range(Width) :
+                    screen[i][0] = 0
+    return probes, time.perf_counter() - t
+
+
+def bench(pieces=20000, seed=0):
+    results = {}
+
+    def check(scope):
+        if results or 'Fits' not in scope :
+            return
+        rng = random.Random(seed)
+        blocks = scope['blocks']
+        moves = []
+        for _ in range(pieces) :
+            piece = rng.randrange(len(blocks))
+            moves.append((piece, rng.randrange(blocks[piece][1]), rng.randint(1, scope['Width'] - 3)))
+        results['masks'] = masks(scope, moves)
+        results['squares'] = squares(scope, moves)
+        raise SystemExit
+
+    try :
+        run.run('_g_tet.py', 10000, seed=seed, verbose=False, check=check)
+    except SystemExit :
+        pass
+    return results
+
+
+def main(argv):
+    import argparse
+    p = argparse.ArgumentParser(description='Time piece placements on the _g_tet playfield.')
+    p.add_argument('--pieces', type=int, default=20000)
+    p.add_argument('--seed', type=int, default=0)
+    args = p.parse_args(argv)
+
+    results = bench(args.pieces, args.seed)
+    for name in ('masks', 'squares') :
+        probes, spent = results[name]
+        print('%-8s %7.0f placements/s, %8.0f probes/s' % (
+            name, args.pieces / spent, probes / spent))
+    return 0
+
+
+if __name__ == '__main__' :
+    sys.exit(main(sys.argv[1:]))
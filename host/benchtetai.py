@@ -0,0 +1,99 @@
+# benchtetai.py - self-play benchmark of the _g_tet demo player
+#
+# Runs _g_tet.py with the demo player on from the first tick, on the
+# virtual clock, and reports the lines it clears per game and how fast it
+# plans: pieces per second of host time spent in AiPlan(), and how often
+# a piece ran out of its AI_PIECE_US budget.
+#
+#   python3 host/benchtetai.py --minutes 30 --seeds 3
+#
+# A game ends when a new piece does not fit; the game still running when
+# time is up is reported apart.
+
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import run
+
+
+def bench(minutes=30, seed=0):
+    state = {'pieces': 0, 'lines': 0, 'games': [], 'wall': 0.0,
+             'cut': 0, 'wrapped': False, 'over': False}
+
+    def check(scope):
+        # called at every sleep, with the game's globals
+        if 'AiPlan' not in scope :
+            return
+        if not state['wrapped'] :
+            state['wrapped'] = True
+            scope['demo'] = True
+            plan = scope['AiPlan']
+            clear = scope['ClearRow']
+            put = scope['PutStartPos']
+
+            def timed():
+                t = time.perf_counter()
+                plan()
+                state['wall'] += time.perf_counter() - t
+                if scope['aiDone'] and scope['aiSpent'] > scope['AI_PIECE_US'] :
+                    state['cut'] += 1
+
+            def cleared(j):
+                state['lines'] += 1
+                clear(j)
+
+            def placed():
+                state['pieces'] += 1
+                put()
+
+            scope['AiPlan'] = timed
+            scope['ClearRow'] = cleared
+            scope['PutStartPos'] = placed
+        over = scope['game_over'] > 0
+        if over and not state['over'] :
+            state['games'].append(state['lines'])
+            state['lines'] = 0
+        state['over'] = over
+
+    out = io.StringIO()
+    with redirect_stdout(out):
+        stats = run.run('_g_tet.py', minutes * 60000, seed=seed * 1000003,
+                        verbose=False, check=check)
+    if stats['stop'] == 'error' :
+        raise RuntimeError('_g_tet.py stopped with an error')
+    return state
+
+
+def main(argv):
+    import argparse
+    p = argparse.ArgumentParser(description='Self-play benchmark of the _g_tet demo player.')
+    p.add_argument('--minutes', type=int, default=30, help='virtual minutes per seed')
+    p.add_argument('--seeds', type=int, default=3)
+    args = p.parse_args(argv)
+
+    games = []
+    pieces = 0
+    wall = 0.0
+    cut = 0
+    for seed in range(args.seeds) :
+        state = bench(args.minutes, seed)
+        print('seed %d: %d pieces, games of %s lines, %d lines in the game left running' % (
+            seed, state['pieces'], state['games'] or 'no', state['lines']))
+        games += state['games']
+        pieces += state['pieces']
+        wall += state['wall']
+        cut += state['cut']
+    if games :
+        print('%d games, %.0f lines per game' % (len(games), sum(games) / len(games)))
+    print('%d pieces, %.0f pieces/s planning, %.0fus per piece, %d over budget' % (
+        pieces, pieces / max(wall, 1e-9), wall * 1e6 / max(pieces, 1), cut))
+    return 0
+
+
+if __name__ == '__main__' :
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,9 @@
+# esp.py - host stand-in
+
+
+def osdebug(level):
+    pass
+
+
+def flash_size():
+    return 4 * 1024 * 1024
@@ -0,0 +1,20 @@
+# esp32.py - host stand-in
+
+WAKEUP_ALL_LOW = 0
+WAKEUP_ANY_HIGH = 1
+
+
+def wake_on_ext0(pin, level):
+    pass
+
+
+def wake_on_ext1(pins, level):
+    pass
+
+
+def raw_temperature():
+    return 120
+
+
+def hall_sensor():
+    return 0
@@ -0,0 +1,152 @@
+# framebuf.py - host stand-in for MicroPython's framebuf
+#
+# Pixels are read and written straight in the caller's buffer in the
+# given format, so drivers that send the buffer (SSD1306.show) see the
+# same bytes as on the device.  Text uses the placeholder 8x8 box glyphs.
+
+MONO_VLSB = 0
+MONO_HLSB = 3
+MONO_HMSB = 4
+RGB565 = 1
+GS2_HMSB = 5
+GS4_HMSB = 2
+GS8 = 6
+MVLSB = MONO_VLSB
+
+
+class FrameBuffer(object):
+    def __init__(self, buffer, width, height, format, stride=None):
+        self.buf = buffer
+        self.width = width
+        self.height = height
+        self.format = format
+        self.stride = width if stride is None else stride
+
+    def _get(self, x, y):
+        f = self.format
+        buf = self.buf
+        if f == MONO_VLSB :
+            return buf[(y >> 3) * self.stride + x] >> (y & 7) & 1
+        if f == MONO_HLSB :
+            return buf[(y * self.stride + x) >> 3] >> (7 - (x & 7)) & 1
+        if f == MONO_HMSB :
+            return buf[(y * self.stride + x) >> 3] >> (x & 7) & 1
+        if f == RGB565 :
+            i = (y * self.stride + x) * 2
+            return buf[i] | buf[i + 1] << 8
+        if f == GS8 :
+            return buf[y * self.stride + x]
+        if f == GS4_HMSB :
+            i = (y * self.stride + x) >> 1
+            return buf[i] >> (0 if x & 1 else 4) & 0x0F
+        i = (y * self.stride + x) >> 2
+        return buf[i] >> ((x & 3) << 1) & 3
+
+    def _set(self, x, y, c):
+        f = self.format
+        buf = self.buf
+        if f == MONO_VLSB :
+            i = (y >> 3) * self.stride + x
+            m = 1 << (y & 7)
+        elif f == MONO_HLSB :
+            i = (y * self.stride + x) >> 3
+            m = 0x80 >> (x & 7)
+        elif f == MONO_HMSB :
+            i = (y * self.stride + x) >> 3
+            m = 1 << (x & 7)
+        elif f == RGB565 :
+            i = (y * self.stride + x) * 2
+            buf[i] = c & 0xFF
+            buf[i + 1] = c >> 8 & 0xFF
+            return
+        elif f == GS8 :
+            buf[y * self.stride + x] = c & 0xFF
+            return
+        elif f == GS4_HMSB :
+            i = (y * self.stride + x) >> 1
+            s = 0 if x & 1 else 4
+            buf[i] = buf[i] & ~(0x0F << s) & 0xFF | (c & 0x0F) << s
+            return
+        else :
+            i = (y * self.stride + x) >> 2
+            s = (x & 3) << 1
+            buf[i] = buf[i] & ~(3 << s) & 0xFF | (c & 3) << s
+            return
+        if c :
+            buf[i] |= m
+        else :
+            buf[i] &= ~m & 0xFF
+
+    def pixel(self, x, y, c=None):
+        if 0 <= x < self.width and 0 <= y < self.height :
+            if c is None :
+                return self._get(x, y)
+            self._set(x, y, c)
+
+    def fill_rect(self, x, y, w, h, c):
+        for yy in range(max(y, 0), min(y + h, self.height)) :
+            for xx in range(max(x, 0), min(x + w, self.width)) :
+                self._set(xx, yy, c)
+
+    def fill(self, c):
+        self.fill_rect(0, 0, self.width, self.height, c)
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f :
+            self.fill_rect(x, y, w, h, c)
+            return
+        self.fill_rect(x, y, w, 1, c)
+        self.fill_rect(x, y + h - 1, w, 1, c)
+        self.fill_rect(x, y, 1, h, c)
+        self.fill_rect(x + w - 1, y, 1, h, c)
+
+    def line(self, x0, y0, x1, y1, c):
+        dx = abs(x1 - x0)
+        dy = -abs(y1 - y0)
+        sx = 1 if x0 < x1 else -1
+        sy = 1 if y0 < y1 else -1
+        err = dx + dy
+        while True :
+            self.pixel(x0, y0, c)
+            if x0 == x1 and y0 == y1 :
+                return
+            e2 = 2 * err
+            if e2 >= dy :
+                err += dy
+                x0 += sx
+            if e2 <= dx :
+                err += dx
+                y0 += sy
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        for yy in range(fbuf.height) :
+            for xx in range(fbuf.width) :
+                c = fbuf._get(xx, yy)
+                if c != key :
+                    if palette is not None :
+                        c = palette._get(c, 0)
+                    self.pixel(x + xx, y + yy, c)
+
+    def scroll(self, xstep, ystep):
+        w = self.width
+        h = self.height
+        xs = range(w - 1, -1, -1) if xstep > 0 else range(w)
+        ys = range(h - 1, -1, -1) if ystep > 0 else range(h)
+        for y in ys :
+            for x in xs :
+                sx = x - xstep
+                sy = y - ystep
+                if 0 <= sx < w and 0 <= sy < h :
+                    self._set(x, y, self._get(sx, sy))
+
+    def text(self, s, x, y, c=1):
+        for ch in s :
+            if ch != ' ' :
+                self.rect(x + 1, y + 1, 6, 6, c)
+            x += 8
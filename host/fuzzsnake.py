@@ -0,0 +1,89 @@
+# fuzzsnake.py - randomised check of the snake occupancy grid
+#
+# Plays seeded demo games of _g_snake.py on the virtual clock and, at
+# every frame, rebuilds the segment count of each cell from the body
+# ring buffer (tail to head, cells off the board not counted) and
+# compares it with the occ grid the game keeps up to date.  Any
+# difference is reported and the exit status is 1.
+#
+#   python3 host/fuzzsnake.py --minutes 10 --seeds 8
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import run
+
+
+def body(scope):
+    # segment counts per cell from the bx/by ring buffer
+    cols = scope['COLS']
+    rows = scope['ROWS']
+    bx = scope['bx']
+    by = scope['by']
+    count = [0] * (cols * rows)
+    i = scope['tail']
+    for _ in range(scope['slen']) :
+        x = bx[i]
+        y = by[i]
+        if 0 <= x < cols and 0 <= y < rows :
+            count[y * cols + x] += 1
+        i = (i + 1) % len(bx)
+    return count
+
+
+def check(minutes=10, seed=0):
+    state = {'frames': 0, 'bad': 0, 'first': None, 'longest': 0}
+
+    def compare(scope):
+        # called at every sleep, with the game's globals
+        if 'occ' not in scope or 'game' not in scope :
+            return
+        occ = scope['occ']
+        if len(occ) != scope['COLS'] * scope['ROWS'] :
+            return      # not sized yet
+        state['frames'] += 1
+        state['longest'] = max(state['longest'], scope['slen'])
+        count = body(scope)
+        if list(occ) != count :
+            state['bad'] += 1
+            if state['first'] is None :
+                cells = [c for c in range(len(count)) if occ[c] != count[c]]
+                state['first'] = 'frame %d, cells %s: occ %s, body %s' % (
+                    state['frames'], cells[:4], [occ[c] for c in cells[:4]],
+                    [count[c] for c in cells[:4]])
+
+    out = sys.stdout
+    sys.stdout = open(os.devnull, 'w')     # the game prints every life
+    try :
+        stats = run.run('_g_snake.py', minutes * 60000, seed=seed * 1000003,
+                        presses=[(35, 1000, 100), (0, 2000, 100)],
+                        verbose=False, check=compare)
+    finally :
+        sys.stdout.close()
+        sys.stdout = out
+    state['stop'] = stats['stop']
+    return state
+
+
+def main(argv):
+    import argparse
+    p = argparse.ArgumentParser(description='Check the snake occupancy grid against its body.')
+    p.add_argument('--minutes', type=int, default=10, help='virtual minutes per seed')
+    p.add_argument('--seeds', type=int, default=4)
+    args = p.parse_args(argv)
+
+    failed = False
+    for seed in range(args.seeds) :
+        s = check(args.minutes, seed)
+        print('seed %d: %d frames checked, longest snake %d, %d mismatches' % (
+            seed, s['frames'], s['longest'], s['bad']))
+        if s['first'] :
+            print('  first at %s' % s['first'])
+        failed = failed or s['bad'] or s['stop'] == 'error' or not s['frames']
+    return 1 if failed else 0
+
+
+if __name__ == '__main__' :
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,142 @@
+# fuzzsweep.py - randomised test of blockgrid's swept ball collision
+#
+# Throws balls at random speeds and angles into random block grids and
+# checks BlockGrid.sweep() against the path sampled in small steps:
+# the first block hit must be the first block the path enters, a ball
+# that hits nothing must not have crossed a live block, and no ball may
+# end the frame inside one.  The same trials are scored for the old
+# move-then-test-overlap step, and the time per sweep is reported.
+#
+#   python3 host/fuzzsweep.py --trials 20000 --seed 1
+#   python3 host/fuzzsweep.py --max-speed 8
+
+import math
+import os
+import random
+import sys
+import time
+from array import array
+
+HOST = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HOST)
+sys.path.insert(1, os.path.dirname(HOST))
+
+from blockgrid import BlockGrid
+from kinematics import FP
+
+STEPS = 1024    # samples of the path per frame
+SLACK = 2       # samples two blocks may be entered apart and count as a tie
+SIZE = 3        # the arkanoid ball
+
+
+def overlaps(grid, x, y, k):
+    # the ball at fixed point x, y inside block k, open intervals
+    r = k // grid.cols
+    c = k - r * grid.cols
+    lo = (grid.x0 + c * grid.dx - SIZE) << FP
+    top = (grid.y0 + r * grid.dy - SIZE) << FP
+    return (lo < x < lo + ((SIZE + grid.w) << FP) and
+            top < y < top + ((SIZE + grid.h) << FP))
+
+
+def entered(grid, x, y, vx, vy):
+    # {block: first sample inside it} along the straight path
+    live = [k for k in range(len(grid.alive)) if grid.alive[k]]
+    first = {}
+    for s in range(STEPS + 1) :
+        px = x + vx * s / STEPS
+        py = y + vy * s / STEPS
+        for k in live :
+            if k not in first and overlaps(grid, px, py, k) :
+                first[k] = s
+    return first
+
+
+def trial(rng, max_speed):
+    # a random grid and a ball outside its blocks, arkanoid's geometry
+    # give or take
+    cols = rng.randint(3, 9)
+    rows = rng.randint(2, 10)
+    w = rng.randint(4, 15)
+    h = rng.randint(3, 7)
+    grid = BlockGrid(0, 20, cols, rows, w + rng.randint(0, 2),
+                     h + rng.randint(0, 2), w, h)
+    for k in range(cols * rows) :
+        if rng.random() < 0.5 :
+            grid.add(k)
+    while True :
+        x = rng.randint(-4 << FP, (cols * grid.dx + 4) << FP)
+        y = rng.randint(10 << FP, (20 + rows * grid.dy + 10) << FP)
+        if not any(grid.alive[k] and overlaps(grid, x, y, k) for k in range(cols * rows)) :
+            break
+    speed = rng.randint(1 << FP, max_speed << FP)
+    a = rng.random() * 6.2832
+    vx = int(speed * math.cos(a))
+    vy = int(speed * math.sin(a))
+    return grid, x, y, vx, vy
+
+
+def run(trials, max_speed, seed):
+    rng = random.Random(seed)
+    bad = {'first': 0, 'tunnelled': 0, 'inside': 0}
+    old = {'tunnelled': 0, 'first': 0}
+    hits = 0
+    spent = 0.0
+    xs = array('i', [0])
+    ys = array('i', [0])
+    vxs = array('i', [0])
+    vys = array('i', [0])
+    for _ in range(trials) :
+        grid, x, y, vx, vy = trial(rng, max_speed)
+        first = entered(grid, x, y, vx, vy)
+        soonest = min(first.values()) if first else None
+        ties = set(k for k, s in first.items() if s <= soonest + SLACK) if first else set()
+
+        # the old step: move the whole way, then the first overlapping
+        # block in list order
+        ex = x + vx
+        ey = y + vy
+        was = -1
+        for k in range(len(grid.alive)) :
+            if grid.alive[k] and overlaps(grid, ex, ey, k) :
+                was = k
+                break
+        if first and was < 0 :
+            old['tunnelled'] += 1
+        elif was >= 0 and was not in ties :
+            old['first'] += 1
+
+        got = []
+        xs[0], ys[0], vxs[0], vys[0] = x, y, vx, vy
+        t = time.perf_counter()
+        grid.sweep(xs, ys, vxs, vys, 0, SIZE, got.append)
+        spent += time.perf_counter() - t
+        hits += len(got)
+        if first and not got :
+            bad['tunnelled'] += 1
+        elif got and got[0] not in ties :
+            bad['first'] += 1
+        if any(grid.alive[k] and overlaps(grid, xs[0], ys[0], k) for k in range(len(grid.alive))) :
+            bad['inside'] += 1
+    return bad, old, hits, spent
+
+
+def main(argv):
+    import argparse
+    p = argparse.ArgumentParser(description='Fuzz BlockGrid.sweep() against a sampled path.')
+    p.add_argument('--trials', type=int, default=5000)
+    p.add_argument('--max-speed', type=int, default=16, help='pixels per frame')
+    p.add_argument('--seed', type=int, default=0)
+    args = p.parse_args(argv)
+
+    bad, old, hits, spent = run(args.trials, args.max_speed, args.seed)
+    print('%d trials, %d blocks hit, %.1fus per sweep' % (
+        args.trials, hits, spent * 1e6 / args.trials))
+    print('sweep: %d tunnelled, %d wrong first block, %d ended inside a block' % (
+        bad['tunnelled'], bad['first'], bad['inside']))
+    print('old step: %d tunnelled, %d wrong first block' % (old['tunnelled'], old['first']))
+    return 1 if any(bad.values()) else 0
+
+
+if __name__ == '__main__' :
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,196 @@
+# hostsim.py
+#
+# Shared state of the host backend: the virtual clock, timers, pin levels
+# and irqs, scripted input and run statistics.  The stand-in utime, machine
+# and st7789 modules in this directory all talk to the one `sim` object.
+#
+# The clock is virtual.  Sleeps return at once and just move the clock on,
+# so games run as fast as the host can draw.  With tick_us > 0 (run.py's
+# default) the clock otherwise only moves tick_us per read, so busy waits
+# still finish and a run is exactly repeatable, and drawing costs the time
+# its bytes take on the 30MHz SPI bus.  With tick_us 0 time spent
+# computing on the host counts instead.
+
+import random
+import time
+
+
+class Halt(BaseException):
+    # Raised from the clock when the run's time limit is reached, or by
+    # machine.reset()/deepsleep().  A BaseException so game code catching
+    # Exception does not swallow it.
+    pass
+
+
+class Sim(object):
+    def __init__(self):
+        self.reset()
+
+    def reset(self, tick_us=0, limit_ms=None, start_us=0):
+        # start_us sets where the clock starts, which changes everything
+        # seeded from ticks_us()
+        self.tick_us = tick_us
+        self.limit = None if limit_ms is None else start_us + limit_ms * 1000
+        self.start = time.perf_counter()
+        self.slept = start_us   # us skipped by sleeps
+        self.fixed = start_us   # the clock when tick_us > 0
+        self.busNs = 0          # bus time not yet added to it
+        self.last = start_us    # last time handed out, the clock never runs back
+        self.polling = False
+        # timers and irqs
+        self.timers = []
+        self.irqOff = 0
+        self.pending = []       # pin irqs raised while irqs were disabled
+        # pins: id -> level of input pins, id -> list of Pin objects with irqs
+        self.levels = {}
+        self.irqPins = {}
+        self.adc = {}
+        self.adcNoise = {}      # pin -> +- counts added to each read
+        self.noise = random.Random(start_us)
+        # scripted input, sorted (time us, order, pin, level or None, adc value)
+        self.script = []
+        self.order = 0
+        # the one display panel and per run statistics
+        self.panel = None
+        self.frameHooks = []     # called with the time on every clock poll
+        self.sleepHooks = []     # called at the start of every sleep
+        self.sleeps = 0
+        self.frameWall = []
+        self.lastSleep = self.start
+        self.pwmChanges = 0
+
+    # ---- clock ----
+
+    def now(self):
+        if self.tick_us :
+            self.fixed += self.tick_us
+            t = self.fixed
+        else :
+            t = int((time.perf_counter() - self.start) * 1000000) + self.slept
+        if t < self.last :
+            t = self.last
+        self.last = t
+        self.poll(t)
+        return t
+
+    def bus(self, nbytes):
+        # charge a transfer to the deterministic clock
+        if self.tick_us :
+            self.busNs += nbytes * 800 // 3     # 30MHz, 8 bits a byte
+            self.fixed += self.busNs // 1000
+            self.busNs %= 1000
+
+    def sleep(self, us):
+        wall = time.perf_counter()
+        self.sleeps += 1
+        self.frameWall.append(int((wall - self.lastSleep) * 1000000))
+        for hook in self.sleepHooks :
+            hook()
+        t = self.now()
+        end = t + max(0, int(us))
+        # step through timers due during the sleep so they fire in order
+        while True :
+            due = self.nextDue()
+            if due is None or due > end :
+                break
+            self.advance(due)
+        self.advance(end)
+        self.lastSleep = time.perf_counter()
+
+    def advance(self, t):
+        if t <= self.last :
+            self.poll(self.last)
+            return
+        if self.tick_us :
+            self.fixed = t
+        else :
+            self.slept += t - self.now()
+        self.last = t
+        self.poll(t)
+
+    # ---- events ----
+
+    def poll(self, t):
+        if self.polling :
+            return
+        self.polling = True
+        try :
+            if self.limit is not None and t >= self.limit :
+                raise Halt('time limit')
+            script = self.script
+            while script and script[0][0] <= t :
+                _, _, pin, level, value = script.pop(0)
+                if level is None :
+                    self.adc[pin] = value
+                else :
+                    self.setLevel(pin, level)
+            if not self.irqOff :
+                while True :
+                    due = self.nextDue()
+                    if due is None or due > t :
+                        break
+                    self.fire(due)
+            for hook in self.frameHooks :
+                hook(t)
+        finally :
+            self.polling = False
+
+    def nextDue(self):
+        due = None
+        for timer in self.timers :
+            if due is None or timer.due < due :
+                due = timer.due
+        return due
+
+    def fire(self, due):
+        for timer in list(self.timers) :
+            if timer.due == due :
+                if timer.mode :
+                    timer.due += timer.period
+                else :
+                    self.timers.remove(timer)
+                if timer.callback :
+                    timer.callback(timer)
+                return
+
+    def setLevel(self, pin, level):
+        old = self.levels.get(pin)
+        self.levels[pin] = level
+        if old is None or old == level :
+            return
+        for p in self.irqPins.get(pin, ()) :
+            if p.trigger & (1 if old and not level else 2) :
+                if self.irqOff :
+                    self.pending.append(p)
+                else :
+                    p.handler(p)
+
+    def disableIrq(self):
+        self.irqOff += 1
+        return self.irqOff - 1
+
+    def enableIrq(self, state):
+        self.irqOff = state
+        if not state :
+            pending = self.pending
+            self.pending = []
+            for p in pending :
+                p.handler(p)
+
+    # ---- scripted input ----
+
+    def at(self, ms, pin, level=None, value=0):
+        self.order += 1
+        self.script.append((int(ms * 1000), self.order, pin, level, value))
+        self.script.sort()
+
+    def press(self, pin, ms, hold=100):
+        # buttons are wired active low with pull ups
+        self.at(ms, pin, 0)
+        self.at(ms + hold, pin, 1)
+
+    def setAdc(self, pin, value, ms=0):
+        self.at(ms, pin, None, value)
+
+
+sim = Sim()
@@ -0,0 +1,188 @@
+# levelc.py - compile text level descriptions into levelpack files
+#
+# The brick games load their layouts from a binary level pack on flash
+# (see levelpack.py).  This builds one from a text file:
+#
+#   # comments, from a # at the start of a line or a '# ' after a space,
+#   # and blank lines are skipped
+#   cols 9                      # blocks per row
+#   rows 10                     # rows at most
+#   powerup wide 0              # names for the game's powerup numbers
+#   type R red 1 22             # char, colour, hit points, drop chance %
+#   type S #c0c0c0 3 30         # colours: st7789 names, #rrggbb or 0xRGB565
+#   powerups wide multi slow    # the table drops are picked from
+#   level                       # then one line per row, '.' for no block
+#   RRRRRRRRR
+#   .S.S.S.S.
+#
+# type and powerups lines apply to the levels after them.  Each level
+# stores only the types it uses.
+#
+#   python3 host/levelc.py host/levels/arkanoid.txt arkanoid.lvl
+#   python3 host/levelc.py --dump arkanoid.lvl
+
+import re
+import struct
+import sys
+
+COLORS = {
+    'black': 0x0000, 'blue': 0x001F, 'red': 0xF800, 'green': 0x07E0,
+    'cyan': 0x07FF, 'magenta': 0xF81F, 'yellow': 0xFFE0, 'white': 0xFFFF,
+}
+MAX_TYPES = 15
+MAX_POWERUPS = 16
+EMPTY = '. '
+COMMENT = re.compile(r'^\s*#.*|\s+#(\s.*)?$')
+
+
+class LevelError(Exception):
+    pass
+
+
+def color(word):
+    if word.lower() in COLORS :
+        return COLORS[word.lower()]
+    if word.startswith('#') and len(word) == 7 :
+        r, g, b = (int(word[i:i + 2], 16) for i in (1, 3, 5))
+        return (r >> 3) << 11 | (g >> 2) << 5 | b >> 3
+    return int(word, 0) & 0xFFFF
+
+
+def parse(lines):
+    # Returns cols, rows and a list of levels, each (rows, types,
+    # powerups) with rows lists of type chars and types {char: (colour,
+    # hits, drop)}
+    cols = rows = None
+    names = {}
+    types = {}
+    powerups = []
+    levels = []
+    level = None
+    for n, line in enumerate(lines, 1) :
+        text = COMMENT.sub('', line.rstrip('\n')).rstrip()
+        words = text.split()
+        if not words :
+            continue
+        try :
+            key = words[0]
+            if key == 'cols' :
+                cols = int(words[1])
+            elif key == 'rows' :
+                rows = int(words[1])
+            elif key == 'powerup' :
+                names[words[1]] = int(words[2])
+            elif key == 'type' :
+                if len(words[1]) != 1 or words[1] in EMPTY :
+                    raise LevelError('type names are one character, not . or space')
+                hits = int(words[3])
+                if not 1 <= hits <= 255 :
+                    raise LevelError('hit points are 1 to 255')
+                types[words[1]] = (color(words[2]), hits, int(words[4]) if len(words) > 4 else 0)
+            elif key == 'powerups' :
+                powerups = [names[w] if w in names else int(w) for w in words[1:]]
+                if len(powerups) > MAX_POWERUPS :
+                    raise LevelError('at most %d powerups' % MAX_POWERUPS)
+            elif key == 'level' :
+                if cols is None or rows is None :
+                    raise LevelError('cols and rows come before the levels')
+                level = ([], dict(types), list(powerups))
+                levels.append(level)
+            elif level is not None :
+                row = text + '.' * (cols - len(text))
+                if len(row) != cols :
+                    raise LevelError('rows are %d blocks' % cols)
+                for ch in row :
+                    if ch not in EMPTY and ch not in level[1] :
+                        raise LevelError('no type %r' % ch)
+                level[0].append(row)
+                if len(level[0]) > rows :
+                    raise LevelError('more than %d rows' % rows)
+            else :
+                raise LevelError('unknown line')
+        except (LevelError, ValueError, IndexError, KeyError) as e :
+            raise LevelError('line %d: %s' % (n, e))
+    if not levels :
+        raise LevelError('no levels')
+    return cols, rows, levels
+
+
+def build(cols, rows, levels):
+    out = bytearray(b'LVL\x01' + struct.pack('<BBH', cols, rows, len(levels)))
+    table = len(out)
+    out += bytes(4 * len(levels))
+    for i, (grid, types, powerups) in enumerate(levels) :
+        struct.pack_into('<I', out, table + 4 * i, len(out))
+        used = []
+        for row in grid :
+            for ch in row :
+                if ch not in EMPTY and ch not in used :
+                    used.append(ch)
+        if len(used) > MAX_TYPES :
+            raise LevelError('level %d uses more than %d types' % (i + 1, MAX_TYPES))
+        # trailing empty rows are not stored
+        while grid and all(ch in EMPTY for ch in grid[-1]) :
+            grid = grid[:-1]
+        out += struct.pack('<BBB', len(used), len(powerups), len(grid))
+        for ch in used :
+            out += struct.pack('<HBB', *types[ch])
+        out += bytes(powerups)
+        for row in grid :
+            out += bytes(0 if ch in EMPTY else used.index(ch) + 1 for ch in row)
+    return bytes(out)
+
+
+def dump(data):
+    # Print a pack back as text, as a check
+    if data[:4] != b'LVL\x01' :
+        raise LevelError('not a level pack')
+    cols, rows, count = struct.unpack_from('<BBH', data, 4)
+    print('cols %d\nrows %d' % (cols, rows))
+    for i in range(count) :
+        at = struct.unpack_from('<I', data, 8 + 4 * i)[0]
+        ntypes, npowerups, used = struct.unpack_from('<BBB', data, at)
+        at += 3
+        print('\nlevel  # %d, %d bytes' % (i + 1, 3 + 4 * ntypes + npowerups + used * cols))
+        chars = '.'
+        for t in range(ntypes) :
+            c, hits, drop = struct.unpack_from('<HBB', data, at)
+            at += 4
+            ch = chr(ord('A') + t)
+            chars += ch
+            print('#   %s 0x%04X hits %d drop %d%%' % (ch, c, hits, drop))
+        if npowerups :
+            print('#   powerups %s' % ' '.join(str(p) for p in data[at:at + npowerups]))
+        at += npowerups
+        for r in range(used) :
+            print(''.join(chars[t] for t in data[at:at + cols]))
+            at += cols
+
+
+def main(argv):
+    import argparse
+    p = argparse.ArgumentParser(description='Compile a text level description into a level pack.')
+    p.add_argument('source', help='text levels, or a pack with --dump')
+    p.add_argument('pack', nargs='?', help='the level pack to write')
+    p.add_argument('--dump', action='store_true', help='print a level pack as text')
+    args = p.parse_args(argv)
+
+    try :
+        if args.dump :
+            with open(args.source, 'rb') as f :
+                dump(f.read())
+            return 0
+        if not args.pack :
+            p.error('give the pack to write')
+        with open(args.source) as f :
+            cols, rows, levels = parse(f.readlines())
+        data = build(cols, rows, levels)
+    except LevelError as e :
+        print('%s: %s' % (args.source, e), file=sys.stderr)
+        return 1
+    with open(args.pack, 'wb') as f :
+        f.write(data)
+    print('%s: %d levels, %d bytes' % (args.pack, len(levels), len(data)))
+    return 0
+
+
+if __name__ == '__main__' :
+    sys.exit(main(sys.argv[1:]))
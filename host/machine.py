@@ -0,0 +1,293 @@
+# machine.py - host stand-in for MicroPython's machine module
+#
+# Input pin levels and ADC readings come from the scripted input in
+# hostsim, timers fire on the virtual clock and irq handlers run inline.
+
+from hostsim import sim, Halt
+from utime import ticks_us
+
+
+class Pin(object):
+    IN = 1
+    OUT = 3
+    OPEN_DRAIN = 7
+    PULL_UP = 2
+    PULL_DOWN = 1
+    PULL_HOLD = 4
+    DRIVE_0 = 0
+    DRIVE_1 = 1
+    DRIVE_2 = 2
+    DRIVE_3 = 3
+    IRQ_FALLING = 1
+    IRQ_RISING = 2
+    WAKE_LOW = 4
+    WAKE_HIGH = 5
+
+    def __init__(self, id, mode=-1, pull=-1, value=None, **kwargs):
+        self.id = id
+        self.mode = None
+        self.pull = None
+        self.out = 0
+        self.handler = None
+        self.trigger = 0
+        self.init(mode, pull, value)
+
+    def init(self, mode=-1, pull=-1, value=None, **kwargs):
+        if mode != -1 :
+            self.mode = mode
+        if pull != -1 :
+            self.pull = pull
+        if value is not None :
+            self.out = 1 if value else 0
+        if self.mode != Pin.OUT :
+            sim.levels.setdefault(self.id, 1 if self.pull == Pin.PULL_UP else 0)
+
+    def value(self, x=None):
+        if x is None :
+            if self.mode == Pin.OUT :
+                return self.out
+            sim.now()   # apply scripted input due by now
+            return sim.levels.get(self.id, 0)
+        self.out = 1 if x else 0
+
+    __call__ = value
+
+    def on(self):
+        self.out = 1
+
+    def off(self):
+        self.out = 0
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, **kwargs):
+        pins = sim.irqPins.setdefault(self.id, [])
+        if self in pins :
+            pins.remove(self)
+        self.handler = handler
+        self.trigger = trigger
+        if handler is not None :
+            pins.append(self)
+        return self
+
+    def __repr__(self):
+        return 'Pin(%d)' % self.id
+
+
+class Signal(object):
+    def __init__(self, pin, invert=False):
+        self.pin = pin
+        self.invert = invert
+
+    def value(self, x=None):
+        if x is None :
+            return self.pin.value() ^ self.invert
+        self.pin.value(bool(x) ^ self.invert)
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+
+class PWM(object):
+    def __init__(self, pin, freq=5000, duty=0, **kwargs):
+        self.pin = pin
+        self.f = freq
+        self.d = duty
+
+    def init(self, freq=None, duty=None, **kwargs):
+        if freq is not None :
+            self.freq(freq)
+        if duty is not None :
+            self.duty(duty)
+
+    def freq(self, f=None):
+        if f is None :
+            return self.f
+        if f != self.f :
+            sim.pwmChanges += 1
+        self.f = f
+
+    def duty(self, d=None):
+        if d is None :
+            return self.d
+        if d != self.d :
+            sim.pwmChanges += 1
+        self.d = d
+
+    def duty_u16(self, d=None):
+        if d is None :
+            return self.d << 6
+        self.duty(d >> 6)
+
+    def deinit(self):
+        self.d = 0
+
+
+class ADC(object):
+    ATTN_0DB = 0
+    ATTN_2_5DB = 1
+    ATTN_6DB = 2
+    ATTN_11DB = 3
+    WIDTH_9BIT = 0
+    WIDTH_10BIT = 1
+    WIDTH_11BIT = 2
+    WIDTH_12BIT = 3
+
+    def __init__(self, pin, **kwargs):
+        self.id = pin.id if isinstance(pin, Pin) else pin
+
+    def read(self):
+        sim.now()
+        value = sim.adc.get(self.id, 0)
+        noise = sim.adcNoise.get(self.id)
+        if noise :
+            value = max(0, min(4095, value + sim.noise.randint(-noise, noise)))
+        return value
+
+    def read_u16(self):
+        return self.read() << 4
+
+    def read_uv(self):
+        return self.read() * 3300000 // 4095
+
+    def atten(self, attn):
+        pass
+
+    def width(self, bits):
+        pass
+
+    def deinit(self):
+        pass
+
+
+class Timer(object):
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, **kwargs):
+        self.id = id
+        self.mode = Timer.PERIODIC
+        self.period = 0
+        self.due = 0
+        self.callback = None
+        if kwargs :
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, period=-1, freq=-1, callback=None, **kwargs):
+        self.deinit()
+        self.mode = mode
+        if freq > 0 :
+            self.period = int(1000000 / freq)
+        else :
+            self.period = max(1, period) * 1000
+        self.callback = callback
+        self.due = ticks_us() + self.period
+        sim.timers.append(self)
+
+    def deinit(self):
+        if self in sim.timers :
+            sim.timers.remove(self)
+
+    def value(self):
+        return max(0, self.due - ticks_us()) // 1000
+
+
+class SPI(object):
+    MSB = 0
+    LSB = 1
+
+    def __init__(self, id=1, baudrate=1000000, **kwargs):
+        self.id = id
+        self.baudrate = baudrate
+        self.written = 0
+
+    def init(self, baudrate=None, **kwargs):
+        if baudrate :
+            self.baudrate = baudrate
+
+    def write(self, buf):
+        self.written += len(buf)
+
+    def read(self, n, write=0):
+        return bytes(n)
+
+    def readinto(self, buf, write=0):
+        pass
+
+    def write_readinto(self, wbuf, rbuf):
+        self.written += len(wbuf)
+
+    def deinit(self):
+        pass
+
+
+SoftSPI = SPI
+
+
+class I2C(object):
+    def __init__(self, id=0, **kwargs):
+        self.id = id
+        self.written = 0
+
+    def scan(self):
+        return []
+
+    def writeto(self, addr, buf, stop=True):
+        self.written += len(buf)
+        return 1
+
+    def writevto(self, addr, vector, stop=True):
+        for buf in vector :
+            self.written += len(buf)
+        return 1
+
+    def readfrom(self, addr, n, stop=True):
+        return bytes(n)
+
+    def deinit(self):
+        pass
+
+
+SoftI2C = I2C
+
+
+def disable_irq():
+    return sim.disableIrq()
+
+
+def enable_irq(state=0):
+    sim.enableIrq(state)
+
+
+def freq(hz=None):
+    if hz is None :
+        return 240000000
+
+
+def idle():
+    sim.sleep(1000)
+
+
+def lightsleep(ms=None):
+    sim.sleep((ms or 0) * 1000)
+
+
+def deepsleep(ms=None):
+    raise Halt('deepsleep')
+
+
+def reset():
+    raise Halt('reset')
+
+
+def soft_reset():
+    raise Halt('soft reset')
+
+
+def reset_cause():
+    return 1
+
+
+def unique_id():
+    return b'host\x00\x00'
@@ -0,0 +1,49 @@
+# micropython.py - host stand-in for the micropython module
+
+
+def const(x):
+    return x
+
+
+def native(f):
+    return f
+
+
+def viper(f):
+    return f
+
+
+def mem_info(verbose=False):
+    print('mem: host')
+
+
+def qstr_info(verbose=False):
+    print('qstr: host')
+
+
+def stack_use():
+    return 0
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def opt_level(level=None):
+    return 0
+
+
+def heap_lock():
+    return 0
+
+
+def heap_unlock():
+    return 0
+
+
+def kbd_intr(chr):
+    pass
+
+
+def schedule(func, arg):
+    func(arg)
@@ -0,0 +1,47 @@
+# network.py - host stand-in, a WLAN that is always connected
+#
+# Sockets and HTTP go through the host's own network stack.
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_GOT_IP = 1010
+
+
+class WLAN(object):
+    def __init__(self, interface=STA_IF):
+        self.interface = interface
+        self.up = False
+        self.settings = {}
+
+    def active(self, is_active=None):
+        if is_active is None :
+            return self.up
+        self.up = bool(is_active)
+
+    def connect(self, ssid=None, key=None, **kwargs):
+        self.settings['essid'] = ssid
+
+    def disconnect(self):
+        pass
+
+    def isconnected(self):
+        return True
+
+    def status(self, param=None):
+        return STAT_GOT_IP
+
+    def scan(self):
+        return []
+
+    def config(self, *args, **kwargs):
+        self.settings.update(kwargs)
+        if args :
+            return self.settings.get(args[0])
+
+    def ifconfig(self, config=None):
+        if self.interface == AP_IF :
+            return ('192.168.4.1', '255.255.255.0', '192.168.4.1', '192.168.4.1')
+        return ('127.0.0.1', '255.255.255.0', '127.0.0.1', '127.0.0.1')
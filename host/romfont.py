@@ -0,0 +1,25 @@
+# romfont.py - placeholder romfonts for the host backend
+#
+# The vga1_* fonts are built into the device firmware and not part of this
+# repository.  These stand-ins have the same metrics and layout (FIRST,
+# LAST, WIDTH, HEIGHT and FONT as rows of MSB first bytes) but every
+# printable glyph is an outlined box.  Copy the real romfonts from
+# st7789_mpy/fonts/romfonts over the vga1_*.py files here for real text.
+
+
+def make(width, height, first=0x20, last=0x7f):
+    stride = (width + 7) // 8
+    box = bytearray()
+    for row in range(height) :
+        if row in (1, height - 2) :
+            bits = ((1 << (width - 2)) - 1) << 1
+        elif 1 < row < height - 2 :
+            bits = 1 << (width - 2) | 2
+        else :
+            bits = 0
+        box += (bits << (stride * 8 - width)).to_bytes(stride, 'big')
+    blank = bytes(stride * height)
+    font = bytearray()
+    for ch in range(first, last + 1) :
+        font += blank if ch == 0x20 else box
+    return first, last, width, height, bytes(font)
@@ -0,0 +1,221 @@
+# run.py - run the games and demos on a Linux host
+#
+# Puts the stand-in st7789, machine, utime, framebuf and micropython modules
+# in this directory ahead of everything else, runs boot.py like the device
+# does and then the given script, unmodified, on the virtual clock.
+#
+#   python3 host/run.py _g_snake.py --ms 20000 --press 0@2000 --png out
+#   python3 host/run.py main.py --press 35@3000 --press 0@9000+500
+#
+# --press PIN@MS[+HOLD] holds the (active low) button on PIN down from MS
+# for HOLD ms (default 100), --adc PIN=VALUE[@MS] sets an ADC reading.
+# With --png DIR the screen is saved every --every ms of virtual time and
+# at the end.  A timing report is printed when the run stops.
+
+import builtins
+import gc
+import os
+import sys
+import time
+import traceback
+
+HOST = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HOST)
+
+for path in (ROOT, HOST) :
+    if path in sys.path :
+        sys.path.remove(path)
+    sys.path.insert(0, path)
+
+from hostsim import sim, Halt
+import micropython
+
+# MicroPython names the scripts expect from the firmware
+ALIASES = {
+    'ujson': 'json',
+    'ubinascii': 'binascii',
+    'usocket': 'socket',
+    'ussl': 'ssl',
+    'uos': 'os',
+    'ustruct': 'struct',
+    'urandom': 'random',
+    'uselect': 'select',
+    'uerrno': 'errno',
+    'uhashlib': 'hashlib',
+    'uzlib': 'zlib',
+    'ure': 're',
+    'uio': 'io',
+    'ucollections': 'collections',
+}
+
+
+def install():
+    builtins.const = micropython.const
+    if not hasattr(gc, 'mem_free') :
+        gc.mem_free = lambda: 100 * 1024
+    if not hasattr(sys, 'print_exception') :
+        sys.print_exception = lambda e, f=sys.stdout: traceback.print_exception(type(e), e, e.__traceback__, file=f)
+    for alias, name in ALIASES.items() :
+        if alias not in sys.modules :
+            sys.modules[alias] = __import__(name)
+
+
+def mpImport(name, globals=None, locals=None, fromlist=(), level=0):
+    # the firmware's time module is utime
+    if name == 'time' :
+        name = 'utime'
+    return builtins.__import__(name, globals, locals, fromlist, level)
+
+
+def mpExec(code, globals=None, locals=None):
+    # MicroPython's exec() without namespaces runs in the caller's globals,
+    # even from inside a function (menu.py launches scripts that way)
+    if globals is None :
+        globals = sys._getframe(1).f_globals
+    return builtins.exec(code, globals, locals)
+
+
+def forget():
+    # Drop modules loaded from the repository so the next run starts clean
+    for name, module in list(sys.modules.items()) :
+        path = getattr(module, '__file__', None) or ''
+        if os.path.dirname(os.path.abspath(path)) == ROOT :
+            del sys.modules[name]
+
+
+def run(script, ms=10000, tick_us=10, boot=True, presses=(), adc=(),
+        png=None, every=1000, verbose=True, drawstats=False, seed=0,
+        check=None):
+    # Runs script for ms of virtual time.  presses are (pin, ms, hold)
+    # and adc (pin, value, ms) tuples, times relative to the start.
+    # Returns the run's statistics.  drawstats turns on tft_config.STATS
+    # and dumps the script's counters.  seed starts the virtual clock at
+    # that many us, so generators seeded from ticks_us() differ.
+    # check(scope) is called with the script's globals at every sleep.
+    install()
+    forget()
+    if drawstats :
+        import tft_config
+        tft_config.STATS = True
+    sim.reset(tick_us, ms, seed)
+    for pin, at, hold in presses :
+        sim.press(pin, seed / 1000 + at, hold)
+    for pin, value, at in adc :
+        sim.setAdc(pin, value, seed / 1000 + at)
+    shots = []
+    if png :
+        os.makedirs(png, exist_ok=True)
+        nextShot = [0]
+
+        def shoot(t):
+            if sim.panel is not None and t >= nextShot[0] :
+                name = os.path.join(png, 'frame_%06d.png' % (t // 1000))
+                sim.panel.save_png(name)
+                shots.append(name)
+                nextShot[0] = t + every * 1000
+
+        sim.frameHooks.append(shoot)
+
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    mp = dict(builtins.__dict__)
+    mp['__import__'] = mpImport
+    mp['exec'] = mpExec
+    scope = {'__name__': '__main__', '__builtins__': mp}
+    if check :
+        sim.sleepHooks.append(lambda: check(scope))
+    stop = 'finished'
+    started = sim.start
+    try :
+        for name in (('boot.py',) if boot else ()) + (script,) :
+            with open(name) as f :
+                code = compile(f.read(), name, 'exec')
+            exec(code, scope)
+    except Halt as e :
+        stop = str(e)
+    except (SystemExit, KeyboardInterrupt) as e :
+        stop = type(e).__name__
+    except Exception :
+        traceback.print_exc()
+        stop = 'error'
+    finally :
+        os.chdir(cwd)
+    wall = time.perf_counter() - started
+    if png and sim.panel is not None :
+        name = os.path.join(png, 'final.png')
+        sim.panel.save_png(name)
+        shots.append(name)
+
+    frames = sorted(sim.frameWall[1:]) or [0]
+    stats = {
+        'script': script,
+        'stop': stop,
+        'virtual_ms': (sim.last - seed) // 1000,
+        'wall_ms': int(wall * 1000),
+        'frames': sim.sleeps,
+        'frame_us_mean': sum(frames) // len(frames),
+        'frame_us_median': frames[len(frames) // 2],
+        'frame_us_max': frames[-1],
+        'calls': dict(sim.panel.calls) if sim.panel else {},
+        'pixels': dict(sim.panel.pixels) if sim.panel else {},
+        'pwm_changes': sim.pwmChanges,
+        'png': shots,
+    }
+    if verbose :
+        report(stats)
+    if drawstats :
+        import tft_config
+        if tft_config.last is not None :
+            tft_config.last.dump()
+    return stats
+
+
+def report(stats):
+    print('--- %s: %s' % (stats['script'], stats['stop']))
+    print('virtual %dms in %dms wall (x%.1f), %d frames' % (
+        stats['virtual_ms'], stats['wall_ms'],
+        stats['virtual_ms'] / max(1, stats['wall_ms']), stats['frames']))
+    print('frame compute: mean %dus, median %dus, max %dus' % (
+        stats['frame_us_mean'], stats['frame_us_median'], stats['frame_us_max']))
+    for name in sorted(stats['calls']) :
+        print('  %-14s %7d calls %10d px' % (name, stats['calls'][name], stats['pixels'][name]))
+    print('pwm changes: %d' % stats['pwm_changes'])
+    if stats['png'] :
+        print('%d png frames, last %s' % (len(stats['png']), stats['png'][-1]))
+
+
+def main(argv):
+    import argparse
+    p = argparse.ArgumentParser(description='Run a T-Display script on the host.')
+    p.add_argument('script')
+    p.add_argument('--ms', type=int, default=10000, help='virtual time to run for')
+    p.add_argument('--tick-us', type=int, default=10,
+                   help='us the clock advances per read, 0 to follow the host clock')
+    p.add_argument('--no-boot', action='store_true', help='skip boot.py')
+    p.add_argument('--press', action='append', default=[], metavar='PIN@MS[+HOLD]')
+    p.add_argument('--adc', action='append', default=[], metavar='PIN=VALUE[@MS]')
+    p.add_argument('--png', metavar='DIR', help='save screen captures here')
+    p.add_argument('--every', type=int, default=1000, help='ms between captures')
+    p.add_argument('--seed', type=int, default=0,
+                   help='start the virtual clock here (us), reseeds ticks_us() seeded games')
+    p.add_argument('--drawstats', action='store_true',
+                   help='count draw calls and bus bytes (tft_config.STATS)')
+    args = p.parse_args(argv)
+
+    presses = []
+    for spec in args.press :
+        pin, _, when = spec.partition('@')
+        at, _, hold = when.partition('+')
+        presses.append((int(pin), int(at or 0), int(hold or 100)))
+    adc = []
+    for spec in args.adc :
+        pin, _, rest = spec.partition('=')
+        value, _, at = rest.partition('@')
+        adc.append((int(pin), int(value), int(at or 0)))
+    stats = run(args.script, args.ms, args.tick_us, not args.no_boot,
+                presses, adc, args.png, args.every, drawstats=args.drawstats, seed=args.seed)
+    return 1 if stats['stop'] == 'error' else 0
+
+
+if __name__ == '__main__' :
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,391 @@
+# st7789.py - host stand-in for russhughes' st7789_mpy driver
+#
+# Every ST7789 object draws into one shared panel, as the real ones share
+# the display's memory: a NumPy array of RGB565 values holding all 320
+# lines of controller RAM, 240 of them visible.  Each object keeps its own
+# rotation and sees the panel through a rotated view, so drawing is plain
+# array slicing.  Hardware scrolling (vscrdef/vscsad) is applied when the
+# screen is captured.
+#
+# Draw calls and pixels written are counted per method in panel.calls and
+# panel.pixels, and each call charges its SPI transfer time to the clock.
+
+import math
+import struct
+import zlib
+
+import numpy as np
+
+from hostsim import sim
+
+BLACK = 0x0000
+BLUE = 0x001F
+RED = 0xF800
+GREEN = 0x07E0
+CYAN = 0x07FF
+MAGENTA = 0xF81F
+YELLOW = 0xFFE0
+WHITE = 0xFFFF
+
+FAST = 0
+SLOW = 1
+
+RGB = 0x00
+BGR = 0x08
+
+WRAP = 0x01
+WRAP_H = 0x02
+WRAP_V = 0x04
+
+
+def color565(r, g=0, b=0):
+    if isinstance(r, (tuple, list)) :
+        r, g, b = r[:3]
+    return (r & 0xF8) << 8 | (g & 0xFC) << 3 | b >> 3
+
+
+def map_bitarray_to_rgb565(bitarray, buffer, width, color=WHITE, bg_color=BLACK):
+    bits = np.unpackbits(np.frombuffer(bytes(bitarray), np.uint8))
+    n = len(buffer) // 2
+    out = np.where(bits[:n], color, bg_color).astype('>u2')
+    buffer[:n * 2] = out.tobytes()
+
+
+class Panel(object):
+    # The controller RAM, shared by every ST7789 object
+    LINES = 320
+    OFFSET = 40             # first visible RAM line
+
+    def __init__(self, width, height):
+        self.width = width      # native (portrait) size
+        self.height = height
+        self.ram = np.zeros((self.LINES, width), np.uint16)
+        self.visible = self.ram[self.OFFSET:self.OFFSET + height]
+        self.tfa = 0
+        self.vsa = self.LINES
+        self.bfa = 0
+        self.vssa = 0
+        self.rotation = 0       # rotation of the last display to set one
+        self.calls = {}
+        self.pixels = {}
+
+    def count(self, name, pixels):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.pixels[name] = self.pixels.get(name, 0) + pixels
+        sim.bus(pixels * 2 + 11)
+
+    def view(self, a, rotation):
+        # the panel (or a capture of it) as a display with rotation sees it
+        rotation &= 3
+        if rotation == 1 :
+            return a[:, ::-1].T
+        if rotation == 2 :
+            return a[::-1, ::-1]
+        if rotation == 3 :
+            return a[::-1, :].T
+        return a
+
+    def screen(self):
+        # What the glass shows, in native orientation, with scrolling applied
+        lines = np.arange(self.OFFSET, self.OFFSET + self.height)
+        inside = (lines >= self.tfa) & (lines < self.tfa + self.vsa)
+        if self.vsa :
+            scrolled = self.tfa + (self.vssa - self.tfa + lines - self.tfa) % self.vsa
+            lines = np.where(inside, scrolled, lines)
+        return self.ram[lines % self.LINES]
+
+    def capture(self, rotation=None):
+        return self.view(self.screen(), self.rotation if rotation is None else rotation)
+
+    def rgb(self, rotation=None):
+        # the capture as an (h, w, 3) array of 8 bit RGB
+        c = self.capture(rotation).astype(np.uint32)
+        r = (c >> 11) & 0x1F
+        g = (c >> 5) & 0x3F
+        b = c & 0x1F
+        return np.dstack(((r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2))).astype(np.uint8)
+
+    def save_png(self, filename, rotation=None):
+        img = self.rgb(rotation)
+        h, w, _ = img.shape
+        raw = np.zeros((h, w * 3 + 1), np.uint8)
+        raw[:, 1:] = img.reshape(h, w * 3)
+
+        def chunk(kind, data):
+            body = kind + data
+            return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xFFFFFFFF)
+
+        with open(filename, 'wb') as f :
+            f.write(b'\x89PNG\r\n\x1a\n')
+            f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', w, h, 8, 2, 0, 0, 0)))
+            f.write(chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)))
+            f.write(chunk(b'IEND', b''))
+
+
+def _glyphs(font):
+    # romfont glyphs as an array of (HEIGHT, WIDTH) bool masks, cached on
+    # the font module
+    g = getattr(font, '_host_glyphs', None)
+    if g is None :
+        stride = (font.WIDTH + 7) // 8
+        count = font.LAST - font.FIRST + 1
+        data = np.frombuffer(bytes(font.FONT), np.uint8)[:count * font.HEIGHT * stride]
+        bits = np.unpackbits(data.reshape(count, font.HEIGHT, stride), axis=2)
+        g = bits[:, :, :font.WIDTH].astype(bool)
+        font._host_glyphs = g
+    return g
+
+
+def _bitmap_bits(font):
+    b = getattr(font, '_host_bits', None)
+    if b is None :
+        b = np.unpackbits(np.frombuffer(bytes(font.BITMAPS), np.uint8))
+        font._host_bits = b
+    return b
+
+
+class ST7789(object):
+    def __init__(self, spi, width, height, reset=None, dc=None, cs=None,
+                 backlight=None, rotation=0, options=0, buffer_size=0, **kwargs):
+        if sim.panel is None or (sim.panel.width, sim.panel.height) != (width, height) :
+            sim.panel = Panel(width, height)
+        self.panel = sim.panel
+        self.spi = spi
+        self.native = (width, height)
+        self.options = options
+        self.buffer_size = buffer_size
+        self.rotation(rotation)
+
+    # ---- setup ----
+
+    def init(self):
+        pass
+
+    def on(self):
+        pass
+
+    def off(self):
+        pass
+
+    def sleep_mode(self, value):
+        pass
+
+    def inversion_mode(self, value):
+        pass
+
+    def offset(self, x, y):
+        pass
+
+    def madctl(self, value=None):
+        return 0
+
+    def rotation(self, r):
+        self.rot = r & 3
+        self.panel.rotation = self.rot
+        self.fb = self.panel.view(self.panel.visible, self.rot)
+        self.w = self.fb.shape[1]
+        self.h = self.fb.shape[0]
+
+    def width(self):
+        return self.w
+
+    def height(self):
+        return self.h
+
+    def vscrdef(self, tfa, vsa, bfa):
+        p = self.panel
+        p.tfa = tfa
+        p.vsa = vsa
+        p.bfa = bfa
+
+    def vscsad(self, vssa):
+        self.panel.vssa = vssa
+
+    # ---- drawing ----
+
+    def _fill(self, x, y, w, h, color):
+        x0 = max(x, 0)
+        y0 = max(y, 0)
+        x1 = min(x + w, self.w)
+        y1 = min(y + h, self.h)
+        if x1 > x0 and y1 > y0 :
+            self.fb[y0:y1, x0:x1] = color & 0xFFFF
+            return (x1 - x0) * (y1 - y0)
+        return 0
+
+    def _put(self, x, y, block):
+        # block is an (h, w) array of RGB565 values, clipped to the screen
+        h, w = block.shape
+        x0 = max(x, 0)
+        y0 = max(y, 0)
+        x1 = min(x + w, self.w)
+        y1 = min(y + h, self.h)
+        if x1 > x0 and y1 > y0 :
+            self.fb[y0:y1, x0:x1] = block[y0 - y:y1 - y, x0 - x:x1 - x]
+            return (x1 - x0) * (y1 - y0)
+        return 0
+
+    def fill(self, color):
+        self.panel.count('fill', self._fill(0, 0, self.w, self.h, color))
+
+    def fill_rect(self, x, y, w, h, color):
+        self.panel.count('fill_rect', self._fill(x, y, w, h, color))
+
+    def rect(self, x, y, w, h, color):
+        n = self._fill(x, y, w, 1, color) + self._fill(x, y + h - 1, w, 1, color)
+        n += self._fill(x, y + 1, 1, h - 2, color) + self._fill(x + w - 1, y + 1, 1, h - 2, color)
+        self.panel.count('rect', n)
+
+    def hline(self, x, y, w, color):
+        self.panel.count('hline', self._fill(x, y, w, 1, color))
+
+    def vline(self, x, y, h, color):
+        self.panel.count('vline', self._fill(x, y, 1, h, color))
+
+    def pixel(self, x, y, color):
+        self.panel.count('pixel', self._fill(x, y, 1, 1, color))
+
+    def _line(self, x0, y0, x1, y1, color):
+        n = 0
+        dx = abs(x1 - x0)
+        dy = -abs(y1 - y0)
+        sx = 1 if x0 < x1 else -1
+        sy = 1 if y0 < y1 else -1
+        err = dx + dy
+        while True :
+            n += self._fill(x0, y0, 1, 1, color)
+            if x0 == x1 and y0 == y1 :
+                return n
+            e2 = 2 * err
+            if e2 >= dy :
+                err += dy
+                x0 += sx
+            if e2 <= dx :
+                err += dx
+                y0 += sy
+
+    def line(self, x0, y0, x1, y1, color):
+        self.panel.count('line', self._line(int(x0), int(y0), int(x1), int(y1), color))
+
+    def _points(self, points, x, y, angle, cx, cy):
+        c = math.cos(angle)
+        s = math.sin(angle)
+        out = []
+        for px, py in points :
+            out.append((int(round(x + cx + (px - cx) * c - (py - cy) * s)),
+                        int(round(y + cy + (px - cx) * s + (py - cy) * c))))
+        return out
+
+    def polygon(self, points, x, y, color, angle=0, center_x=0, center_y=0):
+        pts = self._points(points, x, y, angle, center_x, center_y)
+        n = 0
+        for i in range(len(pts) - 1) :
+            n += self._line(pts[i][0], pts[i][1], pts[i + 1][0], pts[i + 1][1], color)
+        self.panel.count('polygon', n)
+
+    def fill_polygon(self, points, x, y, color, angle=0, center_x=0, center_y=0):
+        pts = self._points(points, x, y, angle, center_x, center_y)
+        n = 0
+        if pts :
+            ys = [p[1] for p in pts]
+            for row in range(max(min(ys), 0), min(max(ys), self.h - 1) + 1) :
+                xs = []
+                for i in range(len(pts)) :
+                    (ax, ay), (bx, by) = pts[i - 1], pts[i]
+                    if (ay <= row < by) or (by <= row < ay) :
+                        xs.append(ax + (row - ay) * (bx - ax) / (by - ay))
+                xs.sort()
+                for i in range(0, len(xs) - 1, 2) :
+                    a = int(math.ceil(xs[i]))
+                    n += self._fill(a, row, int(xs[i + 1]) - a + 1, 1, color)
+        self.panel.count('fill_polygon', n)
+
+    def circle(self, x, y, r, color):
+        n = 0
+        for a in range(0, 360, 2) :
+            t = math.radians(a)
+            n += self._fill(int(round(x + r * math.cos(t))), int(round(y + r * math.sin(t))), 1, 1, color)
+        self.panel.count('circle', n)
+
+    def fill_circle(self, x, y, r, color):
+        n = 0
+        for dy in range(-r, r + 1) :
+            dx = int(math.sqrt(r * r - dy * dy))
+            n += self._fill(x - dx, y + dy, 2 * dx + 1, 1, color)
+        self.panel.count('fill_circle', n)
+
+    def blit_buffer(self, buffer, x, y, w, h):
+        block = np.frombuffer(bytes(buffer), '>u2', w * h).reshape(h, w).astype(np.uint16)
+        self.panel.count('blit_buffer', self._put(x, y, block))
+
+    def text(self, font, s, x, y, fg=WHITE, bg=BLACK):
+        if isinstance(s, int) :
+            s = chr(s)
+        elif isinstance(s, (bytes, bytearray)) :
+            s = s.decode('latin-1')
+        glyphs = _glyphs(font)
+        n = 0
+        for ch in s :
+            i = ord(ch) - font.FIRST
+            if 0 <= i < len(glyphs) :
+                n += self._put(x, y, np.where(glyphs[i], fg, bg).astype(np.uint16))
+            x += font.WIDTH
+        self.panel.count('text', n)
+
+    def write_len(self, font, s):
+        n = 0
+        for ch in s :
+            i = font.MAP.find(ch)
+            if i >= 0 :
+                n += font.WIDTHS[i]
+        return n
+
+    def write(self, font, s, x, y, fg=WHITE, bg=BLACK, *args):
+        bits = _bitmap_bits(font)
+        ow = font.OFFSET_WIDTH
+        bpp = font.BPP
+        n = 0
+        start = x
+        for ch in s :
+            i = font.MAP.find(ch)
+            if i < 0 :
+                continue
+            w = font.WIDTHS[i]
+            off = int.from_bytes(bytes(font.OFFSETS[i * ow:(i + 1) * ow]), 'big')
+            px = bits[off * bpp:(off + w * font.HEIGHT) * bpp].reshape(font.HEIGHT, w, bpp)
+            mask = px.any(axis=2)
+            n += self._put(x, y, np.where(mask, fg, bg).astype(np.uint16))
+            x += w
+        self.panel.count('write', n)
+        return x - start
+
+    def jpg(self, filename, x, y, mode=FAST):
+        # decoded with Pillow when it is installed, else a grey placeholder
+        # of the image's size
+        try :
+            from PIL import Image
+            img = np.asarray(Image.open(filename).convert('RGB'), np.uint16)
+            block = ((img[:, :, 0] & 0xF8) << 8) | ((img[:, :, 1] & 0xFC) << 3) | (img[:, :, 2] >> 3)
+        except ImportError :
+            w, h = _jpg_size(filename)
+            block = np.full((h, w), color565(96, 96, 96), np.uint16)
+            block[::8, :] = BLACK
+            block[:, ::8] = BLACK
+        self.panel.count('jpg', self._put(x, y, block.astype(np.uint16)))
+
+
+def _jpg_size(filename):
+    # width and height from the JPEG's start of frame marker
+    with open(filename, 'rb') as f :
+        data = f.read()
+    i = 2
+    while i + 9 < len(data) :
+        if data[i] != 0xFF :
+            i += 1
+            continue
+        marker = data[i + 1]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC) :
+            h, w = struct.unpack('>HH', data[i + 5:i + 9])
+            return w, h
+        i += 2 + struct.unpack('>H', data[i + 2:i + 4])[0]
+    return 0, 0
@@ -0,0 +1,173 @@
+# ticktet.py - tick time and heap allocations of the _g_tet game loop
+#
+# Runs _g_tet.py on the virtual clock and times each loop() call while a
+# game is being played, then runs it again with every bytecode of
+# _g_tet.py traced and counts the operations that allocate on
+# MicroPython's heap: building tuples, lists, dicts and strings, making
+# functions, creating instances, / (always a float), % on a str, and
+# calls of bytearray(), array(), str(), print() and the other builtins
+# and str methods that return a new object.  Ticks that clear
+# a line or end the game redraw the score and print, every other tick
+# must allocate nothing; the exit status is 1 if one does.
+#
+#   python3 host/ticktet.py --ticks 2000
+#   python3 host/ticktet.py --ticks 500 --sites     # where the allocations are
+
+import dis
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import run
+
+SCRIPT = '_g_tet.py'
+BUILDS = ('BUILD_TUPLE', 'BUILD_LIST', 'BUILD_MAP', 'BUILD_SET',
+          'BUILD_CONST_KEY_MAP', 'BUILD_STRING', 'BUILD_SLICE',
+          'FORMAT_VALUE', 'MAKE_FUNCTION', 'LIST_EXTEND', 'DICT_UPDATE')
+# callables that return a new object, and str methods that return a new str
+CALLS = ('bytearray', 'bytes', 'array', 'list', 'tuple', 'dict', 'set', 'str',
+         'repr', 'format', 'print', 'float', 'sorted', 'memoryview')
+METHODS = ('format', 'join', 'split', 'replace', 'strip', 'lstrip', 'rstrip',
+           'upper', 'lower', 'encode', 'decode', 'center', 'ljust', 'rjust')
+LOADS = ('LOAD_GLOBAL', 'LOAD_NAME', 'LOAD_DEREF')
+ATTRS = ('LOAD_ATTR', 'LOAD_METHOD')
+DIVIDES = ('/', '/=')
+FORMATS = ('%', '%=')
+
+
+def left(instrs, i):
+    # the instruction that pushed the left operand of the binary op instrs[i]
+    depth = 0
+    for j in range(i - 1, -1, -1) :
+        op = instrs[j]
+        depth += dis.stack_effect(op.opcode, op.arg if op.opcode >= dis.HAVE_ARGUMENT else None)
+        if depth >= 2 :
+            return op
+    return None
+
+
+def sites(code):
+    # {offset: what} for the instructions of code that allocate, the names
+    # of allocating callables where they are loaded to be called
+    found = {}
+    instrs = list(dis.get_instructions(code))
+    for i, op in enumerate(instrs) :
+        name = op.opname
+        if name in BUILDS :
+            found[op.offset] = name
+        elif name in ('BINARY_OP', 'BINARY_TRUE_DIVIDE', 'INPLACE_TRUE_DIVIDE') :
+            if name != 'BINARY_OP' or op.argrepr in DIVIDES :
+                found[op.offset] = 'float /'
+            elif op.argrepr in FORMATS :
+                l = left(instrs, i)
+                if l is not None and l.opname == 'LOAD_CONST' and isinstance(l.argval, str) :
+                    found[op.offset] = 'str %'
+        elif name in ('BINARY_MODULO', 'INPLACE_MODULO') :
+            l = left(instrs, i)
+            if l is not None and l.opname == 'LOAD_CONST' and isinstance(l.argval, str) :
+                found[op.offset] = 'str %'
+        elif name in LOADS and op.argval in CALLS :
+            found[op.offset] = op.argval + '()'
+        elif name in ATTRS and op.argval in METHODS :
+            found[op.offset] = '.' + op.argval + '()'
+    return found
+
+
+class Tracer(object):
+    # Counts the allocating operations executed in SCRIPT's code
+    def __init__(self):
+        self.count = 0
+        self.sites = {}
+        self.codes = {}
+
+    def found(self, frame, what):
+        self.count += 1
+        site = '%s:%d %s' % (frame.f_code.co_name, frame.f_lineno, what)
+        self.sites[site] = self.sites.get(site, 0) + 1
+
+    def call(self, frame, event, arg):
+        if frame.f_code.co_filename != SCRIPT :
+            return None
+        if frame.f_code.co_name == '__init__' :
+            self.found(frame, 'instance')
+        if frame.f_code not in self.codes :
+            self.codes[frame.f_code] = sites(frame.f_code)
+        frame.f_trace_opcodes = True
+        return self.opcode
+
+    def opcode(self, frame, event, arg):
+        if event == 'opcode' :
+            what = self.codes[frame.f_code].get(frame.f_lasti)
+            if what is not None :
+                self.found(frame, what)
+        return self.opcode
+
+
+def ticks(count, seed=0, trace=False):
+    # Returns the play ticks' times in us and, traced, the allocations per
+    # plain tick, per clearing or ending tick and the tracer
+    state = {'times': [], 'plain': [], 'other': [], 'tracer': Tracer()}
+
+    def check(scope):
+        if 'loop' not in scope or 'wrapped' in state :
+            return
+        state['wrapped'] = True
+        loop = scope['loop']
+        tracer = state['tracer']
+
+        def timed():
+            if scope['game_over'] > 0 :
+                return loop()
+            score = scope['score']
+            before = tracer.count
+            if trace :
+                sys.settrace(tracer.call)
+            t = time.perf_counter()
+            try :
+                loop()
+            finally :
+                spent = time.perf_counter() - t
+                sys.settrace(None)
+            if scope['score'] == score and scope['game_over'] <= 0 :
+                state['plain'].append(tracer.count - before)
+            else :
+                state['other'].append(tracer.count - before)
+            state['times'].append(spent * 1e6)
+            if len(state['times']) >= count :
+                raise SystemExit
+
+        scope['loop'] = timed
+
+    run.run(SCRIPT, 3600000, seed=seed, verbose=False, check=check)
+    return state
+
+
+def main(argv):
+    import argparse
+    p = argparse.ArgumentParser(description='Time the _g_tet tick and count its heap allocations.')
+    p.add_argument('--ticks', type=int, default=2000)
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--sites', action='store_true', help='list where the allocations are')
+    args = p.parse_args(argv)
+
+    times = sorted(ticks(args.ticks, args.seed)['times'])
+    print('%d ticks: mean %dus, median %dus' % (
+        len(times), sum(times) / len(times), times[len(times) // 2]))
+    state = ticks(args.ticks, args.seed, trace=True)
+    plain = state['plain']
+    other = state['other']
+    print('%d plain ticks: %d allocations, %d ticks allocate' % (
+        len(plain), sum(plain), sum(1 for n in plain if n)))
+    print('%d ticks clearing a line or ending the game: %d allocations' % (
+        len(other), sum(other)))
+    if args.sites :
+        sites = state['tracer'].sites
+        for site in sorted(sites, key=sites.get, reverse=True) :
+            print('  %7d  %s' % (sites[site], site))
+    return 1 if sum(plain) else 0
+
+
+if __name__ == '__main__' :
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,58 @@
+# utime.py - host stand-in for MicroPython's utime on the virtual clock
+
+import time as _time
+from hostsim import sim
+
+_EPOCH = _time.time()
+
+
+def ticks_us():
+    return sim.now()
+
+
+def ticks_ms():
+    return sim.now() // 1000
+
+
+def ticks_cpu():
+    return sim.now()
+
+
+def ticks_add(ticks, delta):
+    return ticks + delta
+
+
+def ticks_diff(ticks1, ticks2):
+    return ticks1 - ticks2
+
+
+def sleep_us(us):
+    sim.sleep(us)
+
+
+def sleep_ms(ms):
+    sim.sleep(ms * 1000)
+
+
+def sleep(s):
+    sim.sleep(s * 1000000)
+
+
+def time():
+    return int(_EPOCH + sim.now() / 1000000)
+
+
+def time_ns():
+    return int(_EPOCH * 1000000000) + sim.now() * 1000
+
+
+def localtime(secs=None):
+    return _time.localtime(time() if secs is None else secs)[:8]
+
+
+def gmtime(secs=None):
+    return _time.gmtime(time() if secs is None else secs)[:8]
+
+
+def mktime(t):
+    return int(_time.mktime(tuple(t[:8]) + (-1,)))
@@ -0,0 +1,6 @@
+# vga1_16x32.py - host stand-in, see romfont.py
+
+from romfont import make
+
+FIRST, LAST, WIDTH, HEIGHT, _FONT = make(16, 32)
+FONT = memoryview(_FONT)
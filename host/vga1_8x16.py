@@ -0,0 +1,6 @@
+# vga1_8x16.py - host stand-in, see romfont.py
+
+from romfont import make
+
+FIRST, LAST, WIDTH, HEIGHT, _FONT = make(8, 16)
+FONT = memoryview(_FONT)
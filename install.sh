@@ -1,6 +1,6 @@
 #!/usr/bin/env bash
 #
-# install.sh - Transfer all .py files to the T-Display ESP32 via ampy
+# install.sh - Transfer all .py files and level packs to the T-Display ESP32 via ampy
 #
 # Usage:
 #   ./install.sh              # auto-detect serial port
@@ -21,7 +21,7 @@ for arg in "$@"; do
         --help|-h)
             echo "Usage: $0 [--dry-run] [PORT]"
             echo ""
-            echo "Transfer all .py files to the T-Display ESP32."
+            echo "Transfer all .py and .lvl files to the T-Display ESP32."
             echo ""
             echo "  PORT       Serial port (auto-detected if omitted)"
             echo "  --dry-run  Show what would be transferred without sending"
@@ -51,9 +51,9 @@ echo ""
 
 AMPY="pipenv run ampy --port $PORT --baud $BAUD"
 
-# Gather all .py files in the project directory
+# Gather all .py files and level packs in the project directory
 SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
-FILES=("$SCRIPT_DIR"/*.py)
+FILES=("$SCRIPT_DIR"/*.py "$SCRIPT_DIR"/*.lvl)
 
 if [ ${#FILES[@]} -eq 0 ]; then
     echo "No .py files found."
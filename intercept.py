@@ -0,0 +1,61 @@
+# intercept.py
+#
+# Where a ball will cross a line, for the demo paddles of the ball games.
+#
+# The ball is followed in a straight line with the side walls unfolded and
+# the position folded back, so the answer takes no stepping however many
+# bounces are on the way.  Intercept keeps the answer for one ball until
+# it bounces.
+#
+#       from intercept import Intercept
+#       aim = Intercept(117 << FP, left, right, top)
+#       if aim.update(ball, x, y, vx, vy) :
+#           target = aim.x
+
+
+def intercept(x, y, vx, vy, line, left, right, top):
+    # x at which a ball at x, y moving vx, vy per frame reaches y == line,
+    # bouncing off the walls at left and right (the range of x) and, when
+    # moving up, the ceiling at top on the way.  Any units, ints, fixed
+    # point or floats, as long as they agree.  None if vy is 0.
+    if not vy :
+        return None
+    if vy > 0 :
+        dy = line - y
+    else :
+        dy = (y - top) + (line - top)
+    span = right - left
+    if span <= 0 :
+        return left
+    # unfold the walls: travel in a straight line, then fold back
+    u = (x - left + vx * dy // abs(vy)) % (2 * span)
+    if u > span :
+        u = 2 * span - u
+    return left + u
+
+
+class Intercept(object):
+    # Caches intercept() for one ball.  update() recomputes only when the
+    # ball (key) or its velocity changed since the last call, which is
+    # on a bounce, and returns True when it did.  The prediction is in x.
+    def __init__(self, line, left, right, top):
+        self.line = line
+        self.left = left
+        self.right = right
+        self.top = top
+        self.reset()
+
+    def reset(self):
+        self.key = None
+        self.vx = None
+        self.vy = None
+        self.x = None
+
+    def update(self, key, x, y, vx, vy):
+        if key is self.key and vx == self.vx and vy == self.vy :
+            return False
+        self.key = key
+        self.vx = vx
+        self.vy = vy
+        self.x = intercept(x, y, vx, vy, self.line, self.left, self.right, self.top)
+        return True
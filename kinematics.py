@@ -0,0 +1,157 @@
+# kinematics.py
+#
+# Fixed point kinematics for the ball games.
+#
+# Positions and velocities are ints with FP fraction bits (x >> FP is the
+# pixel column), the same as entitypool, so moving, bouncing and aiming a
+# ball never makes a float.  On the ESP32 every float result is a new heap
+# object while ints below 2**30 are not, so keep products under that:
+# with FP = 8 a speed of 8 pixels a frame squared is 2**22.
+#
+# Everything works on single components and returns an int, nothing
+# returns a tuple.
+#
+#       from kinematics import FP, bounce, clamp, scale, complement
+#       x += vx
+#       vx = bounce(x, vx, 3 << FP, 131 << FP)
+#       x = clamp(x, 3 << FP, 131 << FP)
+#       vx = scale(offset, MAX_SPEED, half)     # paddle hit
+#       vy = -complement(vx, MAX_SPEED)         # same speed, new direction
+
+import gc
+from micropython import const
+from utime import ticks_us, ticks_diff
+
+FP = const(8)
+ONE = const(1 << FP)
+
+
+def fmul(a, b):
+    # a * b, both fixed point
+    return (a * b) >> FP
+
+
+def scale(a, b, c):
+    # a * b / c rounded toward zero, so the result is symmetric in sign
+    q = abs(a * b) // abs(c)
+    return -q if (a < 0) ^ (b < 0) ^ (c < 0) else q
+
+
+def fdiv(a, b):
+    # a / b, both fixed point, rounded toward zero
+    return scale(a, ONE, b)
+
+
+def isqrt(n):
+    # floor(sqrt(n)) for 0 <= n < 2**30, bit by bit without floats
+    r = 0
+    b = 1 << 28
+    while b > n :
+        b >>= 2
+    while b :
+        if n >= r + b :
+            n -= r + b
+            r = (r >> 1) + b
+        else :
+            r >>= 1
+        b >>= 2
+    return r
+
+
+def fsqrt(a):
+    # sqrt of a fixed point a, a < 2**22
+    return isqrt(a << FP)
+
+
+def hypot(x, y):
+    # length of x, y, in their units
+    return isqrt(x * x + y * y)
+
+
+def normalise(a, n, speed):
+    # component a of a vector n long, rescaled to a vector speed long:
+    # n = hypot(vx, vy); vx = normalise(vx, n, speed); vy = ...
+    return scale(a, speed, n) if n else 0
+
+
+def complement(v, speed, least=ONE):
+    # the other component of a vector speed long with v as one component,
+    # at least least (so a steep hit can not stop the ball)
+    return isqrt(max(least * least, speed * speed - v * v))
+
+
+def bounce(p, v, lo, hi):
+    # velocity v after the walls at lo and hi: reversed when p is past one
+    # and still moving into it, so a ball slower than a pixel a frame does
+    # not bounce twice
+    if (p < lo and v < 0) or (p > hi and v > 0) :
+        return -v
+    return v
+
+
+def clamp(p, lo, hi):
+    return lo if p < lo else hi if p > hi else p
+
+
+def benchKinematics(balls=8, frames=300):
+    # Bounce balls around a 135 x 240 field off a paddle for frames
+    # frames, first with float speeds and int() carried fractions as
+    # _g_breakout did and then in fixed point.  Reports bytes allocated
+    # and time per frame; bytes need MicroPython's gc.mem_alloc().  On the
+    # host run it with host/benchmodules.py kinematics, for the real clock.
+    def measure(run):
+        gc.collect()
+        before = gc.mem_alloc() if hasattr(gc, 'mem_alloc') else 0
+        t = ticks_us()
+        run()
+        frame = ticks_diff(ticks_us(), t) / frames
+        used = (gc.mem_alloc() if hasattr(gc, 'mem_alloc') else 0) - before
+        return used, frame
+
+    def floats():
+        state = [[10 + 14 * i, 40, 2.5 - i * 0.6, 1.7, 0.0, 0.0] for i in range(balls)]
+        for _ in range(frames) :
+            for s in state :
+                s[0] += int(s[2]) + int(s[4])
+                s[4] -= int(s[4])
+                s[4] += s[2] - int(s[2])
+                s[1] += int(s[3]) + int(s[5])
+                s[5] -= int(s[5])
+                s[5] += s[3] - int(s[3])
+                if s[1] < 16 :
+                    s[1] = 16
+                    s[3] = -s[3]
+                if s[0] > 131 :
+                    s[0] = 131
+                    s[2] = -s[2]
+                elif s[0] < 3 :
+                    s[0] = 3
+                    s[2] = -s[2]
+                if s[1] > 220 :
+                    s[1] = 220
+                    s[2] = (s[0] - 67) / 64 * 3
+                    s[3] = -(max(1, 9 - s[2] ** 2) ** 0.5)
+
+    speed = 3 << FP
+
+    def fixed():
+        state = [[(10 + 14 * i) << FP, 40 << FP, 640 - i * 154, 435] for i in range(balls)]
+        for _ in range(frames) :
+            for s in state :
+                s[0] += s[2]
+                s[1] += s[3]
+                s[3] = bounce(s[1], s[3], 16 << FP, 220 << FP)
+                s[1] = clamp(s[1], 16 << FP, 220 << FP)
+                s[2] = bounce(s[0], s[2], 3 << FP, 131 << FP)
+                s[0] = clamp(s[0], 3 << FP, 131 << FP)
+                if s[1] == 220 << FP :
+                    s[2] = scale((s[0] >> FP) - 67, speed, 64)
+                    s[3] = -complement(s[2], speed)
+
+    gc.disable()
+    try :
+        for name, run in (('floats', floats), ('fixed', fixed)) :
+            used, frame = measure(run)
+            print ("%s: %d bytes allocated, %dus/frame" % (name, used, frame))
+    finally :
+        gc.enable()
@@ -0,0 +1,101 @@
+# levelpack.py
+#
+# Binary level packs for the brick games, read one level at a time.
+#
+# A pack holds many block layouts in a file on flash, compiled on a PC by
+# host/levelc.py from a text description, and load() streams just the one
+# level asked for into a BlockGrid, a row at a time.  Only the current
+# level's type table stays in memory, in preallocated arrays.
+#
+# The format, little endian:
+#
+#   header   'LVL' 1, cols, rows, level count (2 bytes)
+#   offsets  one 4 byte file offset per level
+#   level    types, powerups, rows used (1 byte each)
+#            per type: colour (RGB565, 2 bytes), hit points, powerup
+#                      drop chance in %
+#            the powerup table, one byte per entry, picked from at random
+#            rows used x cols bytes of block types, 0 for no block and
+#            n for the n-th type
+#
+#       from levelpack import LevelPack
+#       pack = LevelPack('arkanoid.lvl')
+#       pack.load(level % pack.count, grid)
+#       color = pack.colors[grid.kind[k]]
+
+from array import array
+from micropython import const
+
+HEADER = const(8)
+TYPES = const(16)       # type 0 is no block
+
+
+class LevelPack(object):
+    def __init__(self, name):
+        self.name = name
+        self.buf = bytearray(4 * TYPES)
+        with open(name, 'rb') as f :
+            f.readinto(self.buf)
+        b = self.buf
+        if b[0:4] != b'LVL\x01' :
+            raise ValueError('not a level pack: %s' % name)
+        self.cols = b[4]
+        self.rows = b[5]
+        self.count = b[6] | b[7] << 8
+        self.row = bytearray(self.cols)
+        # the loaded level's types and powerup table
+        self.colors = array('H', [0] * TYPES)
+        self.hits = bytearray(TYPES)
+        self.drop = bytearray(TYPES)
+        self.powerups = bytearray(TYPES)
+        self.npowerups = 0
+        self.used = 0           # rows the level uses
+
+    def read(self, f, buf):
+        # fill buf from f, a pack cut short is an error like a bad one
+        if f.readinto(buf) != len(buf) :
+            raise ValueError('%s is truncated' % self.name)
+
+    def load(self, n, grid):
+        # Clear grid and fill it with level n, returns the rows it uses
+        b = self.buf
+        mv = memoryview(b)
+        cols = self.cols
+        if cols != grid.cols or self.rows > grid.rows :
+            raise ValueError('%s is %dx%d, the grid %dx%d' % (
+                self.name, cols, self.rows, grid.cols, grid.rows))
+        if not 0 <= n < self.count :
+            raise ValueError('%s has levels 0 to %d, not %d' % (self.name, self.count - 1, n))
+        grid.clear()
+        with open(self.name, 'rb') as f :
+            f.seek(HEADER + 4 * n)
+            self.read(f, mv[:4])
+            f.seek(b[0] | b[1] << 8 | b[2] << 16 | b[3] << 24)
+            self.read(f, mv[:3])
+            ntypes = b[0]
+            self.npowerups = b[1]
+            self.used = b[2]
+            if ntypes >= TYPES or self.npowerups > TYPES or self.used > self.rows :
+                raise ValueError('%s level %d has %d types, %d powerups and %d rows, at most %d, %d and %d' % (
+                    self.name, n, ntypes, self.npowerups, self.used, TYPES - 1, TYPES, self.rows))
+            self.read(f, mv[:4 * ntypes])
+            for t in range(1, ntypes + 1) :
+                j = 4 * (t - 1)
+                self.colors[t] = b[j] | b[j + 1] << 8
+                self.hits[t] = b[j + 2]
+                self.drop[t] = b[j + 3]
+            self.read(f, mv[:self.npowerups])
+            for j in range(self.npowerups) :
+                self.powerups[j] = b[j]
+            row = self.row
+            for r in range(self.used) :
+                self.read(f, row)
+                k = r * grid.cols
+                for c in range(cols) :
+                    t = row[c]
+                    if t :
+                        if t > ntypes :
+                            raise ValueError('%s level %d has type %d at %d,%d, only %d types' % (
+                                self.name, n, t, c, r, ntypes))
+                        grid.add(k + c, self.hits[t], t)
+        return self.used
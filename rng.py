@@ -0,0 +1,85 @@
+# rng.py
+#
+# Seedable random numbers for games, without loading gameESP.
+#
+# Games and benchmarks that must replay the same sequence seed an Rng
+# instead of using the random module, whose state can not be saved.
+#
+#       from rng import Rng
+#       rng = Rng(ticks_us())
+#       x = rng.randint(0, 239)
+#       state = rng.getstate()
+#       ...
+#       rng.setstate(state)     # draw the same numbers again
+
+
+class Rng(object):
+    # Seedable xorshift32 generator for reproducible games.
+    #
+    # The 32 bit state is kept as two 16 bit halves so every intermediate
+    # value stays a small int and drawing a number never allocates on the
+    # heap.  getstate()/setstate() snapshot and restore the sequence, so a
+    # benchmark or AI self-play run can be replayed exactly.
+
+    def __init__(self, s=1):
+        self.seed(s)
+
+    def seed(self, s):
+        self.hi = (s >> 16) & 0xFFFF
+        self.lo = s & 0xFFFF
+        if not (self.hi or self.lo) :
+            self.lo = 1     # xorshift must not start at zero
+        for _ in range(4) :
+            self.step()
+
+    def getstate(self):
+        return (self.hi, self.lo)
+
+    def setstate(self, state):
+        self.hi, self.lo = state
+
+    def step(self):
+        hi = self.hi
+        lo = self.lo
+        # x ^= x << 13
+        hi ^= ((hi << 13) | (lo >> 3)) & 0xFFFF
+        lo ^= (lo << 13) & 0xFFFF
+        # x ^= x >> 17
+        lo ^= hi >> 1
+        # x ^= x << 5
+        hi ^= ((hi << 5) | (lo >> 11)) & 0xFFFF
+        lo ^= (lo << 5) & 0xFFFF
+        self.hi = hi
+        self.lo = lo
+
+    def getrandbits(self, n):
+        # n <= 30 random bits, taken from the top of the state
+        self.step()
+        return ((self.hi << 14) | (self.lo >> 2)) >> (30 - n)
+
+    def below(self, n):
+        # Unbiased integer 0 <= r < n for n <= 2**28, draws falling in the
+        # incomplete last bucket are rejected rather than folded by %
+        limit = 0x10000000 - 0x10000000 % n
+        r = self.getrandbits(28)
+        while r >= limit :
+            r = self.getrandbits(28)
+        return r % n
+
+    def randint(self, a, b):
+        return a + self.below(b - a + 1)
+
+    def randrange(self, a, b=None):
+        if b is None :
+            return self.below(a)
+        return a + self.below(b - a)
+
+    def random(self):
+        # float in [0, 1)
+        return self.getrandbits(24) / 16777216
+
+    def uniform(self, a, b):
+        return a + (b - a) * self.random()
+
+    def choice(self, seq):
+        return seq[self.below(len(seq))]
@@ -0,0 +1,137 @@
+# sprite.py
+#
+# RGB565 sprites drawn with blit_buffer, without loading gameESP.
+#
+#       from sprite import Sprite
+#       BIRD = Sprite(('.yy.', 'yyyy'), {'.': None, 'y': st7789.YELLOW})
+#       BIRD.erase(tft, x, y, st7789.BLACK)
+#       BIRD.draw(tft, x, y)
+
+from array import array
+from utime import ticks_us, ticks_diff
+
+
+class Sprite(object):
+    # A small image converted once to a big-endian RGB565 buffer and drawn
+    # with blit_buffer instead of one primitive call per pixel or line.
+    #
+    # rows are strings with one palette key per pixel, palette maps each key
+    # to a colour, or to None for a transparent pixel.  Opaque sprites draw
+    # with a single blit_buffer; sprites with transparent pixels blit each
+    # opaque run from the span list of (dx, dy, n) built here.
+    def __init__(self, rows, palette):
+        self.w = len(rows[0])
+        self.h = len(rows)
+        self.buf = bytearray(self.w * self.h * 2)
+        self.mv = memoryview(self.buf)
+        self.spans = array('h')
+        self.transparent = False
+        i = 0
+        for dy in range(self.h) :
+            start = -1
+            for dx in range(self.w + 1) :
+                color = palette[rows[dy][dx]] if dx < self.w else None
+                if color is None :
+                    if dx < self.w :
+                        self.transparent = True
+                    if start >= 0 :
+                        self.spans.append(start)
+                        self.spans.append(dy)
+                        self.spans.append(dx - start)
+                        start = -1
+                    if dx < self.w :
+                        i += 2
+                    continue
+                if start < 0 :
+                    start = dx
+                self.buf[i] = color >> 8
+                self.buf[i+1] = color & 0xff
+                i += 2
+
+    @staticmethod
+    def fromBits(bits, width, fg, bg=None):
+        # 1-bpp sprite: one int per row, most significant of width bits on
+        # the left.  bg None leaves clear bits transparent.
+        rows = []
+        for b in bits :
+            rows.append(''.join('1' if b >> (width - 1 - dx) & 1 else '0' for dx in range(width)))
+        return Sprite(rows, {'1': fg, '0': bg})
+
+    def draw(self, display, x, y, wrap=0, bottom=32767):
+        # wrap > 0 wraps x at that column, as for a hardware scrolled
+        # screen, and rows at or below bottom are clipped
+        h = min(self.h, bottom - y)
+        if h <= 0 :
+            return
+        w = self.w
+        if wrap and x >= wrap :
+            x -= wrap
+        split = wrap and x + w > wrap
+        if not (self.transparent or split) :
+            if h == self.h :
+                display.blit_buffer(self.buf, x, y, w, h)
+            else :
+                display.blit_buffer(self.mv[:w * h * 2], x, y, w, h)
+            return
+        mv = self.mv
+        spans = self.spans
+        for i in range(0, len(spans), 3) :
+            dx = spans[i]
+            dy = spans[i+1]
+            n = spans[i+2]
+            if dy >= h :
+                break
+            o = (dy * w + dx) * 2
+            sx = x + dx
+            if split and sx >= wrap :
+                sx -= wrap
+            if split and sx + n > wrap :
+                k = wrap - sx
+                display.blit_buffer(mv[o:o + k * 2], sx, y + dy, k, 1)
+                display.blit_buffer(mv[o + k * 2:o + n * 2], 0, y + dy, n - k, 1)
+            else :
+                display.blit_buffer(mv[o:o + n * 2], sx, y + dy, n, 1)
+
+    def erase(self, display, x, y, color=0, wrap=0, bottom=32767):
+        h = min(self.h, bottom - y)
+        if h <= 0 :
+            return
+        if wrap and x >= wrap :
+            x -= wrap
+        if wrap and x + self.w > wrap :
+            display.fill_rect(x, y, wrap - x, h, color)
+            display.fill_rect(0, y, x + self.w - wrap, h, color)
+        else :
+            display.fill_rect(x, y, self.w, h, color)
+
+    def drawPrimitives(self, display, x, y):
+        # The same image drawn the old way, one hline per same-colour run,
+        # for comparison in bench()
+        buf = self.buf
+        spans = self.spans
+        for i in range(0, len(spans), 3) :
+            dx = spans[i]
+            dy = spans[i+1]
+            end = dx + spans[i+2]
+            while dx < end :
+                o = (dy * self.w + dx) * 2
+                run = dx + 1
+                while run < end and buf[o + (run - dx) * 2] == buf[o] and buf[o + (run - dx) * 2 + 1] == buf[o + 1] :
+                    run += 1
+                display.hline(x + dx, y + dy, run - dx, buf[o] << 8 | buf[o + 1])
+                dx = run
+
+    def bench(self, display, x=0, y=0, count=100):
+        # Time drawing the sprite with primitives and with blit_buffer,
+        # in microseconds per draw.  On the host run it with
+        # host/benchmodules.py sprite, for the real clock.
+        t = ticks_us()
+        for _ in range(count) :
+            self.drawPrimitives(display, x, y)
+        primitives = ticks_diff(ticks_us(), t) / count
+        t = ticks_us()
+        for _ in range(count) :
+            self.draw(display, x, y)
+        blit = ticks_diff(ticks_us(), t) / count
+        print ("%dx%d sprite: primitives %.0fus, blit_buffer %.0fus" % (self.w, self.h, primitives, blit))
+        return primitives, blit
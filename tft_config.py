@@ -1 +1 @@
-""" LilyGo T-DISPLAY 135x240 ST7789 display """from machine import Pin, SPIimport st7789TFA = 40BFA = 40def config(rotation=0, buffer_size=0, options=0):    return st7789.ST7789(        SPI(1, baudrate=30000000, sck=Pin(18), mosi=Pin(19)),        135,        240,        reset=Pin(23, Pin.OUT),        cs=Pin(5, Pin.OUT),        dc=Pin(16, Pin.OUT),        backlight=Pin(4, Pin.OUT),        rotation=rotation,        options=options,        buffer_size= buffer_size)
\ No newline at end of file
+""" LilyGo T-DISPLAY 135x240 ST7789 display """from machine import Pin, SPIimport st7789TFA = 40BFA = 40# set True before launching an app to count its draw calls and bus bytes,# the app's display is then kept in last (see drawstats.py)STATS = Falselast = Nonedef config(rotation=0, buffer_size=0, options=0):    global last    display = st7789.ST7789(        SPI(1, baudrate=30000000, sck=Pin(18), mosi=Pin(19)),        135,        240,        reset=Pin(23, Pin.OUT),        cs=Pin(5, Pin.OUT),        dc=Pin(16, Pin.OUT),        backlight=Pin(4, Pin.OUT),        rotation=rotation,        options=options,        buffer_size= buffer_size)    if STATS:        from drawstats import DrawStats        display = last = DrawStats(display)    return display
\ No newline at end of file